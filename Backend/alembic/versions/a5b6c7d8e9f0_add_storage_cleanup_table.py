@@ -0,0 +1,41 @@
+"""add storage cleanup table
+
+Revision ID: a5b6c7d8e9f0
+Revises: f4a5b6c7d8e9
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a5b6c7d8e9f0"
+down_revision: Union[str, None] = "f4a5b6c7d8e9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "storage_cleanup",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("object_key", sa.String(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("next_attempt_at", sa.DateTime(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_storage_cleanup_id"), "storage_cleanup", ["id"], unique=False)
+    op.create_index(op.f("ix_storage_cleanup_object_key"), "storage_cleanup", ["object_key"], unique=False)
+    op.create_index(op.f("ix_storage_cleanup_next_attempt_at"), "storage_cleanup", ["next_attempt_at"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_storage_cleanup_next_attempt_at"), table_name="storage_cleanup")
+    op.drop_index(op.f("ix_storage_cleanup_object_key"), table_name="storage_cleanup")
+    op.drop_index(op.f("ix_storage_cleanup_id"), table_name="storage_cleanup")
+    op.drop_table("storage_cleanup")
@@ -0,0 +1,28 @@
+"""add task progress columns
+
+Revision ID: d2e3f4a5b6c7
+Revises: c1d2e3f4a5b6
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d2e3f4a5b6c7"
+down_revision: Union[str, None] = "c1d2e3f4a5b6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("tasks", sa.Column("progress", sa.Integer(), nullable=True))
+    op.add_column("tasks", sa.Column("result_key", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("tasks", "result_key")
+    op.drop_column("tasks", "progress")
@@ -0,0 +1,38 @@
+"""add task queue columns
+
+Revision ID: e3f4a5b6c7d8
+Revises: d2e3f4a5b6c7
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e3f4a5b6c7d8"
+down_revision: Union[str, None] = "d2e3f4a5b6c7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("tasks", sa.Column("input_key", sa.String(), nullable=True))
+    op.add_column("tasks", sa.Column("content_type", sa.String(), nullable=True))
+    op.add_column("tasks", sa.Column("params", sa.Text(), nullable=True))
+    op.add_column("tasks", sa.Column("result", sa.Text(), nullable=True))
+    op.add_column("tasks", sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("tasks", sa.Column("claimed_at", sa.DateTime(), nullable=True))
+    op.create_index("ix_tasks_status_created_at", "tasks", ["status", "created_at"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tasks_status_created_at", table_name="tasks")
+    op.drop_column("tasks", "claimed_at")
+    op.drop_column("tasks", "attempts")
+    op.drop_column("tasks", "result")
+    op.drop_column("tasks", "params")
+    op.drop_column("tasks", "content_type")
+    op.drop_column("tasks", "input_key")
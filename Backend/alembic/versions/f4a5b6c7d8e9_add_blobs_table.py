@@ -0,0 +1,55 @@
+"""add blobs table
+
+Revision ID: f4a5b6c7d8e9
+Revises: e3f4a5b6c7d8
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f4a5b6c7d8e9"
+down_revision: Union[str, None] = "e3f4a5b6c7d8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "blobs",
+        sa.Column("sha256", sa.String(length=64), nullable=False),
+        sa.Column("object_key", sa.String(), nullable=False),
+        sa.Column("size", sa.Integer(), nullable=False),
+        sa.Column("content_type", sa.String(), nullable=True),
+        sa.Column("ref_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("sha256"),
+        sa.UniqueConstraint("object_key"),
+    )
+    # Files with the same content now share one object key
+    op.drop_constraint("uq_chat_files_object_key", "chat_files", type_="unique")
+    op.create_index(op.f("ix_chat_files_object_key"), "chat_files", ["object_key"], unique=False)
+    op.add_column("chat_files", sa.Column("blob_sha256", sa.String(length=64), nullable=True))
+    op.create_index(op.f("ix_chat_files_blob_sha256"), "chat_files", ["blob_sha256"], unique=False)
+    op.create_foreign_key("fk_chat_files_blob_sha256", "chat_files", "blobs", ["blob_sha256"], ["sha256"])
+    op.add_column("tasks", sa.Column("input_blob_sha256", sa.String(length=64), nullable=True))
+    op.add_column("tasks", sa.Column("result_blob_sha256", sa.String(length=64), nullable=True))
+    op.create_foreign_key("fk_tasks_input_blob_sha256", "tasks", "blobs", ["input_blob_sha256"], ["sha256"])
+    op.create_foreign_key("fk_tasks_result_blob_sha256", "tasks", "blobs", ["result_blob_sha256"], ["sha256"])
+
+
+def downgrade() -> None:
+    op.drop_constraint("fk_tasks_result_blob_sha256", "tasks", type_="foreignkey")
+    op.drop_constraint("fk_tasks_input_blob_sha256", "tasks", type_="foreignkey")
+    op.drop_column("tasks", "result_blob_sha256")
+    op.drop_column("tasks", "input_blob_sha256")
+    op.drop_constraint("fk_chat_files_blob_sha256", "chat_files", type_="foreignkey")
+    op.drop_index(op.f("ix_chat_files_blob_sha256"), table_name="chat_files")
+    op.drop_column("chat_files", "blob_sha256")
+    op.drop_index(op.f("ix_chat_files_object_key"), table_name="chat_files")
+    op.create_unique_constraint("uq_chat_files_object_key", "chat_files", ["object_key"])
+    op.drop_table("blobs")
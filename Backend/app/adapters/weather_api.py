@@ -3,6 +3,8 @@ from dataclasses import dataclass
 
 import httpx
 
+from app import http_clients
+
 
 class WeatherApiError(Exception):
     pass
@@ -34,17 +36,18 @@ class WeatherApiAdapter:
             raise WeatherApiError("WEATHER_API_KEY is not configured")
 
         try:
-            async with httpx.AsyncClient(timeout=self.timeout_seconds) as client:
-                response = await client.get(
-                    f"{self.base_url}/data/2.5/weather",
-                    params={
-                        "q": city,
-                        "appid": self.api_key,
-                        "units": "metric",
-                        "lang": "ru",
-                    },
-                )
-                response.raise_for_status()
+            response = await http_clients.weather.request(
+                "GET",
+                f"{self.base_url}/data/2.5/weather",
+                params={
+                    "q": city,
+                    "appid": self.api_key,
+                    "units": "metric",
+                    "lang": "ru",
+                },
+                timeout=httpx.Timeout(self.timeout_seconds, pool=http_clients.WEATHER_POOL_TIMEOUT),
+            )
+            response.raise_for_status()
         except httpx.TimeoutException as exc:
             raise WeatherApiTimeout("External weather API timeout") from exc
         except httpx.HTTPStatusError as exc:
@@ -0,0 +1,107 @@
+import os
+import threading
+import time
+from collections import Counter, deque
+
+ML_BREAKER_WINDOW = int(os.getenv("ML_BREAKER_WINDOW", "20"))
+ML_BREAKER_MIN_CALLS = int(os.getenv("ML_BREAKER_MIN_CALLS", "10"))
+ML_BREAKER_FAILURE_RATE = float(os.getenv("ML_BREAKER_FAILURE_RATE", "0.5"))
+ML_BREAKER_SLOW_CALL_SECONDS = float(os.getenv("ML_BREAKER_SLOW_CALL_SECONDS", "10"))
+ML_BREAKER_SLOW_CALL_RATE = float(os.getenv("ML_BREAKER_SLOW_CALL_RATE", "0.8"))
+ML_BREAKER_OPEN_SECONDS = float(os.getenv("ML_BREAKER_OPEN_SECONDS", "15"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__("Circuit breaker is open")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    # Counts the outcome of the last `window` calls; opens when too many of
+    # them failed or were slower than the latency budget, and lets a single
+    # trial call through once open_seconds have passed
+    def __init__(
+        self,
+        window: int = ML_BREAKER_WINDOW,
+        min_calls: int = ML_BREAKER_MIN_CALLS,
+        failure_rate: float = ML_BREAKER_FAILURE_RATE,
+        slow_call_seconds: float = ML_BREAKER_SLOW_CALL_SECONDS,
+        slow_call_rate: float = ML_BREAKER_SLOW_CALL_RATE,
+        open_seconds: float = ML_BREAKER_OPEN_SECONDS,
+    ):
+        self.min_calls = max(1, min_calls)
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.rejected = 0
+        self.transitions = Counter()
+        self._outcomes = deque(maxlen=max(1, window))
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def _transition(self, state: str):
+        self.transitions[f"{self.state}->{state}"] += 1
+        self.state = state
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+        elif state == CLOSED:
+            self._outcomes.clear()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self.opened_at + self.open_seconds - time.monotonic()
+                if remaining > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(remaining)
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._trial_in_flight:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.open_seconds)
+                self._trial_in_flight = True
+
+    def release(self):
+        # For a call abandoned without an outcome, such as a client hang-up:
+        # frees the half-open trial slot and counts nothing
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._trial_in_flight = False
+
+    def record(self, success: bool, elapsed: float):
+        with self._lock:
+            slow = elapsed >= self.slow_call_seconds
+            if self.state == HALF_OPEN:
+                self._trial_in_flight = False
+                self._transition(CLOSED if success and not slow else OPEN)
+                return
+            if self.state != CLOSED:
+                return
+            self._outcomes.append((success, slow))
+            if len(self._outcomes) < self.min_calls:
+                return
+            failures = sum(1 for ok, _ in self._outcomes if not ok)
+            slow_calls = sum(1 for _, is_slow in self._outcomes if is_slow)
+            if failures / len(self._outcomes) >= self.failure_rate or slow_calls / len(self._outcomes) >= self.slow_call_rate:
+                self._transition(OPEN)
+
+    def metrics(self) -> dict:
+        return {
+            "state": self.state,
+            "rejected": self.rejected,
+            "transitions": dict(self.transitions),
+            "window_calls": len(self._outcomes),
+            "window_failures": sum(1 for ok, _ in self._outcomes if not ok),
+        }
+
+
+ml_breaker = CircuitBreaker()
@@ -0,0 +1,122 @@
+import os
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+import httpx
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+
+ML_CONNECT_TIMEOUT = float(os.getenv("ML_CONNECT_TIMEOUT", "5"))
+ML_READ_TIMEOUT = float(os.getenv("ML_READ_TIMEOUT", "30"))
+ML_WRITE_TIMEOUT = float(os.getenv("ML_WRITE_TIMEOUT", "30"))
+ML_POOL_TIMEOUT = float(os.getenv("ML_POOL_TIMEOUT", "5"))
+
+WEATHER_POOL_TIMEOUT = float(os.getenv("WEATHER_POOL_TIMEOUT", "2"))
+
+
+def ml_timeout(read: Optional[float] = ML_READ_TIMEOUT) -> httpx.Timeout:
+    return httpx.Timeout(
+        connect=ML_CONNECT_TIMEOUT,
+        read=read,
+        write=ML_WRITE_TIMEOUT,
+        pool=ML_POOL_TIMEOUT,
+    )
+
+
+class PooledClient:
+    # One long-lived AsyncClient per upstream so keep-alive connections are
+    # reused across requests; counts requests for the /metrics endpoint
+    def __init__(self, name: str, timeout: httpx.Timeout):
+        self.name = name
+        self.timeout = timeout
+        self.client: Optional[httpx.AsyncClient] = None
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+
+    def start(self):
+        if self.client is None or self.client.is_closed:
+            self.client = httpx.AsyncClient(
+                timeout=self.timeout,
+                http2=HTTP2_ENABLED,
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                ),
+            )
+        return self.client
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        client = self.start()
+        self.in_flight += 1
+        self.requests += 1
+        try:
+            return await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs):
+        client = self.start()
+        self.in_flight += 1
+        self.requests += 1
+        try:
+            async with client.stream(method, url, **kwargs) as response:
+                yield response
+        except httpx.HTTPError:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    def _pool_connections(self) -> Dict[str, int]:
+        pool = getattr(getattr(self.client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is None:
+            return {"open": 0, "idle": 0, "active": 0}
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {"open": len(connections), "idle": idle, "active": len(connections) - idle}
+
+    def metrics(self) -> dict:
+        return {
+            "started": self.client is not None and not self.client.is_closed,
+            "http2": HTTP2_ENABLED,
+            "max_connections": HTTP_MAX_CONNECTIONS,
+            "max_keepalive_connections": HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "errors": self.errors,
+            "connections": self._pool_connections(),
+        }
+
+
+ml = PooledClient("ml", ml_timeout())
+weather = PooledClient("weather", httpx.Timeout(4.0, pool=WEATHER_POOL_TIMEOUT))
+
+_clients = (ml, weather)
+
+
+def start():
+    for client in _clients:
+        client.start()
+
+
+async def close():
+    for client in _clients:
+        await client.close()
+
+
+def metrics() -> dict:
+    return {client.name: client.metrics() for client in _clients}
@@ -0,0 +1,200 @@
+import hashlib
+import hmac
+import mmap
+import os
+import shutil
+import tempfile
+import time
+from contextlib import suppress
+from typing import BinaryIO, Callable, Dict, Iterable, Optional, Tuple
+from urllib.parse import quote, urlencode
+
+from app.storage import (
+    PRESIGNED_URL_EXPIRES_SECONDS,
+    PRESIGNED_URL_MIN_VALIDITY_SECONDS,
+    StorageBackend,
+    ObjectNotFound,
+    StoredObject,
+    _MeteredReader,
+)
+
+STORAGE_LOCAL_ROOT = os.getenv("STORAGE_LOCAL_ROOT", "./data/storage")
+# Where GET /storage/{key} is reachable from the browser
+STORAGE_LOCAL_PUBLIC_URL = os.getenv("STORAGE_LOCAL_PUBLIC_URL", "http://localhost:8000/storage").rstrip("/")
+STORAGE_LOCAL_SIGNING_KEY = os.getenv("STORAGE_LOCAL_SIGNING_KEY") or os.getenv(
+    "SECRET_KEY", "change_me_super_secret_key"
+)
+# Without fsync a crash can lose recent writes, but never leaves a torn file
+STORAGE_LOCAL_FSYNC = os.getenv("STORAGE_LOCAL_FSYNC", "true").lower() == "true"
+
+
+class StoredView:
+    # Read-only memory map of a stored object; the page cache backs it, so
+    # serving reads no file data into the process up front
+    def __init__(self, path: str, content_type: str):
+        self.content_type = content_type
+        with open(path, "rb") as source:
+            self.size = os.fstat(source.fileno()).st_size
+            self._map = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+
+    def read(self, start: int = 0, end: Optional[int] = None) -> bytes:
+        if self._map is None:
+            return b""
+        return self._map[start:self.size if end is None else end]
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+
+
+class LocalStorage(StorageBackend):
+    # Objects live at ROOT/ab/cd/<sha256 of the key>, so any key maps to a
+    # safe file name and no directory grows past a few thousand entries.
+    # The content type sits next to the data in a ".type" file.
+    def __init__(self, root: str = STORAGE_LOCAL_ROOT, public_url: str = STORAGE_LOCAL_PUBLIC_URL):
+        self.root = os.path.abspath(root)
+        self.public_url = public_url.rstrip("/")
+        self._signing_key = STORAGE_LOCAL_SIGNING_KEY.encode()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, object_name: str) -> str:
+        digest = hashlib.sha256(object_name.encode()).hexdigest()
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def _write_atomic(self, path: str, write: Callable[[BinaryIO], None]):
+        # Written under a temporary name in the same directory and renamed
+        # into place: readers see the old object or the new one, never half
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as target:
+                write(target)
+                if STORAGE_LOCAL_FSYNC:
+                    target.flush()
+                    os.fsync(target.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            with suppress(FileNotFoundError):
+                os.unlink(temp_path)
+            raise
+        if STORAGE_LOCAL_FSYNC:
+            directory_fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(directory_fd)
+            finally:
+                os.close(directory_fd)
+
+    def _store(self, object_name: str, content_type: str, write: Callable[[BinaryIO], None]):
+        path = self._path(object_name)
+        self._write_atomic(path + ".type", lambda target: target.write(content_type.encode()))
+        try:
+            self._write_atomic(path, write)
+        except BaseException:
+            if not os.path.exists(path):
+                with suppress(FileNotFoundError):
+                    os.unlink(path + ".type")
+            raise
+
+    def upload_stream(
+        self,
+        source: BinaryIO,
+        object_name: str,
+        content_type: str = "application/octet-stream",
+        max_size: Optional[int] = None,
+    ) -> StoredObject:
+        reader = _MeteredReader(source, max_size)
+        self._store(object_name, content_type, lambda target: shutil.copyfileobj(reader, target, 1024 * 1024))
+        return StoredObject(object_name, reader.size, reader.digest.hexdigest())
+
+    def upload_path(self, file_path: str, object_name: str, content_type: str = "application/octet-stream") -> str:
+        def copy(target: BinaryIO):
+            with open(file_path, "rb") as source:
+                shutil.copyfileobj(source, target, 1024 * 1024)
+
+        self._store(object_name, content_type, copy)
+        return object_name
+
+    def open_view(self, object_name: str) -> StoredView:
+        path = self._path(object_name)
+        try:
+            with open(path + ".type", "rb") as type_file:
+                content_type = type_file.read().decode()
+        except FileNotFoundError:
+            content_type = "application/octet-stream"
+        try:
+            return StoredView(path, content_type)
+        except FileNotFoundError as exc:
+            raise ObjectNotFound(object_name) from exc
+
+    def download_file(self, object_name: str) -> bytes:
+        view = self.open_view(object_name)
+        try:
+            return view.read()
+        finally:
+            view.close()
+
+    def _signature(self, object_name: str, expires: int, filename: str = "") -> str:
+        message = f"{object_name}\n{expires}" + (f"\n{filename}" if filename else "")
+        return hmac.new(self._signing_key, message.encode(), hashlib.sha256).hexdigest()
+
+    def verify(self, object_name: str, expires: int, signature: str, filename: str = "") -> bool:
+        if expires < time.time():
+            return False
+        return hmac.compare_digest(self._signature(object_name, expires, filename), signature)
+
+    @staticmethod
+    def _expires() -> int:
+        # Expiry is rounded down to a step of the minimum validity, so the
+        # same key gets the same URL for that long and browsers can cache it
+        step = max(1, PRESIGNED_URL_MIN_VALIDITY_SECONDS)
+        return int(time.time() + PRESIGNED_URL_EXPIRES_SECONDS) // step * step
+
+    def _url(self, object_name: str, expires: int, filename: str = "") -> str:
+        query = {"expires": expires}
+        if filename:
+            query["filename"] = filename
+        query["signature"] = self._signature(object_name, expires, filename)
+        return f"{self.public_url}/{quote(object_name)}?" + urlencode(query)
+
+    def get_presigned_urls(self, object_names: Iterable[str]) -> Dict[str, str]:
+        expires = self._expires()
+        return {object_name: self._url(object_name, expires) for object_name in object_names}
+
+    def get_download_urls(self, files: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], str]:
+        expires = self._expires()
+        return {(object_name, filename): self._url(object_name, expires, filename) for object_name, filename in files}
+
+    def delete_file(self, object_name: str) -> None:
+        path = self._path(object_name)
+        with suppress(FileNotFoundError):
+            os.unlink(path)
+        with suppress(FileNotFoundError):
+            os.unlink(path + ".type")
+
+    def delete_files(self, object_names: Iterable[str]) -> Dict[str, str]:
+        failed: Dict[str, str] = {}
+        for object_name in dict.fromkeys(object_names):
+            try:
+                self.delete_file(object_name)
+            except OSError as err:
+                failed[object_name] = str(err)
+        return failed
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    # Single "bytes=start-end" ranges, as video players send; anything else
+    # is served whole
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start, _, end = header[6:].partition("-")
+    try:
+        if start:
+            first, last = int(start), int(end) if end else size - 1
+        else:
+            first, last = size - int(end), size - 1
+    except ValueError:
+        return None
+    if first < 0 or first > last or first >= size:
+        return None
+    return first, min(last, size - 1) + 1
@@ -1,17 +1,41 @@
 from contextlib import asynccontextmanager
+import asyncio
 import os
 
 from alembic import command
 from alembic.config import Config
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy.orm import Session
 
-from app.routers import auth, chats, external, redact, seo
+from app import database, http_clients, models
+from app.circuit_breaker import ml_breaker
+from app.ml_balancer import balancer
+from app.repositories.cleanup_repository import CleanupRepository
+from app.repositories.task_repository import TaskRepository
+from app.routers import auth, chats, external, files, redact, seo, tasks
+from app.routers.auth import require_roles
+from app.services import redaction_queue
+from app.services.storage_cleanup import worker as storage_cleanup
+from app.services.task_events import broker as task_events
+from app.storage import storage
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    http_clients.start()
+    balancer.start()
+    redaction_queue.pool.configure(database.SessionLocal, redact.process_queued_task)
+    redaction_queue.pool.start()
+    task_events.start(database.engine)
+    storage_cleanup.configure(database.SessionLocal, storage)
+    storage_cleanup.start()
     yield
+    await storage_cleanup.stop()
+    await asyncio.to_thread(task_events.stop)
+    await redaction_queue.pool.stop()
+    await balancer.stop()
+    await http_clients.close()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -38,6 +62,8 @@ app.include_router(redact.router, tags=["redact"])
 app.include_router(chats.router)
 app.include_router(external.router)
 app.include_router(seo.router)
+app.include_router(tasks.router)
+app.include_router(files.router)
 
 
 @app.get("/")
@@ -48,3 +74,24 @@ def read_root():
 @app.get("/health")
 def health():
     return {"status": "ok"}
+
+
+@app.get("/metrics")
+def metrics(
+    _admin_user: models.User = Depends(require_roles("admin")),
+    db: Session = Depends(database.get_db),
+):
+    return {
+        "redaction_queue": {
+            **redaction_queue.pool.metrics(),
+            "pending": TaskRepository(db).count_by_status(models.TaskStatus.pending),
+        },
+        "http_clients": http_clients.metrics(),
+        "ml_replicas": balancer.metrics(),
+        "ml_circuit_breaker": ml_breaker.metrics(),
+        "task_events": task_events.metrics(),
+        "storage_cleanup": {
+            **storage_cleanup.metrics(),
+            "pending": CleanupRepository(db).count(),
+        },
+    }
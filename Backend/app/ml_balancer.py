@@ -0,0 +1,261 @@
+import asyncio
+import itertools
+import os
+import random
+import statistics
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, List, Optional
+
+import httpx
+
+from app import http_clients
+
+ML_SERVICE_URLS = [
+    url.strip().rstrip("/")
+    for url in os.getenv("ML_SERVICE_URLS", os.getenv("ML_SERVICE_URL", "http://localhost:8001")).split(",")
+    if url.strip()
+]
+# p2c | least_outstanding | round_robin
+ML_BALANCING = os.getenv("ML_BALANCING", "p2c")
+ML_EJECT_AFTER_FAILURES = int(os.getenv("ML_EJECT_AFTER_FAILURES", "3"))
+ML_EJECT_SECONDS = float(os.getenv("ML_EJECT_SECONDS", "30"))
+ML_PROBE_INTERVAL_SECONDS = float(os.getenv("ML_PROBE_INTERVAL_SECONDS", "5"))
+ML_PROBE_TIMEOUT_SECONDS = float(os.getenv("ML_PROBE_TIMEOUT_SECONDS", "2"))
+ML_HEDGE_ENABLED = os.getenv("ML_HEDGE_ENABLED", "false").lower() == "true"
+ML_HEDGE_MIN_DELAY_MS = float(os.getenv("ML_HEDGE_MIN_DELAY_MS", "50"))
+# Hedging waits for this many latency samples before it trusts the p95
+ML_HEDGE_MIN_SAMPLES = int(os.getenv("ML_HEDGE_MIN_SAMPLES", "20"))
+
+# Weight of the newest sample in the per-replica latency average
+_EWMA_ALPHA = 0.3
+_INITIAL_LATENCY = 0.05
+
+
+class Replica:
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.latency = _INITIAL_LATENCY
+        self.failures = 0
+        self.ready = True
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.ejections = 0
+
+    def available(self, now: float) -> bool:
+        return self.ready and self.ejected_until <= now
+
+    def load(self) -> float:
+        # Outstanding work scaled by how fast the replica has been lately, so
+        # a slow replica with one request counts as busier than a fast one
+        return (self.outstanding + 1) * self.latency
+
+    def metrics(self, now: float) -> dict:
+        return {
+            "url": self.url,
+            "available": self.available(now),
+            "ready": self.ready,
+            "outstanding": self.outstanding,
+            "latency_ms": round(self.latency * 1000, 1),
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejections": self.ejections,
+            "ejected_for_seconds": round(max(0.0, self.ejected_until - now), 1),
+        }
+
+
+class Lease:
+    def __init__(self, replica: Replica):
+        self.replica = replica
+        self.url = replica.url
+        self.failed = False
+
+    def observe(self, response: httpx.Response):
+        if response.status_code >= 500:
+            self.failed = True
+
+
+class MLBalancer:
+    def __init__(
+        self,
+        urls: List[str],
+        strategy: str = ML_BALANCING,
+        eject_after_failures: int = ML_EJECT_AFTER_FAILURES,
+        eject_seconds: float = ML_EJECT_SECONDS,
+        hedge: bool = ML_HEDGE_ENABLED,
+        hedge_min_delay: float = ML_HEDGE_MIN_DELAY_MS / 1000,
+    ):
+        if not urls:
+            raise ValueError("At least one ML service URL is required")
+        if strategy not in ("p2c", "least_outstanding", "round_robin"):
+            raise ValueError(f"Unknown balancing strategy: {strategy}")
+        self.replicas = [Replica(url) for url in urls]
+        self.strategy = strategy
+        self.eject_after_failures = max(1, eject_after_failures)
+        self.eject_seconds = eject_seconds
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._latencies = deque(maxlen=200)
+        self._round_robin = itertools.cycle(self.replicas)
+        self._probe_task: Optional[asyncio.Task] = None
+
+    def pick(self, exclude: Optional[Replica] = None) -> Replica:
+        now = time.monotonic()
+        candidates = [replica for replica in self.replicas if replica.available(now) and replica is not exclude]
+        if not candidates:
+            # Everything is ejected: try the replica due back soonest rather
+            # than failing outright, it may already have recovered
+            ready = [replica for replica in self.replicas if replica.ready] or self.replicas
+            return min(ready, key=lambda replica: replica.ejected_until)
+        if self.strategy == "round_robin":
+            while True:
+                replica = next(self._round_robin)
+                if replica in candidates:
+                    return replica
+        if self.strategy == "p2c" and len(candidates) > 2:
+            candidates = random.sample(candidates, 2)
+        return min(candidates, key=Replica.load)
+
+    def record_success(self, replica: Replica, elapsed: float):
+        replica.latency = (1 - _EWMA_ALPHA) * replica.latency + _EWMA_ALPHA * elapsed
+        replica.failures = 0
+        self._latencies.append(elapsed)
+
+    def record_failure(self, replica: Replica):
+        replica.failures += 1
+        if replica.failures >= self.eject_after_failures:
+            replica.ejected_until = time.monotonic() + self.eject_seconds
+            replica.ejections += 1
+            replica.failures = 0
+
+    @asynccontextmanager
+    async def lease(self, exclude: Optional[Replica] = None, replica: Optional[Replica] = None):
+        # Connection errors and responses passed to Lease.observe with a 5xx
+        # status count towards ejecting the replica
+        replica = replica or self.pick(exclude)
+        lease = Lease(replica)
+        replica.outstanding += 1
+        replica.requests += 1
+        started = time.perf_counter()
+        try:
+            yield lease
+        except httpx.RequestError:
+            self.record_failure(replica)
+            raise
+        except asyncio.CancelledError:
+            # A request cancelled because its hedge won still tells us the
+            # replica was at least this slow
+            elapsed = time.perf_counter() - started
+            replica.latency = (1 - _EWMA_ALPHA) * replica.latency + _EWMA_ALPHA * elapsed
+            raise
+        else:
+            if lease.failed:
+                self.record_failure(replica)
+            else:
+                self.record_success(replica, time.perf_counter() - started)
+        finally:
+            replica.outstanding -= 1
+
+    def hedge_delay(self) -> Optional[float]:
+        if not self.hedge or len(self._latencies) < ML_HEDGE_MIN_SAMPLES:
+            return None
+        if sum(1 for replica in self.replicas if replica.available(time.monotonic())) < 2:
+            return None
+        p95 = statistics.quantiles(self._latencies, n=20)[-1]
+        return max(self.hedge_min_delay, p95)
+
+    async def _send(self, send: Callable[[str], Awaitable[httpx.Response]], replica: Optional[Replica] = None):
+        async with self.lease(replica=replica) as lease:
+            response = await send(lease.url)
+            lease.observe(response)
+            return response
+
+    async def request(self, send: Callable[[str], Awaitable[httpx.Response]]) -> httpx.Response:
+        # With hedging on, a request still unanswered after the recent p95
+        # is sent again to another replica and the first good answer wins
+        delay = self.hedge_delay()
+        if delay is None:
+            return await self._send(send)
+
+        primary = self.pick()
+        first = asyncio.create_task(self._send(send, primary))
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+
+        self.hedged += 1
+        second = asyncio.create_task(self._send(send, self.pick(exclude=primary)))
+        pending = {first, second}
+        fallback, error = None, None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif task.result().status_code >= 500:
+                        fallback = task.result()
+                    else:
+                        if task is second:
+                            self.hedge_wins += 1
+                        return task.result()
+            if fallback is not None:
+                return fallback
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def probe(self):
+        async def check(replica: Replica):
+            try:
+                response = await http_clients.ml.request(
+                    "GET", f"{replica.url}/ready", timeout=ML_PROBE_TIMEOUT_SECONDS
+                )
+                ready = response.status_code == 200
+            except httpx.HTTPError:
+                ready = False
+            replica.ready = ready
+            if ready and replica.ejected_until:
+                replica.ejected_until = 0.0
+                replica.failures = 0
+
+        await asyncio.gather(*(check(replica) for replica in self.replicas))
+
+    async def _probe_loop(self, interval: float):
+        while True:
+            await self.probe()
+            await asyncio.sleep(interval)
+
+    def start(self, interval: float = ML_PROBE_INTERVAL_SECONDS):
+        if self._probe_task is None and interval > 0:
+            self._probe_task = asyncio.create_task(self._probe_loop(interval))
+
+    async def stop(self):
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+            self._probe_task = None
+
+    def metrics(self) -> dict:
+        now = time.monotonic()
+        return {
+            "strategy": self.strategy,
+            "hedging": {
+                "enabled": self.hedge,
+                "delay_ms": round(delay * 1000, 1) if (delay := self.hedge_delay()) is not None else None,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+            },
+            "replicas": [replica.metrics(now) for replica in self.replicas],
+        }
+
+
+balancer = MLBalancer(ML_SERVICE_URLS)
@@ -1,8 +1,8 @@
 import datetime
 import enum
 
-from sqlalchemy import (Column, DateTime, Enum, ForeignKey, Integer, String,
-                        Text)
+from sqlalchemy import (Column, DateTime, Enum, ForeignKey, Index, Integer,
+                        String, Text)
 from sqlalchemy.orm import relationship
 
 from app.database import Base
@@ -38,10 +38,25 @@ class Task(Base):
     user_id = Column(Integer, index=True)
     status = Column(Enum(TaskStatus), default=TaskStatus.pending)
     details = Column(String, nullable=True)
+    progress = Column(Integer, nullable=True)
+    result_key = Column(String, nullable=True)
+    input_key = Column(String, nullable=True)
+    input_blob_sha256 = Column(String(64), ForeignKey("blobs.sha256"), nullable=True)
+    result_blob_sha256 = Column(String(64), ForeignKey("blobs.sha256"), nullable=True)
+    content_type = Column(String, nullable=True)
+    params = Column(Text, nullable=True)
+    result = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    claimed_at = Column(DateTime, nullable=True)
+    next_attempt_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.datetime.utcnow,
                         onupdate=datetime.datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_tasks_status_created_at", "status", "created_at"),
+    )
+
 
 class MessageSender(enum.Enum):
     user = "user"
@@ -88,7 +103,8 @@ class ChatFile(Base):
     id = Column(Integer, primary_key=True, index=True)
     chat_id = Column(Integer, ForeignKey("chats.id"), index=True, nullable=False)
     uploaded_by = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
-    object_key = Column(String, unique=True, nullable=False)
+    object_key = Column(String, index=True, nullable=False)
+    blob_sha256 = Column(String(64), ForeignKey("blobs.sha256"), index=True, nullable=True)
     filename = Column(String, nullable=False)
     content_type = Column(String, nullable=False)
     size = Column(Integer, nullable=False)
@@ -98,6 +114,33 @@ class ChatFile(Base):
     user = relationship("User")
 
 
+class Blob(Base):
+    # Stored object addressed by the SHA-256 of its bytes; ref_count is the
+    # number of ChatFile and Task references, and the object is removed
+    # when it drops to zero
+    __tablename__ = "blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    object_key = Column(String, unique=True, nullable=False)
+    size = Column(Integer, nullable=False)
+    content_type = Column(String, nullable=True)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+
+class StorageCleanup(Base):
+    # Object waiting to be removed from storage; the cleanup worker deletes
+    # due keys in bulk and pushes failed ones back with a growing delay
+    __tablename__ = "storage_cleanup"
+
+    id = Column(Integer, primary_key=True, index=True)
+    object_key = Column(String, index=True, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(DateTime, index=True, nullable=False, default=datetime.datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+
 class RefreshToken(Base):
     __tablename__ = "refresh_tokens"
 
@@ -0,0 +1,84 @@
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import Select, delete, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app import models
+
+
+class BlobRepository:
+    # Reference counts change through single UPDATE/INSERT statements, so
+    # concurrent uploads and deletes of the same content never lose a count
+    def __init__(self, db: Session):
+        self.db = db
+
+    def acquire(self, sha256: str) -> bool:
+        result = self.db.execute(
+            update(models.Blob)
+            .where(models.Blob.sha256 == sha256)
+            .values(ref_count=models.Blob.ref_count + 1)
+        )
+        return result.rowcount > 0
+
+    def register(self, sha256: str, object_key: str, size: int, content_type: Optional[str]):
+        # Another upload of the same bytes may have registered the blob
+        # meanwhile; then this one only adds its reference
+        insert = postgresql.insert if self.db.get_bind().dialect.name == "postgresql" else sqlite.insert
+        self.db.execute(
+            insert(models.Blob)
+            .values(sha256=sha256, object_key=object_key, size=size, content_type=content_type, ref_count=1)
+            .on_conflict_do_update(
+                index_elements=[models.Blob.sha256],
+                set_={"ref_count": models.Blob.ref_count + 1},
+            )
+        )
+
+    def release(self, sha256: str) -> Optional[str]:
+        # Returns the object key when this was the last reference; the
+        # caller queues it for cleanup in the same transaction
+        self.db.flush()
+        object_key = self.db.query(models.Blob.object_key).filter(models.Blob.sha256 == sha256).scalar()
+        self.db.execute(
+            update(models.Blob)
+            .where(models.Blob.sha256 == sha256)
+            .values(ref_count=models.Blob.ref_count - 1)
+        )
+        removed = self.db.execute(
+            delete(models.Blob).where(models.Blob.sha256 == sha256, models.Blob.ref_count <= 0)
+        )
+        return object_key if removed.rowcount else None
+
+    def release_all(self, references: Select) -> Dict[str, str]:
+        # references selects one sha256 per reference being dropped; the
+        # counts fall in a single statement however many rows that is.
+        # Returns object keys by sha256 for blobs left unreferenced, whose
+        # rows go away with forget() once the references are deleted.
+        ref_sha256 = references.selected_columns[0]
+        dropped = (
+            references.with_only_columns(ref_sha256.label("sha256"), func.count().label("count"))
+            .where(ref_sha256.isnot(None))
+            .group_by(ref_sha256)
+            .subquery()
+        )
+        self.db.execute(
+            update(models.Blob)
+            .where(models.Blob.sha256 == dropped.c.sha256)
+            .values(ref_count=models.Blob.ref_count - dropped.c.count)
+            .execution_options(synchronize_session=False)
+        )
+        rows = self.db.execute(
+            select(models.Blob.sha256, models.Blob.object_key)
+            .join(dropped, dropped.c.sha256 == models.Blob.sha256)
+            .where(models.Blob.ref_count <= 0)
+        )
+        return {sha256: object_key for sha256, object_key in rows}
+
+    def forget(self, sha256s: Iterable[str]):
+        sha256s = list(sha256s)
+        if sha256s:
+            self.db.execute(
+                delete(models.Blob)
+                .where(models.Blob.sha256.in_(sha256s), models.Blob.ref_count <= 0)
+                .execution_options(synchronize_session=False)
+            )
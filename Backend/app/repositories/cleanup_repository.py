@@ -0,0 +1,45 @@
+import datetime
+from typing import Iterable, List
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from app import models
+
+
+class CleanupRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def enqueue(self, object_keys: Iterable[str]):
+        now = datetime.datetime.utcnow()
+        rows = [
+            {"object_key": key, "attempts": 0, "next_attempt_at": now, "created_at": now}
+            for key in dict.fromkeys(object_keys)
+        ]
+        if rows:
+            self.db.execute(insert(models.StorageCleanup), rows)
+
+    def cancel(self, object_key: str):
+        # Called before an object is written again under a key that may be
+        # queued for removal. A worker holding the row blocks this until it
+        # has finished deleting, so the new write always lands afterwards.
+        self.db.execute(
+            delete(models.StorageCleanup)
+            .where(models.StorageCleanup.object_key == object_key)
+            .execution_options(synchronize_session=False)
+        )
+
+    def claim_due(self, limit: int) -> List[models.StorageCleanup]:
+        # Rows stay locked until the caller commits; SKIP LOCKED lets other
+        # workers take the next batch meanwhile
+        return list(self.db.scalars(
+            select(models.StorageCleanup)
+            .where(models.StorageCleanup.next_attempt_at <= datetime.datetime.utcnow())
+            .order_by(models.StorageCleanup.next_attempt_at.asc())
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ))
+
+    def count(self) -> int:
+        return self.db.scalar(select(func.count()).select_from(models.StorageCleanup)) or 0
@@ -0,0 +1,76 @@
+import datetime
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from app import models
+
+
+class TaskRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def fail_stale_exhausted(self, claim_timeout_seconds: float, max_attempts: int) -> int:
+        # A stale task that has used up its attempts most likely crashes the
+        # worker that runs it, so it is failed instead of claimed again
+        stale_before = datetime.datetime.utcnow() - datetime.timedelta(seconds=claim_timeout_seconds)
+        tasks = (
+            self.db.query(models.Task)
+            .filter(
+                models.Task.input_key.isnot(None),
+                models.Task.status == models.TaskStatus.processing,
+                models.Task.claimed_at < stale_before,
+                models.Task.attempts >= max_attempts,
+            )
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        for task in tasks:
+            task.status = models.TaskStatus.error
+            task.details = f"Worker stopped responding after {task.attempts} attempt(s)"
+        self.db.commit()
+        return len(tasks)
+
+    def claim_next_queued(self, claim_timeout_seconds: float, max_attempts: int) -> models.Task | None:
+        # SKIP LOCKED lets any number of workers, in any number of processes,
+        # poll the same table without handing one task to two of them. A task
+        # left in processing longer than the claim timeout belonged to a
+        # worker that died and is claimed again while it has attempts left.
+        # A retried task waits until its next_attempt_at.
+        now = datetime.datetime.utcnow()
+        stale_before = now - datetime.timedelta(seconds=claim_timeout_seconds)
+        task = (
+            self.db.query(models.Task)
+            .filter(models.Task.input_key.isnot(None))
+            .filter(or_(
+                and_(
+                    models.Task.status == models.TaskStatus.pending,
+                    or_(models.Task.next_attempt_at.is_(None), models.Task.next_attempt_at <= now),
+                ),
+                and_(
+                    models.Task.status == models.TaskStatus.processing,
+                    models.Task.claimed_at < stale_before,
+                    models.Task.attempts < max_attempts,
+                ),
+            ))
+            .order_by(models.Task.created_at.asc())
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if task is None:
+            self.db.rollback()
+            return None
+
+        task.status = models.TaskStatus.processing
+        task.claimed_at = now
+        task.attempts = (task.attempts or 0) + 1
+        task.details = "Detecting license plates..."
+        self.db.commit()
+        return task
+
+    def count_by_status(self, status: models.TaskStatus) -> int:
+        return (
+            self.db.query(models.Task)
+            .filter(models.Task.input_key.isnot(None), models.Task.status == status)
+            .count()
+        )
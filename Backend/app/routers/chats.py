@@ -1,15 +1,16 @@
 import math
 from datetime import datetime
 from typing import List
-from uuid import uuid4
 
 from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
-from sqlalchemy import case, func
+from sqlalchemy import case, func, select
 from sqlalchemy.orm import Session
 
 from app import database, models, schemas
 from app.routers.auth import get_current_user
-from app.storage import storage
+from app.repositories.blob_repository import BlobRepository
+from app.repositories.cleanup_repository import CleanupRepository
+from app.storage import UploadTooLarge, hash_stream, run_io, storage, store_blob
 
 router = APIRouter(prefix="/chats", tags=["chats"])
 
@@ -17,6 +18,13 @@ ALLOWED_FILE_TYPES = {"image/jpeg", "image/png", "application/pdf"}
 MAX_FILE_SIZE_BYTES = 10 * 1024 * 1024
 
 
+def _release_object(db: Session, file_meta: models.ChatFile) -> str | None:
+    # Files stored before content addressing own their object outright
+    if file_meta.blob_sha256 is None:
+        return file_meta.object_key
+    return BlobRepository(db).release(file_meta.blob_sha256)
+
+
 def _check_chat_access(chat: models.Chat | None, current_user: models.User):
     if not chat:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found")
@@ -202,13 +210,17 @@ def delete_chat(
 ):
     _check_chat_access(db.query(models.Chat).filter(models.Chat.id == chat_id).first(), current_user)
 
-    files = db.query(models.ChatFile).filter(models.ChatFile.chat_id == chat_id).all()
-    for file_meta in files:
-        try:
-            storage.delete_file(file_meta.object_key)
-        except Exception:
-            pass
-        db.delete(file_meta)
+    # A fixed number of statements however many files the chat holds; the
+    # objects themselves are removed later by the storage cleanup worker
+    blobs = BlobRepository(db)
+    released = blobs.release_all(select(models.ChatFile.blob_sha256).where(models.ChatFile.chat_id == chat_id))
+    legacy_keys = db.scalars(
+        select(models.ChatFile.object_key)
+        .where(models.ChatFile.chat_id == chat_id, models.ChatFile.blob_sha256.is_(None))
+    ).all()
+    db.query(models.ChatFile).filter(models.ChatFile.chat_id == chat_id).delete(synchronize_session=False)
+    blobs.forget(released)
+    CleanupRepository(db).enqueue([*legacy_keys, *released.values()])
 
     db.query(models.Message).filter(models.Message.chat_id == chat_id).delete()
     db.query(models.Chat).filter(models.Chat.id == chat_id).delete()
@@ -270,21 +282,31 @@ async def upload_chat_file(
     if not file.content_type or file.content_type not in ALLOWED_FILE_TYPES:
         raise HTTPException(status_code=400, detail="Unsupported file type")
 
-    content = await file.read()
-    size = len(content)
+    if file.size is not None and file.size > MAX_FILE_SIZE_BYTES:
+        raise HTTPException(status_code=400, detail="File is too large")
+    # Hash the local spool first: content already in storage is not sent
+    # again, new content is streamed to MinIO from the spool
+    try:
+        sha256, size = await run_io(hash_stream, file.file, MAX_FILE_SIZE_BYTES)
+    except UploadTooLarge:
+        raise HTTPException(status_code=400, detail="File is too large")
     if size == 0:
         raise HTTPException(status_code=400, detail="File is empty")
-    if size > MAX_FILE_SIZE_BYTES:
-        raise HTTPException(status_code=400, detail="File is too large")
 
     safe_name = (file.filename or "uploaded_file").strip() or "uploaded_file"
-    object_key = f"chat-files/{chat_id}/{uuid4()}-{safe_name}"
-    storage.upload_file(content, object_key, file.content_type)
+    object_key = await store_blob(
+        db,
+        sha256,
+        size,
+        file.content_type,
+        lambda key: run_io(storage.upload_stream, file.file, key, file.content_type, MAX_FILE_SIZE_BYTES),
+    )
 
     meta = models.ChatFile(
         chat_id=chat_id,
         uploaded_by=current_user.id,
         object_key=object_key,
+        blob_sha256=sha256,
         filename=safe_name,
         content_type=file.content_type,
         size=size,
@@ -302,12 +324,19 @@ def list_chat_files(
     db: Session = Depends(database.get_db)
 ):
     _check_chat_access(db.query(models.Chat).filter(models.Chat.id == chat_id).first(), current_user)
-    return (
+    files = (
         db.query(models.ChatFile)
         .filter(models.ChatFile.chat_id == chat_id)
         .order_by(models.ChatFile.created_at.desc(), models.ChatFile.id.desc())
         .all()
     )
+    urls = storage.get_download_urls((file_meta.object_key, file_meta.filename) for file_meta in files)
+    return [
+        schemas.ChatFileRead.model_validate(file_meta).model_copy(
+            update={"url": urls[(file_meta.object_key, file_meta.filename)]}
+        )
+        for file_meta in files
+    ]
 
 
 @router.get("/{chat_id}/files/{file_id}/download", response_model=schemas.ChatFileDownloadResponse)
@@ -326,7 +355,7 @@ def get_chat_file_download_url(
     if not file_meta:
         raise HTTPException(status_code=404, detail="File not found")
 
-    return schemas.ChatFileDownloadResponse(url=storage.get_presigned_url(file_meta.object_key))
+    return schemas.ChatFileDownloadResponse(url=storage.get_download_url(file_meta.object_key, file_meta.filename))
 
 
 @router.delete("/{chat_id}/files/{file_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -345,7 +374,9 @@ def delete_chat_file(
     if not file_meta:
         raise HTTPException(status_code=404, detail="File not found")
 
-    storage.delete_file(file_meta.object_key)
     db.delete(file_meta)
+    object_key = _release_object(db, file_meta)
+    if object_key:
+        CleanupRepository(db).enqueue([object_key])
     db.commit()
     return None
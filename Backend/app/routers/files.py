@@ -0,0 +1,59 @@
+import os
+import time
+
+from fastapi import APIRouter, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+
+from app.local_storage import LocalStorage, StoredView, parse_range
+from app.storage import ObjectNotFound, content_disposition, storage
+
+router = APIRouter(prefix="/storage", tags=["storage"])
+
+STORAGE_SERVE_CHUNK_BYTES = int(os.getenv("STORAGE_SERVE_CHUNK_BYTES", str(1024 * 1024)))
+
+
+def _chunks(view: StoredView, start: int, end: int):
+    try:
+        for offset in range(start, end, STORAGE_SERVE_CHUNK_BYTES):
+            yield view.read(offset, min(end, offset + STORAGE_SERVE_CHUNK_BYTES))
+    finally:
+        view.close()
+
+
+@router.get("/{object_key:path}")
+def get_stored_object(
+    object_key: str,
+    expires: int = Query(...),
+    signature: str = Query(...),
+    filename: str = Query(""),
+    range_header: str | None = Header(default=None, alias="Range"),
+):
+    # Serves presigned URLs of the local backend; with MinIO the URLs point
+    # at MinIO itself and this route does not exist
+    if not isinstance(storage, LocalStorage):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    if not storage.verify(object_key, expires, signature, filename):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid or expired signature")
+    try:
+        view = storage.open_view(object_key)
+    except ObjectNotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Cache-Control": f"private, max-age={max(0, expires - int(time.time()))}",
+    }
+    if filename:
+        headers["Content-Disposition"] = content_disposition(filename)
+    start, end = 0, view.size
+    byte_range = parse_range(range_header, view.size)
+    if byte_range is not None:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{view.size}"
+    headers["Content-Length"] = str(end - start)
+    return StreamingResponse(
+        _chunks(view, start, end),
+        status_code=status.HTTP_206_PARTIAL_CONTENT if byte_range else status.HTTP_200_OK,
+        media_type=view.content_type,
+        headers=headers,
+    )
@@ -1,22 +1,32 @@
+import asyncio
+import hashlib
+import json
 import os
+import posixpath
+import time
 import uuid
 import httpx
 import base64
 from io import BytesIO
-from PIL import Image, ImageDraw
-from typing import List, Optional
+from PIL import Image
+from typing import AsyncIterator, List, Optional
 
-from app import database, models
+from app import database, http_clients, models
+from app.circuit_breaker import CircuitOpenError, ml_breaker
+from app.ml_balancer import balancer
 from app.routers.auth import get_current_user
-from app.storage import storage
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
-from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from app.services import batch_service, image_output, redaction_engine, redaction_queue, video_service
+from app.services.redaction_queue import RetryableTaskError
+from app.storage import UploadTooLarge, hash_stream, run_io, storage, store_blob
+from fastapi import APIRouter, BackgroundTasks, Depends, File, Form, HTTPException, UploadFile, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.orm import Session, sessionmaker
 from pydantic import BaseModel
 
 router = APIRouter()
 
-ML_SERVICE_URL = os.getenv("ML_SERVICE_URL", "http://localhost:8001")
+REDACT_ASYNC_DEFAULT = os.getenv("REDACT_ASYNC_DEFAULT", "false").lower() == "true"
+REDACT_MAX_FILE_SIZE_BYTES = int(os.getenv("REDACT_MAX_FILE_SIZE_BYTES", str(20 * 1024 * 1024)))
 
 class BoundingBox(BaseModel):
     x1: int
@@ -42,27 +52,157 @@ class RedactResponse(BaseModel):
     redacted_image_url: Optional[str] = None
 
 async def call_ml_service(file_content: bytes, filename: str) -> DetectionResult:
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        files = {"file": (filename, file_content, "image/jpeg")}
-        response = await client.post(f"{ML_SERVICE_URL}/detect", files=files)
-        
-        if response.status_code != 200:
-            raise HTTPException(status_code=502, detail="ML service error")
-        
-        return DetectionResult(**response.json())
+    files = {"file": (filename, file_content, "image/jpeg")}
+
+    async def send(url: str) -> httpx.Response:
+        return await http_clients.ml.request("POST", f"{url}/detect", files=files)
+
+    # Fails fast with CircuitOpenError while the ML service is unhealthy
+    ml_breaker.before_call()
+    started = time.perf_counter()
+    success = False
+    try:
+        response = await balancer.request(send)
+        success = response.status_code < 500
+    except asyncio.CancelledError:
+        ml_breaker.release()
+        raise
+    except BaseException:
+        ml_breaker.record(False, time.perf_counter() - started)
+        raise
+    ml_breaker.record(success, time.perf_counter() - started)
+
+    if response.status_code != 200:
+        raise HTTPException(status_code=502, detail="ML service error")
+
+    return DetectionResult(**response.json())
+
+class VideoRedactResponse(BaseModel):
+    task_id: str
+    status: str
+
+
+async def stream_video_detections(
+    file_path: str, filename: str, content_type: str, params: Optional[dict] = None
+) -> AsyncIterator[dict]:
+    # The ML service answers with NDJSON events while it is still decoding,
+    # so there is no read timeout between events
+    timeout = http_clients.ml_timeout(read=None)
+    ml_breaker.before_call()
+    started = time.perf_counter()
+    elapsed = None
+    success = False
+    try:
+        with open(file_path, "rb") as handle:
+            files = {"file": (filename, handle, content_type)}
+            async with balancer.lease() as lease:
+                url = f"{lease.url}/detect/video"
+                async with http_clients.ml.stream("POST", url, files=files, params=params, timeout=timeout) as response:
+                    # Latency is measured to the response headers; the stream
+                    # itself lasts as long as the video does
+                    elapsed = time.perf_counter() - started
+                    lease.observe(response)
+                    success = response.status_code < 500
+                    if response.status_code != 200:
+                        raise video_service.VideoRedactionError("ML service error")
+                    try:
+                        async for line in response.aiter_lines():
+                            if line.strip():
+                                yield json.loads(line)
+                    except httpx.HTTPError:
+                        success = False
+                        raise
+    except asyncio.CancelledError:
+        ml_breaker.release()
+        raise
+    except BaseException:
+        ml_breaker.record(success, time.perf_counter() - started if elapsed is None else elapsed)
+        raise
+    ml_breaker.record(success, elapsed)
+
 
-def redact_image(image_bytes: bytes, detections: List[BoundingBox], confidence_threshold: float = 0.5) -> bytes:
+def redact_image(
+    image_bytes: bytes,
+    detections: List[BoundingBox],
+    confidence_threshold: float = 0.5,
+    mode: str = "fill",
+    output_format: str = "original",
+) -> tuple[bytes, str]:
     image = Image.open(BytesIO(image_bytes))
-    draw = ImageDraw.Draw(image)
-    
-    for det in detections:
-        if det.confidence >= confidence_threshold:
-            draw.rectangle([det.x1, det.y1, det.x2, det.y2], fill="black")
-    
-    output = BytesIO()
-    image.save(output, format="PNG")
-    output.seek(0)
-    return output.getvalue()
+    image_format = image_output.output_format(image.format, output_format)
+    if image.mode not in ("RGB", "RGBA", "L"):
+        image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+    boxes = redaction_engine.clip_boxes(
+        [(d.x1, d.y1, d.x2, d.y2) for d in detections if d.confidence >= confidence_threshold],
+        image.width,
+        image.height,
+    )
+    redaction_engine.redact_pil(image, boxes, mode)
+    return image_output.encode(image, image_format), image_format
+
+
+async def _detect_and_redact(
+    file_content: bytes,
+    filename: str,
+    confidence_threshold: float,
+    return_image: bool,
+    mode: str = "fill",
+    output_format: str = "original",
+) -> tuple[List[BoundingBox], Optional[tuple[bytes, str]]]:
+    ml_result = await call_ml_service(file_content, filename)
+    filtered_detections = [d for d in ml_result.detections if d.confidence >= confidence_threshold]
+
+    redacted = None
+    if return_image and filtered_detections:
+        redacted = await asyncio.to_thread(
+            redact_image, file_content, ml_result.detections, confidence_threshold, mode, output_format
+        )
+    return filtered_detections, redacted
+
+
+async def _store_result(db: Session, task: models.Task, redacted: Optional[tuple[bytes, str]]):
+    if redacted is None:
+        return
+    redacted_bytes, image_format = redacted
+    sha256 = hashlib.sha256(redacted_bytes).hexdigest()
+    content_type = image_output.CONTENT_TYPES[image_format]
+    task.result_key = await store_blob(
+        db,
+        sha256,
+        len(redacted_bytes),
+        content_type,
+        lambda key: run_io(storage.upload_file, redacted_bytes, key, content_type),
+    )
+    task.result_blob_sha256 = sha256
+
+
+async def process_queued_task(task: models.Task, db: Session):
+    params = json.loads(task.params or "{}")
+    file_content = await run_io(storage.download_file, task.input_key)
+    try:
+        detections, redacted = await _detect_and_redact(
+            file_content,
+            params.get("filename") or "image.jpg",
+            params.get("confidence_threshold", 0.5),
+            params.get("return_image", True),
+            params.get("mode", "fill"),
+            params.get("output_format", "original"),
+        )
+    except (httpx.RequestError, CircuitOpenError) as e:
+        raise RetryableTaskError(str(e) or "ML service unavailable") from e
+
+    await _store_result(db, task, redacted)
+    task.status = models.TaskStatus.success
+    task.result = json.dumps({"detections": [d.model_dump() for d in detections]})
+    task.details = f"Found {len(detections)} license plate(s)"
+    db.commit()
+
+
+def _check_output_format(output_format: str):
+    try:
+        image_output.output_format(None, output_format)
+    except image_output.UnsupportedOutputFormat as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/redact", response_model=RedactResponse)
@@ -70,42 +210,95 @@ async def redact_document(
     file: UploadFile = File(...),
     confidence_threshold: float = Form(0.5),
     return_image: bool = Form(True),
+    async_mode: bool = Form(REDACT_ASYNC_DEFAULT),
+    mode: str = Form("fill", pattern="^(fill|blur|pixelate)$"),
+    output_format: str = Form("original", pattern="^(original|png|jpeg|webp|avif)$"),
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(database.get_db)
 ):
     if not file.content_type or not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image")
-    
+    _check_output_format(output_format)
+    if file.size is not None and file.size > REDACT_MAX_FILE_SIZE_BYTES:
+        raise HTTPException(status_code=400, detail="File is too large")
+
     task_id = str(uuid.uuid4())
+
+    def upload_original(key: str):
+        return run_io(storage.upload_stream, file.file, key, file.content_type, REDACT_MAX_FILE_SIZE_BYTES)
+
+    if async_mode:
+        # Store the upload and leave detection to the queue workers; the
+        # client polls /logs/{task_id} for the outcome
+        try:
+            sha256, size = await run_io(hash_stream, file.file, REDACT_MAX_FILE_SIZE_BYTES)
+        except UploadTooLarge:
+            raise HTTPException(status_code=400, detail="File is too large")
+        original_key = await store_blob(db, sha256, size, file.content_type, upload_original)
+        task = models.Task(
+            id=task_id,
+            user_id=current_user.id,
+            status=models.TaskStatus.pending,
+            details="Queued for redaction",
+            input_key=original_key,
+            input_blob_sha256=sha256,
+            content_type=file.content_type,
+            params=json.dumps({
+                "filename": file.filename or "image.jpg",
+                "confidence_threshold": confidence_threshold,
+                "return_image": return_image,
+                "mode": mode,
+                "output_format": output_format,
+            }),
+        )
+        db.add(task)
+        db.commit()
+        redaction_queue.pool.wake()
+        response = RedactResponse(
+            task_id=task_id,
+            status=models.TaskStatus.pending.value,
+            detections_count=0,
+            detections=[],
+        )
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=response.model_dump())
+
     file_content = await file.read()
-    
+    if len(file_content) > REDACT_MAX_FILE_SIZE_BYTES:
+        raise HTTPException(status_code=400, detail="File is too large")
+    await file.seek(0)
+    sha256 = hashlib.sha256(file_content).hexdigest()
     task = models.Task(
         id=task_id,
         user_id=current_user.id,
         status=models.TaskStatus.processing,
-        details="Detecting license plates..."
+        details="Detecting license plates...",
+        content_type=file.content_type,
     )
     db.add(task)
     db.commit()
     
     try:
-        ml_result = await call_ml_service(file_content, file.filename or "image.jpg")
+        # Store the original (unless the same bytes are stored already)
+        # while the ML service works
+        store_original = asyncio.ensure_future(
+            store_blob(db, sha256, len(file_content), file.content_type, upload_original)
+        )
+        try:
+            filtered_detections, redacted = await _detect_and_redact(
+                file_content, file.filename or "image.jpg", confidence_threshold, return_image, mode, output_format
+            )
+        finally:
+            # The stored original holds a blob reference; the task takes it
+            # on every path, so a failed ML call does not leak it
+            await asyncio.gather(store_original, return_exceptions=True)
+            if not store_original.cancelled() and store_original.exception() is None:
+                task.input_key = store_original.result()
+                task.input_blob_sha256 = sha256
+        store_original.result()
+        await _store_result(db, task, redacted)
 
-        # Upload original image to MinIO
-        original_filename = f"{task_id}/original.jpg" # Assuming jpeg/png, strictly we should check mime type
-        storage.upload_file(file_content, original_filename, file.content_type or "image/jpeg")
-        original_image_url = storage.get_presigned_url(original_filename)
-        
-        filtered_detections = [d for d in ml_result.detections if d.confidence >= confidence_threshold]
-        
-        redacted_image_url = None
-        if return_image and filtered_detections:
-            redacted_bytes = redact_image(file_content, ml_result.detections, confidence_threshold)
-            
-            # Upload to MinIO
-            object_name = f"{task_id}/redacted.png"
-            storage.upload_file(redacted_bytes, object_name, "image/png")
-            redacted_image_url = storage.get_presigned_url(object_name)
+        original_image_url = storage.get_presigned_url(task.input_key)
+        redacted_image_url = storage.get_presigned_url(task.result_key) if task.result_key else None
         
         task.status = models.TaskStatus.success
         task.details = f"Found {len(filtered_detections)} license plate(s)"
@@ -126,6 +319,15 @@ async def redact_document(
         task.details = f"ML service unavailable: {str(e)}"
         db.commit()
         raise HTTPException(status_code=503, detail="ML service unavailable")
+    except CircuitOpenError as e:
+        task.status = models.TaskStatus.error
+        task.details = "ML service unavailable: circuit breaker is open"
+        db.commit()
+        raise HTTPException(
+            status_code=503,
+            detail="ML service unavailable",
+            headers={"Retry-After": str(max(1, round(e.retry_after)))},
+        )
     except Exception as e:
         task.status = models.TaskStatus.error
         task.details = f"Processing error: {str(e)}"
@@ -133,6 +335,222 @@ async def redact_document(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _batch_zip_stream(
+    task_id: str,
+    items: List[batch_service.BatchItem],
+    confidence_threshold: float,
+    mode: str,
+    output_format: str,
+    session_factory: sessionmaker,
+):
+    async def process(content: bytes, filename: str):
+        ml_result = await call_ml_service(content, posixpath.basename(filename))
+        detections = [d for d in ml_result.detections if d.confidence >= confidence_threshold]
+        redacted, image_format = await asyncio.to_thread(
+            redact_image, content, ml_result.detections, confidence_threshold, mode, output_format
+        )
+        return [d.model_dump() for d in detections], redacted, image_output.EXTENSIONS[image_format]
+
+    summary = {}
+
+    def finish(results: List[batch_service.BatchResult]):
+        summary["succeeded"] = sum(1 for result in results if result.error is None)
+        summary["failed"] = len(results) - summary["succeeded"]
+        summary["detections"] = sum(len(result.detections) for result in results)
+
+    try:
+        async for chunk in batch_service.stream_batch(
+            items, process, manifest_extra={"task_id": task_id}, on_finish=finish
+        ):
+            yield chunk
+    finally:
+        db = session_factory()
+        try:
+            task = db.query(models.Task).filter(models.Task.id == task_id).first()
+            if summary:
+                task.status = models.TaskStatus.success
+                task.details = (
+                    f"Redacted {summary['succeeded']} of {len(items)} image(s), "
+                    f"{summary['detections']} license plate(s), {summary['failed']} failed"
+                )
+            else:
+                task.status = models.TaskStatus.error
+                task.details = "Batch stream was interrupted"
+            db.commit()
+        finally:
+            db.close()
+
+
+@router.post("/redact/batch")
+async def redact_batch(
+    files: List[UploadFile] = File(...),
+    confidence_threshold: float = Form(0.5),
+    mode: str = Form("fill", pattern="^(fill|blur|pixelate)$"),
+    output_format: str = Form("original", pattern="^(original|png|jpeg|webp|avif)$"),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    _check_output_format(output_format)
+    items: List[batch_service.BatchItem] = []
+    for upload in files:
+        if batch_service.is_zip_upload(upload.filename, upload.content_type):
+            try:
+                items.extend(batch_service.zip_items(upload.file))
+            except batch_service.BatchInputError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        elif upload.content_type and upload.content_type.startswith("image/"):
+            items.append(batch_service.BatchItem(
+                source=batch_service.safe_name(upload.filename or "image"),
+                read=upload.file.read,
+            ))
+        else:
+            raise HTTPException(status_code=400, detail="Files must be images or a ZIP archive")
+    if not items:
+        raise HTTPException(status_code=400, detail="No images to redact")
+    if len(items) > batch_service.BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Too many images (max {batch_service.BATCH_MAX_FILES})")
+
+    task_id = str(uuid.uuid4())
+    task = models.Task(
+        id=task_id,
+        user_id=current_user.id,
+        status=models.TaskStatus.processing,
+        details=f"Redacting {len(items)} image(s)..."
+    )
+    db.add(task)
+    db.commit()
+
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+    # The archive streams for as long as the batch takes; give the
+    # connection back now
+    db.close()
+    return StreamingResponse(
+        _batch_zip_stream(task_id, items, confidence_threshold, mode, output_format, session_factory),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="redacted-{task_id}.zip"',
+            "X-Task-Id": task_id,
+        },
+    )
+
+
+async def _store_file(db: Session, path: str, content_type: str) -> tuple[str, str]:
+    with open(path, "rb") as handle:
+        sha256, size = await run_io(hash_stream, handle)
+    object_key = await store_blob(
+        db, sha256, size, content_type, lambda key: run_io(storage.upload_path, path, key, content_type)
+    )
+    return object_key, sha256
+
+
+async def _run_video_task(
+    task_id: str,
+    source_path: str,
+    filename: str,
+    content_type: str,
+    confidence_threshold: float,
+    detection_params: dict,
+    session_factory: sessionmaker,
+):
+    db = session_factory()
+    output_path = f"{source_path}.redacted.mp4"
+    task = db.query(models.Task).filter(models.Task.id == task_id).first()
+
+    async def report_progress(done: int, total: int):
+        task.progress = min(99, int(done * 100 / total)) if total else None
+        task.details = f"Processed {done}/{total or '?'} frame(s)"
+        await asyncio.to_thread(db.commit)
+
+    try:
+        task.status = models.TaskStatus.processing
+        task.progress = 0
+        task.details = "Redacting video..."
+        db.commit()
+
+        task.input_key, task.input_blob_sha256 = await _store_file(db, source_path, content_type)
+        db.commit()
+
+        stats = await video_service.redact_video(
+            source_path,
+            output_path,
+            stream_video_detections(source_path, filename, content_type, detection_params),
+            confidence_threshold,
+            report_progress,
+        )
+
+        task.result_key, task.result_blob_sha256 = await _store_file(db, output_path, "video/mp4")
+        task.status = models.TaskStatus.success
+        task.progress = 100
+        task.details = f"Redacted {stats.frames} frame(s), {stats.detections} license plate detection(s)"
+        db.commit()
+    except httpx.RequestError as e:
+        task.status = models.TaskStatus.error
+        task.details = f"ML service unavailable: {str(e)}"
+        db.commit()
+    except CircuitOpenError:
+        task.status = models.TaskStatus.error
+        task.details = "ML service unavailable: circuit breaker is open"
+        db.commit()
+    except Exception as e:
+        task.status = models.TaskStatus.error
+        task.details = f"Processing error: {str(e)}"
+        db.commit()
+    finally:
+        db.close()
+        for path in (source_path, output_path):
+            if os.path.exists(path):
+                os.unlink(path)
+
+
+@router.post("/redact/video", response_model=VideoRedactResponse, status_code=status.HTTP_202_ACCEPTED)
+async def redact_video(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    confidence_threshold: float = Form(0.5),
+    detection_mode: str = Form("per_frame", pattern="^(per_frame|tracking)$"),
+    keyframe_interval: Optional[int] = Form(None, ge=1, le=300),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    if not file.content_type or not file.content_type.startswith("video/"):
+        raise HTTPException(status_code=400, detail="File must be a video")
+
+    suffix = os.path.splitext(file.filename or "")[1]
+    try:
+        source_path = await asyncio.to_thread(video_service.spool_to_disk, file.file, suffix)
+    except video_service.VideoRedactionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    task_id = str(uuid.uuid4())
+    task = models.Task(
+        id=task_id,
+        user_id=current_user.id,
+        status=models.TaskStatus.pending,
+        progress=0,
+        details="Queued for video redaction"
+    )
+    db.add(task)
+    db.commit()
+
+    detection_params = {"mode": detection_mode}
+    if keyframe_interval is not None:
+        detection_params["keyframe_interval"] = keyframe_interval
+
+    # The background job outlives this request, so it gets its own session
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+    background_tasks.add_task(
+        _run_video_task,
+        task_id,
+        source_path,
+        file.filename or f"video{suffix or '.mp4'}",
+        file.content_type,
+        confidence_threshold,
+        detection_params,
+        session_factory,
+    )
+    return VideoRedactResponse(task_id=task_id, status=models.TaskStatus.pending.value)
+
+
 @router.get("/entities")
 def get_entities(current_user: models.User = Depends(get_current_user)):
     return {
@@ -152,8 +570,13 @@ def get_task_log(
     if current_user.role != "admin" and task.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
 
+    result = json.loads(task.result) if task.result else {}
     return {
         "task_id": task_id,
         "status": task.status.value,
-        "details": task.details
+        "details": task.details,
+        "progress": task.progress,
+        "result_url": storage.get_presigned_url(task.result_key) if task.result_key else None,
+        "original_url": storage.get_presigned_url(task.input_key) if task.input_key else None,
+        "detections": result.get("detections"),
     }
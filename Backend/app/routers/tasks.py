@@ -0,0 +1,88 @@
+import asyncio
+import json
+import os
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import database, models
+from app.routers.auth import get_current_user
+from app.services.task_events import TERMINAL_STATUSES, broker, task_snapshot
+
+router = APIRouter(prefix="/tasks", tags=["tasks"])
+
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+# Safety net for missed notifications (listener reconnecting, other process
+# without Postgres): re-read the task this rarely while nothing arrives
+SSE_FALLBACK_POLL_SECONDS = float(os.getenv("SSE_FALLBACK_POLL_SECONDS", "30"))
+
+
+def _format_event(payload: dict, event_id: int) -> str:
+    return f"id: {event_id}\nevent: status\ndata: {json.dumps(payload)}\n\n"
+
+
+def _read_snapshot(session_factory: sessionmaker, task_id: str) -> dict | None:
+    db = session_factory()
+    try:
+        task = db.query(models.Task).filter(models.Task.id == task_id).first()
+        return task_snapshot(task) if task else None
+    finally:
+        db.close()
+
+
+async def _task_event_stream(task_id: str, snapshot: dict, queue: asyncio.Queue, session_factory: sessionmaker):
+    event_id = 1
+    last = snapshot
+    try:
+        yield f"retry: {int(SSE_HEARTBEAT_SECONDS * 1000)}\n" + _format_event(snapshot, event_id)
+        last_poll = time.monotonic()
+        while last["status"] not in TERMINAL_STATUSES:
+            try:
+                payload = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                payload = None
+                if time.monotonic() - last_poll >= SSE_FALLBACK_POLL_SECONDS:
+                    last_poll = time.monotonic()
+                    payload = await asyncio.to_thread(_read_snapshot, session_factory, task_id)
+                if payload is None or payload == last:
+                    yield ": ping\n\n"
+                    continue
+            if payload == last:
+                continue
+            event_id += 1
+            last = payload
+            yield _format_event(payload, event_id)
+    finally:
+        broker.unsubscribe(task_id, queue)
+
+
+@router.get("/{task_id}/events")
+async def task_events(
+    task_id: str,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(database.get_db),
+):
+    # Subscribe before reading the current state so no transition falls
+    # between the two
+    queue = broker.subscribe(task_id)
+    try:
+        task = db.query(models.Task).filter(models.Task.id == task_id).first()
+        if not task:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
+        if current_user.role != "admin" and task.user_id != current_user.id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions")
+        snapshot = task_snapshot(task)
+    except BaseException:
+        broker.unsubscribe(task_id, queue)
+        raise
+
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+    # The stream can stay open for minutes; give the connection back now
+    db.close()
+    return StreamingResponse(
+        _task_event_stream(task_id, snapshot, queue, session_factory),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
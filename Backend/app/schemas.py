@@ -109,6 +109,7 @@ class ChatFileRead(BaseModel):
     content_type: str
     size: int
     created_at: datetime
+    url: Optional[str] = None
 
     model_config = ConfigDict(from_attributes=True)
 
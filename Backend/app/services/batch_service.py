@@ -0,0 +1,188 @@
+import asyncio
+import json
+import os
+import posixpath
+import zipfile
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Iterable, List, Optional, Tuple
+
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "500"))
+BATCH_MAX_FILE_SIZE_BYTES = int(os.getenv("BATCH_MAX_FILE_SIZE_BYTES", str(20 * 1024 * 1024)))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff"}
+ZIP_CONTENT_TYPES = {"application/zip", "application/x-zip-compressed"}
+MANIFEST_NAME = "manifest.json"
+
+
+class BatchInputError(Exception):
+    pass
+
+
+@dataclass
+class BatchItem:
+    source: str
+    read: Callable[[], bytes]
+    size: Optional[int] = None
+
+
+@dataclass
+class BatchResult:
+    source: str
+    output: Optional[str] = None
+    detections: List[dict] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+# Takes the image bytes and its name, returns the detections and the
+# redacted image with the extension it should be stored under
+ProcessImage = Callable[[bytes, str], Awaitable[Tuple[List[dict], bytes, str]]]
+
+
+def is_zip_upload(filename: str, content_type: Optional[str]) -> bool:
+    return content_type in ZIP_CONTENT_TYPES or (filename or "").lower().endswith(".zip")
+
+
+def safe_name(name: str) -> str:
+    parts = [part for part in posixpath.normpath(name.replace("\\", "/")).split("/") if part not in ("", ".", "..")]
+    return "/".join(parts) or "image"
+
+
+def zip_items(fileobj, max_files: int = BATCH_MAX_FILES) -> List[BatchItem]:
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile as exc:
+        raise BatchInputError("Invalid ZIP archive") from exc
+    infos = [
+        info for info in archive.infolist()
+        if not info.is_dir() and posixpath.splitext(info.filename)[1].lower() in IMAGE_SUFFIXES
+    ]
+    if len(infos) > max_files:
+        raise BatchInputError(f"Too many images in archive (max {max_files})")
+    # ZipFile serialises reads on the shared file object, so members can be
+    # read from worker threads one after another
+    return [
+        BatchItem(source=safe_name(info.filename), read=lambda info=info: archive.read(info), size=info.file_size)
+        for info in infos
+    ]
+
+
+class _ChunkSink:
+    # Write-only target for ZipFile: without tell/seek the archive is written
+    # with data descriptors, so every finished entry can be sent right away
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ZipStream:
+    def __init__(self):
+        self._sink = _ChunkSink()
+        self._archive = zipfile.ZipFile(self._sink, mode="w", compression=zipfile.ZIP_STORED)
+        self._names = {MANIFEST_NAME}
+
+    def unique_name(self, name: str) -> str:
+        stem, suffix = posixpath.splitext(name)
+        candidate, counter = name, 1
+        while candidate in self._names:
+            candidate = f"{stem}-{counter}{suffix}"
+            counter += 1
+        self._names.add(candidate)
+        return candidate
+
+    def add(self, name: str, data: bytes) -> bytes:
+        self._archive.writestr(name, data)
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._archive.close()
+        return self._sink.drain()
+
+
+async def _process_item(item: BatchItem, process: ProcessImage, max_size: int) -> Tuple[BatchResult, Optional[bytes]]:
+    result = BatchResult(source=item.source)
+    if item.size is not None and item.size > max_size:
+        result.error = "File is too large"
+        return result, None
+    try:
+        content = await asyncio.to_thread(item.read)
+        if len(content) > max_size:
+            result.error = "File is too large"
+            return result, None
+        result.detections, redacted, extension = await process(content, item.source)
+    except Exception as exc:
+        result.error = str(exc) or exc.__class__.__name__
+        return result, None
+    result.output = posixpath.splitext(item.source)[0] + extension
+    return result, redacted
+
+
+async def stream_batch(
+    items: Iterable[BatchItem],
+    process: ProcessImage,
+    concurrency: int = BATCH_CONCURRENCY,
+    max_size: int = BATCH_MAX_FILE_SIZE_BYTES,
+    manifest_extra: Optional[dict] = None,
+    on_finish: Optional[Callable[[List[BatchResult]], None]] = None,
+) -> AsyncIterator[bytes]:
+    # At most `concurrency` images are read, detected or waiting to be
+    # written at a time; each finished one goes into the ZIP and out to the
+    # client before the next is started, so memory does not grow with the
+    # size of the batch
+    zip_stream = ZipStream()
+    pending = {}
+    results: List[Optional[BatchResult]] = []
+    queue = iter(enumerate(items))
+
+    def start_next() -> bool:
+        entry = next(queue, None)
+        if entry is None:
+            return False
+        index, item = entry
+        results.append(None)
+        pending[asyncio.ensure_future(_process_item(item, process, max_size))] = index
+        return True
+
+    try:
+        while len(pending) < max(1, concurrency) and start_next():
+            pass
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index = pending.pop(task)
+                result, redacted = task.result()
+                if redacted is not None:
+                    result.output = zip_stream.unique_name(result.output)
+                    yield zip_stream.add(result.output, redacted)
+                results[index] = result
+                start_next()
+
+        finished = [result for result in results if result is not None]
+        manifest = {
+            **(manifest_extra or {}),
+            "total": len(finished),
+            "succeeded": sum(1 for result in finished if result.error is None),
+            "failed": sum(1 for result in finished if result.error is not None),
+            "files": [
+                {"source": r.source, "output": r.output, "detections": r.detections, "error": r.error}
+                for r in finished
+            ],
+        }
+        yield zip_stream.add(MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2).encode())
+        yield zip_stream.close()
+        if on_finish is not None:
+            on_finish(finished)
+    finally:
+        for task in pending:
+            task.cancel()
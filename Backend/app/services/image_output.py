@@ -0,0 +1,58 @@
+import os
+from io import BytesIO
+from typing import Optional
+
+from PIL import Image
+
+try:
+    # AVIF encoding needs Pillow >= 11.2 or the pillow-avif-plugin package
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+# "original" keeps the codec of the upload; WebP and AVIF are opt-in
+OUTPUT_FORMATS = ("original", "png", "jpeg", "webp", "avif")
+REDACTION_JPEG_QUALITY = int(os.getenv("REDACTION_JPEG_QUALITY", "90"))
+REDACTION_WEBP_QUALITY = int(os.getenv("REDACTION_WEBP_QUALITY", "85"))
+REDACTION_AVIF_QUALITY = int(os.getenv("REDACTION_AVIF_QUALITY", "70"))
+REDACTION_PNG_COMPRESS_LEVEL = int(os.getenv("REDACTION_PNG_COMPRESS_LEVEL", "6"))
+
+EXTENSIONS = {"PNG": ".png", "JPEG": ".jpg", "WEBP": ".webp", "AVIF": ".avif"}
+CONTENT_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp", "AVIF": "image/avif"}
+
+
+class UnsupportedOutputFormat(ValueError):
+    pass
+
+
+def avif_supported() -> bool:
+    Image.init()
+    return "AVIF" in Image.SAVE
+
+
+def output_format(source_format: Optional[str], requested: str = "original") -> str:
+    if requested not in OUTPUT_FORMATS:
+        raise UnsupportedOutputFormat(f"Unknown output format: {requested}")
+    if requested == "original":
+        # Lossy stays lossy and lossless stays lossless; anything else
+        # (BMP, TIFF, GIF...) is stored as PNG
+        return source_format if source_format in ("JPEG", "PNG", "WEBP") else "PNG"
+    if requested == "avif" and not avif_supported():
+        raise UnsupportedOutputFormat("AVIF output is not available on this server")
+    return requested.upper()
+
+
+def encode(image: Image.Image, image_format: str) -> bytes:
+    output = BytesIO()
+    if image_format == "JPEG":
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.save(output, format="JPEG", quality=REDACTION_JPEG_QUALITY, optimize=True)
+    elif image_format == "WEBP":
+        image.save(output, format="WEBP", quality=REDACTION_WEBP_QUALITY, method=4)
+    elif image_format == "AVIF":
+        image.save(output, format="AVIF", quality=REDACTION_AVIF_QUALITY)
+    else:
+        image.save(output, format="PNG", compress_level=REDACTION_PNG_COMPRESS_LEVEL)
+    return output.getvalue()
+
@@ -0,0 +1,160 @@
+import asyncio
+import datetime
+import os
+from typing import Awaitable, Callable, List, Optional
+
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import models
+from app.repositories.task_repository import TaskRepository
+
+REDACTION_WORKERS = int(os.getenv("REDACTION_WORKERS", "2"))
+REDACTION_POLL_INTERVAL_SECONDS = float(os.getenv("REDACTION_POLL_INTERVAL_SECONDS", "1.0"))
+REDACTION_CLAIM_TIMEOUT_SECONDS = float(os.getenv("REDACTION_CLAIM_TIMEOUT_SECONDS", "300"))
+REDACTION_MAX_ATTEMPTS = int(os.getenv("REDACTION_MAX_ATTEMPTS", "3"))
+# A task that failed on an unavailable ML service is retried after
+# BASE * 2^(attempts - 1) seconds, capped at MAX, so the attempts outlast
+# an open circuit breaker instead of being spent within seconds
+REDACTION_RETRY_BASE_SECONDS = float(os.getenv("REDACTION_RETRY_BASE_SECONDS", "15"))
+REDACTION_RETRY_MAX_SECONDS = float(os.getenv("REDACTION_RETRY_MAX_SECONDS", "300"))
+
+
+def retry_delay(attempts: int) -> float:
+    return min(REDACTION_RETRY_MAX_SECONDS, REDACTION_RETRY_BASE_SECONDS * 2 ** max(0, attempts - 1))
+
+
+class RetryableTaskError(Exception):
+    pass
+
+
+ProcessTask = Callable[[models.Task, Session], Awaitable[None]]
+
+
+class RedactionWorkerPool:
+    # Every Backend process runs its own pool; they coordinate only through
+    # the tasks table, so adding replicas adds workers
+    def __init__(
+        self,
+        concurrency: int = REDACTION_WORKERS,
+        poll_interval: float = REDACTION_POLL_INTERVAL_SECONDS,
+        claim_timeout: float = REDACTION_CLAIM_TIMEOUT_SECONDS,
+        max_attempts: int = REDACTION_MAX_ATTEMPTS,
+    ):
+        self.concurrency = max(0, concurrency)
+        self.poll_interval = poll_interval
+        self.claim_timeout = claim_timeout
+        self.max_attempts = max(1, max_attempts)
+        self.session_factory: Optional[sessionmaker] = None
+        self.process: Optional[ProcessTask] = None
+        self.busy = 0
+        self.processed = 0
+        self.failed = 0
+        self.retried = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._workers: List[asyncio.Task] = []
+
+    def configure(self, session_factory: sessionmaker, process: ProcessTask):
+        self.session_factory = session_factory
+        self.process = process
+
+    def _claim(self) -> tuple:
+        db = self.session_factory()
+        try:
+            repository = TaskRepository(db)
+            self.failed += repository.fail_stale_exhausted(self.claim_timeout, self.max_attempts)
+            task = repository.claim_next_queued(self.claim_timeout, self.max_attempts)
+        except Exception:
+            db.close()
+            raise
+        return db, task
+
+    async def run_once(self) -> bool:
+        db, task = await asyncio.to_thread(self._claim)
+        if task is None:
+            db.close()
+            return False
+
+        self.busy += 1
+        try:
+            await self.process(task, db)
+            self.processed += 1
+        except RetryableTaskError as exc:
+            if task.attempts < self.max_attempts:
+                task.status = models.TaskStatus.pending
+                task.next_attempt_at = datetime.datetime.utcnow() + datetime.timedelta(
+                    seconds=retry_delay(task.attempts)
+                )
+                task.details = f"Retrying after error: {exc}"
+                self.retried += 1
+            else:
+                task.status = models.TaskStatus.error
+                task.details = f"ML service unavailable: {exc}"
+                self.failed += 1
+            db.commit()
+            raise
+        except Exception as exc:
+            task.status = models.TaskStatus.error
+            task.details = f"Processing error: {exc}"
+            db.commit()
+            self.failed += 1
+        finally:
+            self.busy -= 1
+            db.close()
+        return True
+
+    async def _worker(self):
+        while True:
+            try:
+                if await self.run_once():
+                    continue
+            except RetryableTaskError:
+                pass
+            except Exception as exc:
+                print(f"Redaction worker error: {exc}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self):
+        if self._workers or self.process is None:
+            return
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def metrics(self) -> dict:
+        return {
+            "workers": len(self._workers),
+            "busy": self.busy,
+            "processed": self.processed,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+
+
+pool = RedactionWorkerPool()
+
+
+async def _run_standalone():
+    from app.database import SessionLocal
+    from app.routers.redact import process_queued_task
+
+    pool.configure(SessionLocal, process_queued_task)
+    pool.start()
+    await asyncio.gather(*pool._workers)
+
+
+if __name__ == "__main__":
+    # Dedicated worker process: python -m app.services.redaction_queue
+    asyncio.run(_run_standalone())
@@ -0,0 +1,114 @@
+import asyncio
+import datetime
+import os
+from typing import Optional
+
+from sqlalchemy import delete
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.repositories.cleanup_repository import CleanupRepository
+from app.storage import StorageBackend, run_io
+
+STORAGE_CLEANUP_BATCH_SIZE = int(os.getenv("STORAGE_CLEANUP_BATCH_SIZE", "1000"))
+STORAGE_CLEANUP_POLL_INTERVAL_SECONDS = float(os.getenv("STORAGE_CLEANUP_POLL_INTERVAL_SECONDS", "5"))
+# Failed deletes are retried after BASE * 2^(attempts - 1) seconds, capped at MAX
+STORAGE_CLEANUP_RETRY_BASE_SECONDS = float(os.getenv("STORAGE_CLEANUP_RETRY_BASE_SECONDS", "10"))
+STORAGE_CLEANUP_RETRY_MAX_SECONDS = float(os.getenv("STORAGE_CLEANUP_RETRY_MAX_SECONDS", "3600"))
+
+
+def retry_delay(attempts: int) -> float:
+    return min(STORAGE_CLEANUP_RETRY_MAX_SECONDS, STORAGE_CLEANUP_RETRY_BASE_SECONDS * 2 ** max(0, attempts - 1))
+
+
+class StorageCleanupWorker:
+    # Removes objects queued in storage_cleanup, a batch per multi-object
+    # delete. Requests only insert rows, so dropping a chat never waits on
+    # MinIO and a MinIO outage delays cleanup instead of failing requests.
+    def __init__(
+        self,
+        batch_size: int = STORAGE_CLEANUP_BATCH_SIZE,
+        poll_interval: float = STORAGE_CLEANUP_POLL_INTERVAL_SECONDS,
+    ):
+        self.batch_size = max(1, batch_size)
+        self.poll_interval = poll_interval
+        self.session_factory: Optional[sessionmaker] = None
+        self.storage: Optional[StorageBackend] = None
+        self.deleted = 0
+        self.failed = 0
+        self._worker: Optional[asyncio.Task] = None
+
+    def configure(self, session_factory: sessionmaker, storage: StorageBackend):
+        self.session_factory = session_factory
+        self.storage = storage
+
+    def _run_batch(self) -> int:
+        # Claim, delete and record in one transaction: the rows stay locked
+        # while their objects are removed, which is what lets an upload of
+        # the same key wait for the delete instead of racing it
+        db = self.session_factory()
+        try:
+            rows = CleanupRepository(db).claim_due(self.batch_size)
+            if not rows:
+                db.rollback()
+                return 0
+            failed = self.storage.delete_files(row.object_key for row in rows)
+            now = datetime.datetime.utcnow()
+            done = []
+            for row in rows:
+                error = failed.get(row.object_key)
+                if error is None:
+                    done.append(row.id)
+                    continue
+                row.attempts += 1
+                row.last_error = error
+                row.next_attempt_at = now + datetime.timedelta(seconds=retry_delay(row.attempts))
+            if done:
+                db.execute(
+                    delete(models.StorageCleanup)
+                    .where(models.StorageCleanup.id.in_(done))
+                    .execution_options(synchronize_session=False)
+                )
+            db.commit()
+            self.deleted += len(done)
+            self.failed += len(rows) - len(done)
+            return len(rows)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def run_once(self) -> int:
+        return await run_io(self._run_batch)
+
+    async def _run(self):
+        while True:
+            try:
+                if await self.run_once() >= self.batch_size:
+                    continue
+            except Exception as exc:
+                print(f"Storage cleanup error: {exc}")
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        if self._worker is not None or self.storage is None:
+            return
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        await asyncio.gather(self._worker, return_exceptions=True)
+        self._worker = None
+
+    def metrics(self) -> dict:
+        return {
+            "running": self._worker is not None,
+            "deleted": self.deleted,
+            "failed": self.failed,
+        }
+
+
+worker = StorageCleanupWorker()
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import os
+import select
+import threading
+from collections import defaultdict
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app import models
+
+TASK_EVENTS_CHANNEL = os.getenv("TASK_EVENTS_CHANNEL", "task_events")
+TASK_EVENTS_QUEUE_SIZE = int(os.getenv("TASK_EVENTS_QUEUE_SIZE", "8"))
+# Postgres rejects NOTIFY payloads of 8000 bytes or more, and a failed
+# pg_notify fails the flush that carries the task change with it
+TASK_EVENTS_MAX_DETAILS_BYTES = int(os.getenv("TASK_EVENTS_MAX_DETAILS_BYTES", "4000"))
+_LISTEN_RECONNECT_SECONDS = 5.0
+
+TERMINAL_STATUSES = {models.TaskStatus.success.value, models.TaskStatus.error.value}
+
+
+def task_snapshot(task: models.Task) -> dict:
+    return {
+        "task_id": task.id,
+        "status": task.status.value if task.status else None,
+        "progress": task.progress,
+        "details": task.details,
+    }
+
+
+def notify_payload(payload: dict) -> str:
+    details = payload.get("details")
+    if details:
+        encoded = details.encode()
+        if len(encoded) > TASK_EVENTS_MAX_DETAILS_BYTES:
+            payload = {**payload, "details": encoded[:TASK_EVENTS_MAX_DETAILS_BYTES].decode(errors="ignore")}
+    return json.dumps(payload, ensure_ascii=False)
+
+
+class TaskEventBroker:
+    # Subscribers are plain asyncio queues keyed by task id, so an idle
+    # subscriber costs a queue and nothing else. Events reach them either
+    # through Postgres LISTEN/NOTIFY (all Backend processes see every task
+    # change) or, without Postgres or while the listener is down, straight
+    # from the committing session in this process.
+    def __init__(self, channel: str = TASK_EVENTS_CHANNEL, queue_size: int = TASK_EVENTS_QUEUE_SIZE):
+        self.channel = channel
+        self.queue_size = queue_size
+        self.listening = False
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self._subscribers: Dict[str, Set[Tuple[asyncio.Queue, asyncio.AbstractEventLoop]]] = defaultdict(set)
+        self._lock = threading.Lock()
+        self._listener: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def subscribe(self, task_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers[task_id].add((queue, asyncio.get_running_loop()))
+        return queue
+
+    def unsubscribe(self, task_id: str, queue: asyncio.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(task_id)
+            if subscribers is None:
+                return
+            subscribers.difference_update({entry for entry in subscribers if entry[0] is queue})
+            if not subscribers:
+                del self._subscribers[task_id]
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def _offer(self, queue: asyncio.Queue, payload: dict):
+        # Only the latest state matters, so a slow reader loses old events
+        # rather than holding memory for them
+        if queue.full():
+            queue.get_nowait()
+            self.dropped += 1
+        queue.put_nowait(payload)
+        self.delivered += 1
+
+    def dispatch(self, payload: dict):
+        with self._lock:
+            subscribers = list(self._subscribers.get(payload.get("task_id"), ()))
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, payload)
+            except RuntimeError:
+                self.unsubscribe(payload.get("task_id"), queue)
+
+    def _listen(self, engine: Engine):
+        while not self._stopping.is_set():
+            connection = None
+            try:
+                connection = engine.raw_connection()
+                driver_connection = connection.driver_connection
+                driver_connection.autocommit = True
+                with driver_connection.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.channel}"')
+                self.listening = True
+                while not self._stopping.is_set():
+                    if not select.select([driver_connection], [], [], 1.0)[0]:
+                        continue
+                    driver_connection.poll()
+                    while driver_connection.notifies:
+                        notify = driver_connection.notifies.pop(0)
+                        self.dispatch(json.loads(notify.payload))
+            except Exception as exc:
+                print(f"Task events listener error: {exc}")
+            finally:
+                self.listening = False
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+            self._stopping.wait(_LISTEN_RECONNECT_SECONDS)
+
+    def start(self, engine: Engine):
+        if self._listener is not None or engine.dialect.name != "postgresql":
+            return
+        self._stopping.clear()
+        self._listener = threading.Thread(target=self._listen, args=(engine,), name="task-events", daemon=True)
+        self._listener.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._listener is not None:
+            self._listener.join(timeout=5)
+            self._listener = None
+
+    def metrics(self) -> dict:
+        return {
+            "listening": self.listening,
+            "subscribers": self.subscriber_count(),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+
+broker = TaskEventBroker()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_task_changes(session: Session, flush_context):
+    changed = [
+        obj for obj in list(session.new) + list(session.dirty)
+        if isinstance(obj, models.Task)
+        and any(inspect(obj).attrs[name].history.has_changes() for name in ("status", "progress", "details"))
+    ]
+    if not changed:
+        return
+    payloads = [task_snapshot(task) for task in changed]
+    broker.published += len(payloads)
+    connection = session.connection()
+    if connection.dialect.name == "postgresql":
+        # Delivered by Postgres on commit and dropped on rollback
+        for payload in payloads:
+            connection.execute(text("SELECT pg_notify(:channel, :payload)"), {
+                "channel": broker.channel,
+                "payload": notify_payload(payload),
+            })
+        if broker.listening:
+            return
+    session.info.setdefault("task_events", {}).update({payload["task_id"]: payload for payload in payloads})
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_task_changes(session: Session):
+    payloads = session.info.pop("task_events", None)
+    for payload in (payloads or {}).values():
+        broker.dispatch(payload)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_task_changes(session: Session):
+    session.info.pop("task_events", None)
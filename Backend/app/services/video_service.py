@@ -0,0 +1,136 @@
+import asyncio
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, BinaryIO, Callable, List
+
+import cv2
+import numpy as np
+
+from app.services.redaction_engine import clip_boxes, redact_array
+
+MAX_VIDEO_SIZE_BYTES = int(os.getenv("MAX_VIDEO_SIZE_BYTES", str(500 * 1024 * 1024)))
+VIDEO_CHUNK_FRAMES = int(os.getenv("VIDEO_CHUNK_FRAMES", "16"))
+VIDEO_PROGRESS_INTERVAL_SECONDS = float(os.getenv("VIDEO_PROGRESS_INTERVAL_SECONDS", "1.0"))
+
+
+class VideoRedactionError(Exception):
+    pass
+
+
+class VideoTooLargeError(VideoRedactionError):
+    pass
+
+
+@dataclass
+class VideoRedactionStats:
+    frames: int
+    detections: int
+
+
+def spool_to_disk(source: BinaryIO, suffix: str = "", max_size: int = MAX_VIDEO_SIZE_BYTES) -> str:
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix="video-")
+    written = 0
+    try:
+        with os.fdopen(fd, "wb") as target:
+            source.seek(0)
+            while chunk := source.read(1024 * 1024):
+                written += len(chunk)
+                if written > max_size:
+                    raise VideoTooLargeError("Video is too large")
+                target.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    if written == 0:
+        os.unlink(path)
+        raise VideoRedactionError("Video is empty")
+    return path
+
+
+def redact_frame(frame: np.ndarray, detections: List[dict], confidence_threshold: float) -> np.ndarray:
+    height, width = frame.shape[:2]
+    boxes = clip_boxes(
+        [(det["x1"], det["y1"], det["x2"], det["y2"]) for det in detections if det["confidence"] >= confidence_threshold],
+        width,
+        height,
+    )
+    return redact_array(frame, boxes)
+
+
+class _FramePipe:
+    # Reads source frames one at a time and writes redacted ones straight to
+    # the output file, so memory does not depend on clip length
+    def __init__(self, source_path: str, output_path: str):
+        self.capture = cv2.VideoCapture(source_path)
+        if not self.capture.isOpened():
+            self.capture.release()
+            raise VideoRedactionError("Invalid video data")
+        fps = self.capture.get(cv2.CAP_PROP_FPS) or 25.0
+        size = (
+            int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        )
+        self.frame_count = max(0, int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT)))
+        self.writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+        if not self.writer.isOpened():
+            self.close()
+            raise VideoRedactionError("Cannot open video encoder")
+
+    def process(self, frames: List[List[dict]], confidence_threshold: float) -> int:
+        written = 0
+        for detections in frames:
+            ok, frame = self.capture.read()
+            if not ok:
+                raise VideoRedactionError("Detection stream is longer than the video")
+            self.writer.write(redact_frame(frame, detections, confidence_threshold))
+            written += 1
+        return written
+
+    def close(self):
+        self.capture.release()
+        if getattr(self, "writer", None) is not None:
+            self.writer.release()
+
+
+async def redact_video(
+    source_path: str,
+    output_path: str,
+    events: AsyncIterator[dict],
+    confidence_threshold: float,
+    on_progress: Callable[[int, int], Awaitable[None]],
+) -> VideoRedactionStats:
+    pipe = await asyncio.to_thread(_FramePipe, source_path, output_path)
+    frames = 0
+    detections = 0
+    total = pipe.frame_count
+    chunk: List[List[dict]] = []
+    last_report = time.monotonic()
+    finished = False
+    try:
+        async for event in events:
+            kind = event.get("type")
+            if kind == "meta":
+                total = event.get("frame_count") or total
+            elif kind == "frame":
+                boxes = [det for det in event["detections"] if det["confidence"] >= confidence_threshold]
+                detections += len(boxes)
+                chunk.append(boxes)
+                if len(chunk) >= VIDEO_CHUNK_FRAMES:
+                    frames += await asyncio.to_thread(pipe.process, chunk, confidence_threshold)
+                    chunk = []
+                    if time.monotonic() - last_report >= VIDEO_PROGRESS_INTERVAL_SECONDS:
+                        await on_progress(frames, total)
+                        last_report = time.monotonic()
+            elif kind == "end":
+                finished = True
+        if chunk:
+            frames += await asyncio.to_thread(pipe.process, chunk, confidence_threshold)
+    finally:
+        await asyncio.to_thread(pipe.close)
+
+    if not finished:
+        raise VideoRedactionError("Detection stream ended unexpectedly")
+    return VideoRedactionStats(frames=frames, detections=detections)
+
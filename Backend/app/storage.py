@@ -1,25 +1,226 @@
+import asyncio
+import functools
+import hashlib
 import os
 import io
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Awaitable, BinaryIO, Callable, Dict, Iterable, Optional, Tuple
+from urllib.parse import quote
+
+import certifi
+import urllib3
 from minio import Minio
+from minio.deleteobjects import DeleteObject
 from minio.error import S3Error
+from sqlalchemy.orm import Session
+
+from app.repositories.blob_repository import BlobRepository
+from app.repositories.cleanup_repository import CleanupRepository
 
+# minio | local (files under STORAGE_LOCAL_ROOT, see app.local_storage)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "minio").lower()
 MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT", "minio:9000")
 MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
 MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY", "minioadmin")
 MINIO_BUCKET = os.getenv("MINIO_BUCKET", "anonify-images")
 MINIO_SECURE = os.getenv("MINIO_SECURE", "False").lower() == "true"
 MINIO_PUBLIC_ENDPOINT = os.getenv("MINIO_PUBLIC_ENDPOINT", "localhost:9000")
+# Threads for blocking MinIO calls made from async handlers; the HTTP pool
+# is sized to match so no thread waits on, or throws away, a connection
+STORAGE_IO_THREADS = int(os.getenv("STORAGE_IO_THREADS", "16"))
+STORAGE_CONNECT_TIMEOUT = float(os.getenv("STORAGE_CONNECT_TIMEOUT", "5"))
+STORAGE_READ_TIMEOUT = float(os.getenv("STORAGE_READ_TIMEOUT", "300"))
+# Multipart part size for streamed uploads (MinIO minimum is 5 MiB); it is
+# also the most one upload holds in memory
+STORAGE_PART_SIZE = int(os.getenv("STORAGE_PART_SIZE", str(5 * 1024 * 1024)))
+PRESIGNED_URL_EXPIRES_SECONDS = int(os.getenv("PRESIGNED_URL_EXPIRES_SECONDS", str(7 * 24 * 3600)))
+# A cached URL is handed out only while it stays valid at least this long
+PRESIGNED_URL_MIN_VALIDITY_SECONDS = int(os.getenv("PRESIGNED_URL_MIN_VALIDITY_SECONDS", "3600"))
+PRESIGNED_URL_CACHE_SIZE = int(os.getenv("PRESIGNED_URL_CACHE_SIZE", "10000"))
+# Keys per multi-object delete request; S3 accepts at most 1000
+STORAGE_DELETE_BATCH_SIZE = min(1000, int(os.getenv("STORAGE_DELETE_BATCH_SIZE", "1000")))
+
+_io_executor = ThreadPoolExecutor(max_workers=STORAGE_IO_THREADS, thread_name_prefix="storage-io")
+
+
+async def run_io(func, *args, **kwargs):
+    # A pool of its own keeps slow PUTs from starving asyncio.to_thread
+    # users (image decoding, ZIP reads) and bounds the number of parallel
+    # MinIO requests
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_io_executor, functools.partial(func, *args, **kwargs))
+
+
+def _http_client() -> urllib3.PoolManager:
+    return urllib3.PoolManager(
+        maxsize=STORAGE_IO_THREADS,
+        timeout=urllib3.Timeout(connect=STORAGE_CONNECT_TIMEOUT, read=STORAGE_READ_TIMEOUT),
+        cert_reqs="CERT_REQUIRED",
+        ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+        retries=urllib3.Retry(total=5, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504]),
+    )
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class ObjectNotFound(LookupError):
+    # Raised by every backend when a key has no stored object
+    pass
+
+
+@dataclass
+class StoredObject:
+    object_name: str
+    size: int
+    sha256: str
+
+
+class _MeteredReader:
+    # Counts and hashes what put_object pulls from the source, and stops the
+    # upload as soon as it grows past the limit
+    def __init__(self, source: BinaryIO, max_size: Optional[int]):
+        self.source = source
+        self.max_size = max_size
+        self.size = 0
+        self.digest = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.source.read(size)
+        self.size += len(data)
+        if self.max_size is not None and self.size > self.max_size:
+            raise UploadTooLarge("File is too large")
+        self.digest.update(data)
+        return data
+
+
+def content_disposition(filename: str) -> str:
+    # Content-addressed keys carry no file name, so downloads name the file
+    # through this header; filename* keeps non-ASCII names intact
+    fallback = "".join(char for char in filename if " " <= char < "\x7f" and char not in '"\\') or "download"
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+
+def blob_key(sha256: str) -> str:
+    return f"blobs/{sha256[:2]}/{sha256}"
+
+
+def hash_stream(source: BinaryIO, max_size: Optional[int] = None) -> Tuple[str, int]:
+    # Hashes a local file object (an upload spool) and rewinds it, so the
+    # content address is known before anything is sent to MinIO
+    reader = _MeteredReader(source, max_size)
+    while reader.read(1024 * 1024):
+        pass
+    source.seek(0)
+    return reader.digest.hexdigest(), reader.size
 
-class StorageClient:
+
+async def store_blob(
+    db: Session,
+    sha256: str,
+    size: int,
+    content_type: Optional[str],
+    upload: Callable[[str], Awaitable[Any]],
+) -> str:
+    # Adds a reference to the content-addressed object and calls upload
+    # with its key only when no stored copy exists yet. Commits, so the
+    # upload does not run inside an open write transaction.
+    repository = BlobRepository(db)
+    object_key = blob_key(sha256)
+    acquired = repository.acquire(sha256)
+    db.commit()
+    if acquired:
+        return object_key
+    # The key may still be queued for removal from an earlier copy
+    CleanupRepository(db).cancel(object_key)
+    db.commit()
+    await upload(object_key)
+    repository.register(sha256, object_key, size, content_type)
+    db.commit()
+    return object_key
+
+
+class StorageBackend(ABC):
+    # What routes and workers use of object storage; every backend passes
+    # tests/test_storage_backends.py. Methods block and are called through
+    # run_io from async code.
+
+    def upload_file(self, file_data: bytes, object_name: str, content_type: str = "application/octet-stream") -> str:
+        return self.upload_stream(io.BytesIO(file_data), object_name, content_type).object_name
+
+    @abstractmethod
+    def upload_stream(
+        self,
+        source: BinaryIO,
+        object_name: str,
+        content_type: str = "application/octet-stream",
+        max_size: Optional[int] = None,
+    ) -> StoredObject:
+        ...
+
+    @abstractmethod
+    def upload_path(self, file_path: str, object_name: str, content_type: str = "application/octet-stream") -> str:
+        ...
+
+    @abstractmethod
+    def download_file(self, object_name: str) -> bytes:
+        # Raises ObjectNotFound for a missing key
+        ...
+
+    @abstractmethod
+    def get_presigned_urls(self, object_names: Iterable[str]) -> Dict[str, str]:
+        ...
+
+    def get_presigned_url(self, object_name: str) -> str:
+        return self.get_presigned_urls([object_name])[object_name]
+
+    @abstractmethod
+    def get_download_urls(self, files: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], str]:
+        # URLs for (object_name, filename) pairs that download under the
+        # given file name
+        ...
+
+    def get_download_url(self, object_name: str, filename: str) -> str:
+        return self.get_download_urls([(object_name, filename)])[(object_name, filename)]
+
+    @abstractmethod
+    def delete_file(self, object_name: str) -> None:
+        ...
+
+    @abstractmethod
+    def delete_files(self, object_names: Iterable[str]) -> Dict[str, str]:
+        ...
+
+
+class StorageClient(StorageBackend):
     def __init__(self):
         self.internal_client = Minio(
             MINIO_ENDPOINT,
             access_key=MINIO_ACCESS_KEY,
             secret_key=MINIO_SECRET_KEY,
-            secure=MINIO_SECURE
+            secure=MINIO_SECURE,
+            http_client=_http_client(),
+        )
+        # Signs URLs for the public endpoint; with the region fixed it never
+        # talks to MinIO, so one instance serves every request
+        self.signer_client = Minio(
+            MINIO_PUBLIC_ENDPOINT,
+            access_key=MINIO_ACCESS_KEY,
+            secret_key=MINIO_SECRET_KEY,
+            secure=MINIO_SECURE,
+            region="us-east-1"
         )
         self.bucket_name = MINIO_BUCKET
         self._bucket_ready = False
+        self._url_cache: OrderedDict[Tuple[str, Optional[str]], tuple[str, float]] = OrderedDict()
+        self._url_cache_lock = threading.Lock()
 
     def _ensure_bucket(self):
         try:
@@ -46,31 +247,162 @@ class StorageClient:
             print(f"MinIO Upload Error: {err}")
             raise
 
-    def get_presigned_url(self, object_name: str) -> str:
+    def upload_stream(
+        self,
+        source: BinaryIO,
+        object_name: str,
+        content_type: str = "application/octet-stream",
+        max_size: Optional[int] = None,
+    ) -> StoredObject:
+        # Reads the source part by part instead of loading it first; an
+        # upload past max_size is aborted and raises UploadTooLarge
+        reader = _MeteredReader(source, max_size)
+        try:
+            if not self._bucket_ready:
+                self._ensure_bucket()
+
+            self.internal_client.put_object(
+                self.bucket_name,
+                object_name,
+                reader,
+                length=-1,
+                content_type=content_type,
+                part_size=STORAGE_PART_SIZE,
+                num_parallel_uploads=1,
+            )
+            return StoredObject(object_name, reader.size, reader.digest.hexdigest())
+        except S3Error as err:
+            print(f"MinIO Upload Error: {err}")
+            raise
+
+    def upload_path(self, file_path: str, object_name: str, content_type: str = "application/octet-stream") -> str:
+        try:
+            if not self._bucket_ready:
+                self._ensure_bucket()
+
+            self.internal_client.fput_object(
+                self.bucket_name,
+                object_name,
+                file_path,
+                content_type=content_type
+            )
+            return object_name
+        except S3Error as err:
+            print(f"MinIO Upload Error: {err}")
+            raise
+
+    def download_file(self, object_name: str) -> bytes:
+        response = None
         try:
-            # Generate presigned URL using the internal client for calculation
-            # We use a temporary public client configuration to ensure the signature matches public access
-            
-            signer_client = Minio(
-                MINIO_PUBLIC_ENDPOINT,
-                access_key=MINIO_ACCESS_KEY,
-                secret_key=MINIO_SECRET_KEY,
-                secure=MINIO_SECURE,
-                region="us-east-1"
+            response = self.internal_client.get_object(self.bucket_name, object_name)
+            return response.read()
+        except S3Error as err:
+            if err.code == "NoSuchKey":
+                raise ObjectNotFound(object_name) from err
+            print(f"MinIO Download Error: {err}")
+            raise
+        finally:
+            if response is not None:
+                response.close()
+                response.release_conn()
+
+    def _sign(self, object_name: str, filename: Optional[str] = None) -> str:
+        response_headers = {"response-content-disposition": content_disposition(filename)} if filename else None
+        try:
+            return self.signer_client.get_presigned_url(
+                "GET",
+                self.bucket_name,
+                object_name,
+                expires=timedelta(seconds=PRESIGNED_URL_EXPIRES_SECONDS),
+                response_headers=response_headers,
             )
-            
-            return signer_client.get_presigned_url("GET", self.bucket_name, object_name)
         except S3Error as err:
             print(f"MinIO Get URL Error: {err}")
             raise
 
+    def _presign(self, items: Iterable[Tuple[str, Optional[str]]]) -> Dict[Tuple[str, Optional[str]], str]:
+        now = time.monotonic()
+        urls: Dict[Tuple[str, Optional[str]], str] = {}
+        missing = []
+        with self._url_cache_lock:
+            for item in items:
+                entry = self._url_cache.get(item)
+                if entry is not None and entry[1] > now:
+                    self._url_cache.move_to_end(item)
+                    urls[item] = entry[0]
+                else:
+                    missing.append(item)
+        if not missing:
+            return urls
+
+        reuse_until = now + max(0, PRESIGNED_URL_EXPIRES_SECONDS - PRESIGNED_URL_MIN_VALIDITY_SECONDS)
+        signed = {item: self._sign(*item) for item in missing}
+        urls.update(signed)
+        with self._url_cache_lock:
+            for item, url in signed.items():
+                self._url_cache[item] = (url, reuse_until)
+                self._url_cache.move_to_end(item)
+            while len(self._url_cache) > PRESIGNED_URL_CACHE_SIZE:
+                self._url_cache.popitem(last=False)
+        return urls
+
+    def _forget_urls(self, object_names: Iterable[str]):
+        names = set(object_names)
+        with self._url_cache_lock:
+            for item in [item for item in self._url_cache if item[0] in names]:
+                del self._url_cache[item]
+
+    def get_presigned_urls(self, object_names: Iterable[str]) -> Dict[str, str]:
+        urls = self._presign((object_name, None) for object_name in object_names)
+        return {object_name: url for (object_name, _), url in urls.items()}
+
+    def get_download_urls(self, files: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], str]:
+        return self._presign(files)
+
     def delete_file(self, object_name: str) -> None:
         try:
             if not self._bucket_ready:
                 self._ensure_bucket()
             self.internal_client.remove_object(self.bucket_name, object_name)
+            self._forget_urls([object_name])
         except S3Error as err:
             print(f"MinIO Delete Error: {err}")
             raise
 
-storage = StorageClient()
+    def delete_files(self, object_names: Iterable[str]) -> Dict[str, str]:
+        # Multi-object delete, up to STORAGE_DELETE_BATCH_SIZE keys per
+        # request. Returns the error for every key that was not removed;
+        # keys that are already gone count as removed.
+        object_names = list(dict.fromkeys(object_names))
+        failed: Dict[str, str] = {}
+        if not object_names:
+            return failed
+        if not self._bucket_ready:
+            self._ensure_bucket()
+        for start in range(0, len(object_names), STORAGE_DELETE_BATCH_SIZE):
+            batch = object_names[start:start + STORAGE_DELETE_BATCH_SIZE]
+            try:
+                # remove_objects is lazy: the request goes out while iterating
+                for error in self.internal_client.remove_objects(
+                    self.bucket_name, [DeleteObject(name) for name in batch]
+                ):
+                    if error.code != "NoSuchKey":
+                        failed[error.name] = f"{error.code}: {error.message}"
+            except Exception as err:
+                print(f"MinIO Delete Error: {err}")
+                failed.update((name, str(err)) for name in batch)
+        self._forget_urls(object_names)
+        return failed
+
+
+def create_storage(backend: str = STORAGE_BACKEND) -> StorageBackend:
+    if backend == "minio":
+        return StorageClient()
+    if backend == "local":
+        from app.local_storage import LocalStorage
+
+        return LocalStorage()
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+storage = create_storage()
@@ -0,0 +1,108 @@
+"""Measure how deleting a chat scales with the number of files in it.
+
+Usage (from the Backend directory):
+    python -m scripts.benchmark_chat_delete --files 100 1000 5000 --delete-ms 5
+
+Storage: starts the S3 stand-in from benchmark_storage_io, answering every
+delete after --delete-ms milliseconds, and removes each batch of keys two ways:
+
+    per-key   StorageClient.delete_file in a loop (previous delete_chat)
+    bulk      StorageClient.delete_files, one multi-object delete per 1000 keys
+
+Request: builds a chat with that many files in a throwaway SQLite database
+and times the DELETE /chats/{id} handler, which now only releases blob
+references and queues the keys for the storage cleanup worker.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from scripts.benchmark_storage_io import _stand_in
+
+
+def _time_storage(storage, keys) -> dict:
+    started = time.perf_counter()
+    for key in keys:
+        storage.delete_file(key)
+    per_key = time.perf_counter() - started
+    started = time.perf_counter()
+    failed = storage.delete_files(keys)
+    bulk = time.perf_counter() - started
+    assert not failed, failed
+    return {"per-key": per_key, "bulk": bulk}
+
+
+def _time_request(session_factory, files: int) -> float:
+    from app import models
+    from app.routers.chats import delete_chat
+
+    db = session_factory()
+    user = db.query(models.User).first()
+    if user is None:
+        user = models.User(username="bench", email="bench@example.com", hashed_password="-", role="admin")
+        db.add(user)
+        db.flush()
+    chat = models.Chat(user_id=user.id, title="bench")
+    db.add(chat)
+    db.flush()
+    # Half the files share content with another file in the chat
+    blobs = [
+        models.Blob(sha256=f"{chat.id:08d}{index:056d}", object_key=f"blobs/{chat.id}/{index}", size=1, ref_count=0)
+        for index in range((files + 1) // 2)
+    ]
+    db.add_all(blobs)
+    for index in range(files):
+        blob = blobs[index // 2]
+        blob.ref_count += 1
+        db.add(models.ChatFile(
+            chat_id=chat.id, uploaded_by=user.id, object_key=blob.object_key, blob_sha256=blob.sha256,
+            filename="f.png", content_type="image/png", size=1,
+        ))
+    db.commit()
+
+    started = time.perf_counter()
+    delete_chat(chat.id, current_user=user, db=db)
+    elapsed = time.perf_counter() - started
+    queued = db.query(models.StorageCleanup).count()
+    db.query(models.StorageCleanup).delete()
+    db.commit()
+    db.close()
+    assert queued == len(blobs)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--delete-ms", type=float, default=5)
+    parser.add_argument("--port", type=int, default=9124)
+    args = parser.parse_args()
+
+    _stand_in(args.port, 0.0, args.delete_ms / 1000)
+    os.environ["MINIO_ENDPOINT"] = f"127.0.0.1:{args.port}"
+    os.environ["MINIO_SECURE"] = "false"
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app.database import Base
+    from app.storage import StorageClient
+
+    storage = StorageClient()
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{directory}/bench.db")
+        Base.metadata.create_all(engine)
+        session_factory = sessionmaker(bind=engine, autoflush=False)
+        for files in args.files:
+            keys = [f"chat-files/bench/{index}" for index in range(files)]
+            timings = _time_storage(storage, keys)
+            request = _time_request(session_factory, files)
+            print(
+                f"[{files:>6} files] storage per-key={timings['per-key'] * 1000:.0f}ms "
+                f"bulk={timings['bulk'] * 1000:.0f}ms | DELETE /chats request={request * 1000:.1f}ms"
+            )
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
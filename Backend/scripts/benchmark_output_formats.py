@@ -0,0 +1,65 @@
+"""Compare size and encode time of redacted output per format.
+
+Usage (from the Backend directory):
+    python -m scripts.benchmark_output_formats --megapixels 8
+    python -m scripts.benchmark_output_formats --image ./samples/car.jpg
+
+Without --image a photo-like scene is generated (smooth gradients, a few
+shapes and sensor noise), since pure noise or flat colour would flatter or
+punish one codec. Black boxes are filled in as /redact does, then the image
+is encoded with the settings in app.services.image_output. AVIF is skipped
+when this Pillow build cannot write it.
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from app.services import image_output
+from app.services.redaction_engine import clip_boxes, redact_pil
+
+
+def _scene(megapixels: float, seed: int = 0) -> Image.Image:
+    rng = np.random.default_rng(seed)
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    frame = np.dstack([
+        120 + 80 * np.sin(x / width * 3 + channel) * np.cos(y / height * 2 + channel)
+        for channel in range(3)
+    ])
+    for _ in range(40):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        radius = int(rng.integers(width // 40, width // 8))
+        cv2.circle(frame, center, radius, rng.integers(0, 256, 3).tolist(), -1)
+    frame = cv2.GaussianBlur(frame, (0, 0), 3) + rng.normal(0, 4, frame.shape)
+    return Image.fromarray(np.clip(frame, 0, 255).astype(np.uint8))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image", help="redact this file instead of a generated scene")
+    parser.add_argument("--megapixels", type=float, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    image = Image.open(args.image).convert("RGB") if args.image else _scene(args.megapixels)
+    left, top = image.width // 4, image.height // 2
+    redact_pil(image, clip_boxes([(left, top, left + 300, top + 70)], image.width, image.height))
+
+    formats = ["PNG", "JPEG", "WEBP"] + (["AVIF"] if image_output.avif_supported() else [])
+    print(f"{image.width}x{image.height} ({image.width * image.height / 1e6:.1f} MP)")
+    print(f"{'format':>6} {'size':>10} {'encode':>10}")
+    for image_format in formats:
+        best = float("inf")
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            data = image_output.encode(image, image_format)
+            best = min(best, time.perf_counter() - started)
+        print(f"{image_format:>6} {len(data) / 1e6:>8.2f}MB {best * 1000:>8.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Measure the per-call cost of presigned URLs before and after signer reuse.
+
+Usage (from the Backend directory):
+    python -m scripts.benchmark_presign --calls 5000 --keys 200
+
+No MinIO is needed: signing is local once the region is fixed. Variants:
+
+    new-client  a Minio signer built for every call (previous code)
+    signer      the long-lived StorageClient.signer_client, no cache
+    cached      StorageClient.get_presigned_url over --keys distinct keys
+    bulk        StorageClient.get_presigned_urls for a --keys listing,
+                cache cleared first so every key is signed
+"""
+import argparse
+import time
+
+from minio import Minio
+
+from app import storage as storage_module
+from app.storage import StorageClient
+
+
+def _per_call(fn, calls: int) -> float:
+    started = time.perf_counter()
+    for index in range(calls):
+        fn(index)
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--keys", type=int, default=200)
+    args = parser.parse_args()
+
+    client = StorageClient()
+    keys = [f"chat-files/1/{index}-photo.jpg" for index in range(args.keys)]
+
+    def new_client(index: int):
+        Minio(
+            storage_module.MINIO_PUBLIC_ENDPOINT,
+            access_key=storage_module.MINIO_ACCESS_KEY,
+            secret_key=storage_module.MINIO_SECRET_KEY,
+            secure=storage_module.MINIO_SECURE,
+            region="us-east-1",
+        ).get_presigned_url("GET", client.bucket_name, keys[index % args.keys])
+
+    def bulk(index: int):
+        client._url_cache.clear()
+        client.get_presigned_urls(keys)
+
+    results = {
+        "new-client": _per_call(new_client, args.calls),
+        "signer": _per_call(lambda index: client._sign(keys[index % args.keys]), args.calls),
+        "cached": _per_call(lambda index: client.get_presigned_url(keys[index % args.keys]), args.calls),
+        "bulk": _per_call(bulk, max(1, args.calls // args.keys)) / args.keys,
+    }
+    for name, micros in results.items():
+        print(f"{name:>10}: {micros:8.1f} us/url")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Compare the previous ImageDraw redaction with the NumPy engine.
+
+Usage (from the Backend directory):
+    python -m scripts.benchmark_redaction --sizes 1 8 24 --boxes 1 10 100
+
+For every image size (in megapixels) and box count a noisy RGB image with
+randomly placed plate-sized boxes is redacted in memory, starting from a
+decoded PIL image as /redact does; PNG decoding and encoding are left out as
+they cost the same either way. The engine is timed in every mode, and the
+"frame" column is the in-place array path used for video frames.
+"""
+import argparse
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from app.services.redaction_engine import REDACTION_MODES, clip_boxes, redact_array, redact_pil
+
+
+def _image(megapixels: float, seed: int = 0) -> Image.Image:
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    return Image.fromarray(np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8))
+
+
+def _boxes(count: int, width: int, height: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    sizes = rng.integers(60, 260, (count, 1)) * [1, 0.25]
+    origins = rng.uniform(0, 1, (count, 2)) * ([width, height] - sizes)
+    return np.hstack([origins, origins + sizes]).astype(int).tolist()
+
+
+def _legacy(image: Image.Image, boxes: list) -> Image.Image:
+    draw = ImageDraw.Draw(image)
+    for box in boxes:
+        draw.rectangle(box, fill="black")
+    return image
+
+
+def _engine(image: Image.Image, boxes: list, mode: str) -> Image.Image:
+    return redact_pil(image, clip_boxes(boxes, image.width, image.height), mode)
+
+
+def _timed(fn, source, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        image = source.copy()
+        started = time.perf_counter()
+        fn(image)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 8, 24], help="image sizes in megapixels")
+    parser.add_argument("--boxes", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    columns = ["legacy", *REDACTION_MODES, "frame"]
+    print(f"{'MP':>5} {'boxes':>6} " + " ".join(f"{column:>10}" for column in columns))
+    for megapixels in args.sizes:
+        source = _image(megapixels)
+        frame = np.array(source)
+        for count in args.boxes:
+            boxes = _boxes(count, source.width, source.height)
+            clipped = clip_boxes(boxes, source.width, source.height)
+            timings = [_timed(lambda image: _legacy(image, boxes), source, args.repeat)]
+            timings += [
+                _timed(lambda image, mode=mode: _engine(image, boxes, mode), source, args.repeat)
+                for mode in REDACTION_MODES
+            ]
+            timings.append(_timed(lambda pixels: redact_array(pixels, clipped), frame, args.repeat))
+            print(f"{megapixels:>5g} {count:>6} " + " ".join(f"{ms:>8.2f}ms" for ms in timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Compare per-operation latency of the local and MinIO storage backends.
+
+Usage (from the Backend directory):
+    python -m scripts.benchmark_storage_backends --objects 200 --size-kb 256
+    python -m scripts.benchmark_storage_backends --minio-endpoint localhost:9000
+
+Each backend stores --objects objects of --size-kb, reads them back, signs
+their URLs and deletes them, reporting p50/p95 per operation. The local
+backend writes to a temporary directory (with fsync unless --no-fsync).
+
+Without --minio-endpoint the MinIO client talks to the loopback S3 stand-in
+from benchmark_storage_io, which answers at once and returns empty bodies on
+GET: its numbers are the floor of the network path, not MinIO's own cost.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from scripts.benchmark_storage_io import _stand_in
+
+
+def _measure(func, keys) -> tuple:
+    timings = []
+    for key in keys:
+        started = time.perf_counter()
+        func(key)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return statistics.median(timings) * 1000, timings[max(0, int(len(timings) * 0.95) - 1)] * 1000
+
+
+def _run(name: str, backend, payload: bytes, objects: int):
+    keys = [f"bench/{name}/{index}" for index in range(objects)]
+    results = {
+        "put": _measure(lambda key: backend.upload_file(payload, key, "application/octet-stream"), keys),
+        "get": _measure(backend.download_file, keys),
+        "sign": _measure(backend.get_presigned_url, keys),
+        "delete": _measure(backend.delete_file, keys),
+    }
+    print(f"[{name:>6}] " + " ".join(f"{op} p50={p50:.2f}ms p95={p95:.2f}ms" for op, (p50, p95) in results.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--objects", type=int, default=200)
+    parser.add_argument("--size-kb", type=int, default=256)
+    parser.add_argument("--minio-endpoint")
+    parser.add_argument("--no-fsync", action="store_true")
+    parser.add_argument("--port", type=int, default=9125)
+    args = parser.parse_args()
+
+    if args.minio_endpoint:
+        os.environ["MINIO_ENDPOINT"] = args.minio_endpoint
+    else:
+        _stand_in(args.port, 0.0)
+        os.environ["MINIO_ENDPOINT"] = f"127.0.0.1:{args.port}"
+        os.environ["MINIO_SECURE"] = "false"
+    if args.no_fsync:
+        os.environ["STORAGE_LOCAL_FSYNC"] = "false"
+    from app.local_storage import LocalStorage
+    from app.storage import StorageClient
+
+    payload = os.urandom(args.size_kb * 1024)
+    with tempfile.TemporaryDirectory() as directory:
+        _run("local", LocalStorage(directory), payload, args.objects)
+    _run("minio", StorageClient(), payload, args.objects)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Measure what blocking MinIO calls cost an async handler under concurrency.
+
+Usage (from the Backend directory):
+    python -m scripts.benchmark_storage_io --requests 200 --concurrency 50
+
+Starts a minimal S3 stand-in on a local port that answers every PUT after
+--put-ms milliseconds, points StorageClient at it and runs --requests
+simulated /redact handlers, --concurrency at a time, each waiting --ml-ms
+for the ML service and storing one --size-kb object. Three variants run:
+
+    blocking   upload on the event loop after the ML call (previous code)
+    offloaded  upload through app.storage.run_io after the ML call
+    overlapped upload through run_io started together with the ML call
+
+A ticker on the loop records how late it wakes up, which is the delay every
+other request on the worker sees.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+LOCATION = (
+    b'<?xml version="1.0" encoding="UTF-8"?>'
+    b'<LocationConstraint xmlns="http://s3.amazonaws.com/doc/2006-03-01/"></LocationConstraint>'
+)
+
+MULTIPART_STARTED = (
+    b'<?xml version="1.0" encoding="UTF-8"?>'
+    b'<InitiateMultipartUploadResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+    b"<Bucket>b</Bucket><Key>k</Key><UploadId>1</UploadId></InitiateMultipartUploadResult>"
+)
+MULTIPART_COMPLETED = (
+    b'<?xml version="1.0" encoding="UTF-8"?>'
+    b'<CompleteMultipartUploadResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+    b'<Location>l</Location><Bucket>b</Bucket><Key>k</Key><ETag>"0"</ETag></CompleteMultipartUploadResult>'
+)
+DELETED = (
+    b'<?xml version="1.0" encoding="UTF-8"?>'
+    b'<DeleteResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/"></DeleteResult>'
+)
+
+
+def _stand_in(port: int, put_seconds: float, delete_seconds: float = 0.0) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, body: bytes = b"", headers: dict | None = None):
+            self.send_response(200)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self._reply(LOCATION if "location" in self.path else b"", {"Content-Type": "application/xml"})
+
+        def do_HEAD(self):
+            self._reply()
+
+        def do_PUT(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            time.sleep(put_seconds)
+            self._reply(headers={"ETag": '"0"'})
+
+        def do_POST(self):
+            # Multipart upload: ?uploads starts one, ?uploadId= completes it;
+            # ?delete is a multi-object delete
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            query = parse_qs(urlsplit(self.path).query, keep_blank_values=True)
+            if "delete" in query:
+                time.sleep(delete_seconds)
+                body = DELETED
+            elif "uploads" in query:
+                body = MULTIPART_STARTED
+            else:
+                body = MULTIPART_COMPLETED
+            self._reply(body, {"Content-Type": "application/xml"})
+
+        def do_DELETE(self):
+            time.sleep(delete_seconds)
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def _ticker(lags: list, stop: asyncio.Event, interval: float = 0.005):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def _run(variant: str, storage, run_io, payload: bytes, args) -> dict:
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, lags = [], []
+    stop = asyncio.Event()
+
+    async def handler(index: int):
+        async with semaphore:
+            started = time.perf_counter()
+            key = f"bench/{variant}/{index}"
+            if variant == "overlapped":
+                upload = asyncio.ensure_future(run_io(storage.upload_file, payload, key))
+                await asyncio.sleep(args.ml_ms / 1000)
+                await upload
+            else:
+                await asyncio.sleep(args.ml_ms / 1000)
+                if variant == "blocking":
+                    storage.upload_file(payload, key)
+                else:
+                    await run_io(storage.upload_file, payload, key)
+            latencies.append(time.perf_counter() - started)
+
+    ticker = asyncio.ensure_future(_ticker(lags, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(handler(index) for index in range(args.requests)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+    latencies.sort()
+    return {
+        "throughput": args.requests / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p95": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "max_lag": max(lags, default=0.0) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--ml-ms", type=float, default=100)
+    parser.add_argument("--put-ms", type=float, default=30)
+    parser.add_argument("--size-kb", type=int, default=512)
+    parser.add_argument("--port", type=int, default=9123)
+    args = parser.parse_args()
+
+    _stand_in(args.port, args.put_ms / 1000)
+    os.environ["MINIO_ENDPOINT"] = f"127.0.0.1:{args.port}"
+    os.environ["MINIO_SECURE"] = "false"
+    from app.storage import StorageClient, run_io
+
+    storage = StorageClient()
+    payload = os.urandom(args.size_kb * 1024)
+    for variant in ("blocking", "offloaded", "overlapped"):
+        result = asyncio.run(_run(variant, storage, run_io, payload, args))
+        print(
+            f"[{variant:>10}] req/s={result['throughput']:.1f} p50={result['p50']:.0f}ms "
+            f"p95={result['p95']:.0f}ms max_loop_lag={result['max_lag']:.0f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
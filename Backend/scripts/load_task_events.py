@@ -0,0 +1,173 @@
+"""Compare database load of polling /logs/{task_id} against the SSE stream.
+
+Usage (from the Backend directory):
+    python -m scripts.load_task_events --clients 500 --duration 20
+
+Starts the app in-process on a local port, creates one task per client and
+lets a driver move a share of them through processing to success. In the
+polling run every client calls GET /logs/{task_id} each --poll-interval
+seconds; in the SSE run every client holds GET /tasks/{task_id}/events
+open. SQL statements are counted on the engine for both runs.
+
+Without DATABASE_URL a throwaway SQLite file is used and events are
+delivered in-process; point DATABASE_URL at Postgres to exercise
+LISTEN/NOTIFY.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+import httpx
+import uvicorn
+from passlib.context import CryptContext
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app import database, models
+from app.main import app
+from app.services.task_events import broker
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def _engine():
+    url = os.getenv("DATABASE_URL")
+    if url:
+        return database.engine
+    path = os.path.join(tempfile.mkdtemp(), "load.db")
+    return create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False}, pool_size=20, max_overflow=20)
+
+
+def _prepare(session_factory, clients: int):
+    db = session_factory()
+    user = models.User(
+        username=f"load-{uuid.uuid4().hex[:8]}",
+        email=f"{uuid.uuid4().hex[:8]}@load.test",
+        hashed_password=CryptContext(schemes=["pbkdf2_sha256"]).hash("loadpass"),
+    )
+    db.add(user)
+    db.flush()
+    task_ids = [str(uuid.uuid4()) for _ in range(clients)]
+    db.add_all([
+        models.Task(id=task_id, user_id=user.id, status=models.TaskStatus.pending, details="Queued")
+        for task_id in task_ids
+    ])
+    db.commit()
+    username = user.username
+    db.close()
+    return username, task_ids
+
+
+async def _drive(session_factory, task_ids, duration: float, share: float):
+    # Finish `share` of the tasks spread evenly over the run
+    finishing = task_ids[:int(len(task_ids) * share)]
+    step = duration / max(1, len(finishing) * 2)
+    for task_id in finishing:
+        for status in (models.TaskStatus.processing, models.TaskStatus.success):
+            await asyncio.sleep(step)
+            db = session_factory()
+            task = db.query(models.Task).filter(models.Task.id == task_id).first()
+            task.status = status
+            db.commit()
+            db.close()
+
+
+async def _poll(client, task_id, headers, duration, interval, seen):
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        response = await client.get(f"/logs/{task_id}", headers=headers)
+        if response.json()["status"] == "success":
+            seen.append(time.monotonic())
+            return
+        await asyncio.sleep(interval)
+
+
+async def _subscribe(client, task_id, headers, duration, seen):
+    try:
+        async with client.stream("GET", f"/tasks/{task_id}/events", headers=headers, timeout=duration + 5) as response:
+            async for line in response.aiter_lines():
+                if line.startswith("data: ") and '"success"' in line:
+                    seen.append(time.monotonic())
+                    return
+    except httpx.ReadTimeout:
+        pass
+
+
+async def _run(mode: str, base_url: str, session_factory, counter, args) -> dict:
+    username, task_ids = _prepare(session_factory, args.clients)
+    limits = httpx.Limits(max_connections=args.clients + 10)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        token = (await client.post("/auth/login", json={"username": username, "password": "loadpass"})).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        seen = []
+        before = counter.count
+        started = time.monotonic()
+        if mode == "poll":
+            clients = [_poll(client, task_id, headers, args.duration, args.poll_interval, seen) for task_id in task_ids]
+        else:
+            clients = [_subscribe(client, task_id, headers, args.duration, seen) for task_id in task_ids]
+        watchers = [asyncio.ensure_future(coro) for coro in clients]
+        await _drive(session_factory, task_ids, args.duration, args.finish_share)
+        await asyncio.wait(watchers, timeout=max(0.0, args.duration - (time.monotonic() - started)) + 1)
+        for watcher in watchers:
+            watcher.cancel()
+        elapsed = time.monotonic() - started
+        return {"queries": counter.count - before, "elapsed": elapsed, "completed": len(seen)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--finish-share", type=float, default=0.2, help="share of tasks that complete during the run")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    engine = _engine()
+    database.Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[database.get_db] = get_db
+    counter = QueryCounter(engine)
+    server = uvicorn.Server(uvicorn.Config(app, port=args.port, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    broker.start(engine)
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        for mode in ("poll", "sse"):
+            result = asyncio.run(_run(mode, base_url, session_factory, counter, args))
+            print(
+                f"[{mode}] clients={args.clients} queries={result['queries']} "
+                f"queries/s={result['queries'] / result['elapsed']:.1f} completed={result['completed']}"
+            )
+    finally:
+        broker.stop()
+        server.should_exit = True
+        thread.join(timeout=5)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Measure peak RSS of buffered against streamed uploads to MinIO.
+
+Usage (from the Backend directory):
+    python -m scripts.measure_upload_rss --uploads 50 --size-mb 10
+
+Each variant runs in a fresh subprocess so ru_maxrss starts clean. The
+uploads are prepared the way Starlette spools multipart files (in memory up
+to 1 MiB, then on disk) and --uploads of them are sent at once through
+app.storage.run_io to the local S3 stand-in from benchmark_storage_io:
+
+    buffered  await file.read(), then upload_file (previous code)
+    streamed  upload_stream straight from the spool
+
+The reported number is peak RSS minus RSS after the spools were written.
+"""
+import argparse
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from scripts.benchmark_storage_io import _stand_in
+
+SPOOL_MAX_SIZE = 1024 * 1024
+
+
+def _spool(size: int) -> tempfile.SpooledTemporaryFile:
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    chunk = os.urandom(1024 * 1024)
+    for _ in range(size // len(chunk)):
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+async def _upload_all(variant: str, spools, storage, run_io):
+    async def upload(index: int, spool):
+        key = f"rss/{variant}/{index}"
+        if variant == "buffered":
+            content = await asyncio.to_thread(spool.read)
+            await run_io(storage.upload_file, content, key, "application/octet-stream")
+        else:
+            await run_io(storage.upload_stream, spool, key, "application/octet-stream")
+
+    await asyncio.gather(*(upload(index, spool) for index, spool in enumerate(spools)))
+
+
+def _child(args):
+    _stand_in(args.port, 0.0)
+    os.environ["MINIO_ENDPOINT"] = f"127.0.0.1:{args.port}"
+    os.environ["MINIO_SECURE"] = "false"
+    from app.storage import StorageClient, run_io
+
+    storage = StorageClient()
+    spools = [_spool(args.size_mb * 1024 * 1024) for _ in range(args.uploads)]
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    asyncio.run(_upload_all(args.child, spools, storage, run_io))
+    elapsed = time.perf_counter() - started
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"[{args.child:>8}] uploads={args.uploads} x {args.size_mb} MB peak_rss_delta={(peak - baseline) / 1024:.0f} MB time={elapsed:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=50)
+    parser.add_argument("--size-mb", type=int, default=10)
+    parser.add_argument("--port", type=int, default=9124)
+    parser.add_argument("--child", choices=["buffered", "streamed"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args)
+        return
+    for variant in ("buffered", "streamed"):
+        subprocess.run(
+            [sys.executable, "-m", "scripts.measure_upload_rss", "--child", variant,
+             "--uploads", str(args.uploads), "--size-mb", str(args.size_mb), "--port", str(args.port)],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,12 @@
+import hashlib
+
+import pytest
+
+from app import models
+from app.storage import StoredObject, blob_key
+from tests.conftest import TestingSessionLocal
+
+
 def _auth_headers(client, username: str, password: str) -> dict[str, str]:
     response = client.post("/auth/login", json={
         "username": username,
@@ -150,8 +159,17 @@ def test_chat_files_upload_list_download_delete_flow(test_app, monkeypatch):
     headers = _auth_headers(test_app, "testuser", "testpass")
     chat_id = test_app.get("/chats", headers=headers).json()["items"][0]["id"]
 
-    monkeypatch.setattr("app.routers.chats.storage.upload_file", lambda *args, **kwargs: "ok")
-    monkeypatch.setattr("app.routers.chats.storage.get_presigned_url", lambda key: f"https://files.local/{key}")
+    monkeypatch.setattr(
+        "app.routers.chats.storage.upload_stream",
+        lambda source, key, *args, **kwargs: StoredObject(key, len(source.read()), ""),
+    )
+    monkeypatch.setattr(
+        "app.routers.chats.storage.get_download_url", lambda key, filename: f"https://files.local/{key}?name={filename}"
+    )
+    monkeypatch.setattr(
+        "app.routers.chats.storage.get_download_urls",
+        lambda files: {(key, filename): f"https://files.local/{key}?name={filename}" for key, filename in files},
+    )
     monkeypatch.setattr("app.routers.chats.storage.delete_file", lambda *args, **kwargs: None)
 
     upload_response = test_app.post(
@@ -169,20 +187,147 @@ def test_chat_files_upload_list_download_delete_flow(test_app, monkeypatch):
     listed = list_response.json()
     assert len(listed) == 1
     assert listed[0]["id"] == file_id
+    assert listed[0]["url"].startswith("https://files.local/blobs/")
+    assert listed[0]["url"].endswith("?name=sample.png")
 
     download_response = test_app.get(f"/chats/{chat_id}/files/{file_id}/download", headers=headers)
     assert download_response.status_code == 200
     assert download_response.json()["url"].startswith("https://files.local/")
+    assert download_response.json()["url"].endswith("?name=sample.png")
 
     delete_response = test_app.delete(f"/chats/{chat_id}/files/{file_id}", headers=headers)
     assert delete_response.status_code == 204
 
 
+def test_chat_files_with_same_content_share_one_object(test_app, monkeypatch):
+    headers = _auth_headers(test_app, "testuser", "testpass")
+    chat_id = test_app.get("/chats", headers=headers).json()["items"][0]["id"]
+    uploads, deletes = [], []
+    monkeypatch.setattr(
+        "app.routers.chats.storage.upload_stream",
+        lambda source, key, *args, **kwargs: uploads.append(key) or StoredObject(key, len(source.read()), ""),
+    )
+    monkeypatch.setattr("app.routers.chats.storage.delete_file", lambda key: deletes.append(key))
+    db = TestingSessionLocal()
+    db.query(models.StorageCleanup).delete()
+    db.commit()
+    db.close()
+
+    file_ids = []
+    for name in ("first.png", "second.png"):
+        response = test_app.post(
+            f"/chats/{chat_id}/files",
+            files={"file": (name, b"same bytes", "image/png")},
+            headers=headers,
+        )
+        assert response.status_code == 201
+        file_ids.append(response.json()["id"])
+    assert len(uploads) == 1
+
+    db = TestingSessionLocal()
+    keys = {row.object_key for row in db.query(models.ChatFile).filter(models.ChatFile.id.in_(file_ids))}
+    assert keys == set(uploads)
+    assert db.query(models.Blob).filter(models.Blob.object_key == uploads[0]).one().ref_count == 2
+    db.close()
+
+    assert test_app.delete(f"/chats/{chat_id}/files/{file_ids[0]}", headers=headers).status_code == 204
+    assert test_app.delete(f"/chats/{chat_id}/files/{file_ids[1]}", headers=headers).status_code == 204
+    # The object is queued for the cleanup worker, not deleted in the request
+    assert deletes == []
+
+    db = TestingSessionLocal()
+    assert db.query(models.Blob).filter(models.Blob.object_key == uploads[0]).count() == 0
+    assert [row.object_key for row in db.query(models.StorageCleanup)] == uploads
+    db.close()
+
+    # Uploading the same bytes again takes the key back out of the queue
+    response = test_app.post(
+        f"/chats/{chat_id}/files",
+        files={"file": ("third.png", b"same bytes", "image/png")},
+        headers=headers,
+    )
+    assert response.status_code == 201
+    assert uploads == [uploads[0], uploads[0]]
+    db = TestingSessionLocal()
+    assert db.query(models.StorageCleanup).count() == 0
+    db.close()
+    assert test_app.delete(f"/chats/{chat_id}/files/{response.json()['id']}", headers=headers).status_code == 204
+
+
+def test_delete_chat_releases_all_files_in_bulk(test_app, monkeypatch):
+    headers = _auth_headers(test_app, "testuser", "testpass")
+    monkeypatch.setattr(
+        "app.routers.chats.storage.upload_stream",
+        lambda source, key, *args, **kwargs: StoredObject(key, len(source.read()), ""),
+    )
+    monkeypatch.setattr("app.routers.chats.storage.delete_file", lambda key: pytest.fail("deleted inline"))
+    kept_chat = test_app.post("/chats", json={"title": "Kept"}, headers=headers).json()["id"]
+    doomed_chat = test_app.post("/chats", json={"title": "Doomed"}, headers=headers).json()["id"]
+
+    def upload(chat_id, content):
+        response = test_app.post(
+            f"/chats/{chat_id}/files", files={"file": ("f.png", content, "image/png")}, headers=headers
+        )
+        assert response.status_code == 201
+        return response.json()["id"]
+
+    upload(kept_chat, b"shared")
+    upload(doomed_chat, b"shared")
+    upload(doomed_chat, b"own")
+    upload(doomed_chat, b"own")
+
+    db = TestingSessionLocal()
+    db.query(models.StorageCleanup).delete()
+    user_id = db.query(models.User.id).filter(models.User.username == "testuser").scalar()
+    # A file stored before content addressing owns its object
+    db.add(models.ChatFile(
+        chat_id=doomed_chat, uploaded_by=user_id, object_key="chat-files/legacy.png",
+        filename="legacy.png", content_type="image/png", size=1,
+    ))
+    db.commit()
+    db.close()
+
+    assert test_app.delete(f"/chats/{doomed_chat}", headers=headers).status_code == 204
+
+    db = TestingSessionLocal()
+    assert db.query(models.ChatFile).filter(models.ChatFile.chat_id == doomed_chat).count() == 0
+    assert db.get(models.Blob, hashlib.sha256(b"shared").hexdigest()).ref_count == 1
+    assert db.get(models.Blob, hashlib.sha256(b"own").hexdigest()) is None
+    queued = sorted(row.object_key for row in db.query(models.StorageCleanup))
+    db.query(models.StorageCleanup).delete()
+    db.commit()
+    db.close()
+    assert len(queued) == 2
+    assert queued[1] == "chat-files/legacy.png"
+    assert queued[0] == blob_key(hashlib.sha256(b"own").hexdigest())
+
+
+def test_chat_file_upload_rejects_oversized_file(test_app, monkeypatch):
+    headers = _auth_headers(test_app, "testuser", "testpass")
+    chat_id = test_app.get("/chats", headers=headers).json()["items"][0]["id"]
+    monkeypatch.setattr("app.routers.chats.MAX_FILE_SIZE_BYTES", 3)
+    monkeypatch.setattr(
+        "app.routers.chats.storage.upload_stream",
+        lambda *args, **kwargs: pytest.fail("oversized upload reached storage"),
+    )
+
+    response = test_app.post(
+        f"/chats/{chat_id}/files",
+        files={"file": ("sample.png", b"1234", "image/png")},
+        headers=headers,
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "File is too large"
+
+
 def test_chat_files_forbidden_for_foreign_chat(test_app, monkeypatch):
     owner_headers = _auth_headers(test_app, "otheruser", "otherpass")
     owner_chat_id = test_app.get("/chats", headers=owner_headers).json()["items"][0]["id"]
 
-    monkeypatch.setattr("app.routers.chats.storage.upload_file", lambda *args, **kwargs: "ok")
+    monkeypatch.setattr(
+        "app.routers.chats.storage.upload_stream",
+        lambda source, key, *args, **kwargs: StoredObject(key, len(source.read()), ""),
+    )
 
     headers = _auth_headers(test_app, "testuser", "testpass")
     response = test_app.post(
@@ -0,0 +1,143 @@
+import asyncio
+from io import BytesIO
+
+import httpx
+import pytest
+
+from app import http_clients
+from app.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from app.ml_balancer import MLBalancer
+from app.routers import redact
+from app.services import video_service
+from tests.test_redact import _auth_headers, _tiny_png_bytes
+
+
+def test_breaker_opens_on_failures_and_recovers_after_trial_call(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("app.circuit_breaker.time.monotonic", lambda: clock[0])
+    breaker = CircuitBreaker(window=4, min_calls=4, failure_rate=0.5, open_seconds=10)
+
+    for success in (True, False, True, False):
+        breaker.before_call()
+        breaker.record(success, 0.1)
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    clock[0] += 11
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record(True, 0.1)
+
+    assert breaker.state == CLOSED
+    assert breaker.rejected == 2
+    assert breaker.metrics()["transitions"] == {"closed->open": 1, "open->half_open": 1, "half_open->closed": 1}
+
+
+def test_breaker_opens_when_latency_budget_is_exceeded():
+    breaker = CircuitBreaker(window=5, min_calls=5, slow_call_seconds=1.0, slow_call_rate=0.6)
+    for elapsed in (0.2, 2.0, 3.0, 0.1, 5.0):
+        breaker.record(True, elapsed)
+    assert breaker.state == OPEN
+
+
+def test_cancelled_trial_call_is_not_counted_as_a_failure(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("app.circuit_breaker.time.monotonic", lambda: clock[0])
+    breaker = CircuitBreaker(min_calls=1, open_seconds=10)
+    breaker.record(False, 0.1)
+    clock[0] += 11
+    monkeypatch.setattr(redact, "ml_breaker", breaker)
+
+    async def hang_up(send):
+        raise asyncio.CancelledError()
+
+    monkeypatch.setattr(redact.balancer, "request", hang_up)
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(redact.call_ml_service(b"image", "test.jpg"))
+
+    assert breaker.state == HALF_OPEN
+    assert breaker.metrics()["transitions"] == {"closed->open": 1, "open->half_open": 1}
+    # The trial slot is free again for the next caller
+    breaker.before_call()
+    breaker.record(True, 0.1)
+    assert breaker.state == CLOSED
+
+
+def test_redact_fails_fast_with_503_when_breaker_is_open(test_app, monkeypatch):
+    breaker = CircuitBreaker(min_calls=1, open_seconds=30)
+    breaker.record(False, 0.1)
+    monkeypatch.setattr(redact, "ml_breaker", breaker)
+
+    async def must_not_be_called(send):
+        raise AssertionError("ML service was called while the breaker is open")
+
+    monkeypatch.setattr(redact.balancer, "request", must_not_be_called)
+    headers = _auth_headers(test_app, "testuser", "testpass")
+
+    files = {"file": ("test.png", BytesIO(_tiny_png_bytes()), "image/png")}
+    response = test_app.post("/redact", files=files, headers=headers)
+
+    assert response.status_code == 503
+    assert 1 <= int(response.headers["Retry-After"]) <= 30
+
+
+def test_video_stream_goes_through_the_breaker(monkeypatch, tmp_path):
+    requests = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        return httpx.Response(500)
+
+    pooled = http_clients.PooledClient("ml", http_clients.ml_timeout())
+    monkeypatch.setattr(http_clients, "ml", pooled)
+    monkeypatch.setattr(redact, "balancer", MLBalancer(["http://ml-a"], "round_robin"))
+    breaker = CircuitBreaker(min_calls=1, open_seconds=30)
+    monkeypatch.setattr(redact, "ml_breaker", breaker)
+    video = tmp_path / "clip.mp4"
+    video.write_bytes(b"video")
+
+    async def consume():
+        return [event async for event in redact.stream_video_detections(str(video), "clip.mp4", "video/mp4")]
+
+    async def run():
+        pooled.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        with pytest.raises(video_service.VideoRedactionError):
+            await consume()
+        with pytest.raises(CircuitOpenError):
+            await consume()
+        await pooled.close()
+
+    asyncio.run(run())
+    assert requests == ["/detect/video"]
+    assert breaker.state == OPEN
+
+
+def test_hedged_request_is_answered_by_the_faster_replica(monkeypatch):
+    delays = {"ml-a": 0.5, "ml-b": 0.01}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(delays[request.url.host])
+        return httpx.Response(200, json={"host": request.url.host})
+
+    pooled = http_clients.PooledClient("ml", http_clients.ml_timeout())
+    balancer = MLBalancer(["http://ml-a", "http://ml-b"], "round_robin", hedge=True, hedge_min_delay=0.05)
+    balancer._latencies.extend([0.01] * 50)
+    slow = balancer.replicas[0]
+    latency_before = slow.latency
+
+    async def run():
+        pooled.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        response = await balancer.request(lambda url: pooled.request("GET", f"{url}/detect"))
+        await pooled.close()
+        return response
+
+    response = asyncio.run(run())
+    assert response.json()["host"] == "ml-b"
+    assert balancer.hedged == 1
+    assert balancer.hedge_wins == 1
+    assert slow.outstanding == 0
+    assert slow.latency > latency_before
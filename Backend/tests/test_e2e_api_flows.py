@@ -3,6 +3,7 @@ import pytest
 from app.routers.external import get_weather_service
 from app.services.weather_service import (ExternalApiUnavailableError,
                                           NormalizedWeather)
+from app.storage import StoredObject
 
 
 pytestmark = pytest.mark.e2e
@@ -21,8 +22,11 @@ def _auth_headers(client, username: str, password: str) -> dict[str, str]:
 
 
 def _mock_storage(monkeypatch):
-    monkeypatch.setattr("app.routers.chats.storage.upload_file", lambda *args, **kwargs: "ok")
-    monkeypatch.setattr("app.routers.chats.storage.get_presigned_url", lambda key: f"https://files.local/{key}")
+    monkeypatch.setattr(
+        "app.routers.chats.storage.upload_stream",
+        lambda source, key, *args, **kwargs: StoredObject(key, len(source.read()), ""),
+    )
+    monkeypatch.setattr("app.routers.chats.storage.get_download_url", lambda key, filename: f"https://files.local/{key}")
     monkeypatch.setattr("app.routers.chats.storage.delete_file", lambda *args, **kwargs: None)
 
 
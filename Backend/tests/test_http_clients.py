@@ -0,0 +1,68 @@
+import asyncio
+
+import httpx
+
+from app import http_clients
+from app.routers import redact
+
+
+def _detect_handler(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, json={"success": True, "detections": [], "image_width": 4, "image_height": 4})
+
+
+def test_call_ml_service_reuses_pooled_client(monkeypatch):
+    pooled = http_clients.PooledClient("ml", http_clients.ml_timeout())
+    monkeypatch.setattr(http_clients, "ml", pooled)
+
+    async def run():
+        pooled.client = httpx.AsyncClient(transport=httpx.MockTransport(_detect_handler))
+        client = pooled.client
+        for _ in range(3):
+            result = await redact.call_ml_service(b"image", "test.jpg")
+            assert result.detections == []
+        assert pooled.client is client
+        await pooled.close()
+
+    asyncio.run(run())
+    assert pooled.requests == 3
+    assert pooled.in_flight == 0
+    assert pooled.errors == 0
+
+
+def test_pooled_client_counts_errors(monkeypatch):
+    def failing(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("refused", request=request)
+
+    pooled = http_clients.PooledClient("ml", http_clients.ml_timeout())
+
+    async def run():
+        pooled.client = httpx.AsyncClient(transport=httpx.MockTransport(failing))
+        try:
+            await pooled.request("GET", "http://ml/health")
+        except httpx.ConnectError:
+            pass
+        await pooled.close()
+
+    asyncio.run(run())
+    assert pooled.errors == 1
+    assert pooled.in_flight == 0
+
+
+def _auth_headers(client, username: str, password: str) -> dict[str, str]:
+    response = client.post("/auth/login", json={"username": username, "password": password})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_metrics_endpoint_requires_admin(test_app):
+    assert test_app.get("/metrics").status_code == 403
+    headers = _auth_headers(test_app, "testuser", "testpass")
+    assert test_app.get("/metrics", headers=headers).status_code == 403
+
+
+def test_metrics_endpoint_reports_http_clients(test_app):
+    response = test_app.get("/metrics", headers=_auth_headers(test_app, "adminuser", "adminpass"))
+    assert response.status_code == 200
+    body = response.json()["http_clients"]
+    assert set(body) == {"ml", "weather"}
+    assert body["ml"]["max_connections"] == http_clients.HTTP_MAX_CONNECTIONS
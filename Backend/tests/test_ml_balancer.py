@@ -0,0 +1,91 @@
+import asyncio
+import statistics
+import time
+
+import httpx
+import pytest
+
+from app import http_clients
+from app.ml_balancer import MLBalancer
+from app.routers import redact
+
+FAST, SLOW = 0.005, 0.08
+REPLICA_DELAYS = {"ml-a": FAST, "ml-b": FAST, "ml-c": SLOW}
+DETECT_BODY = {"success": True, "detections": [], "image_width": 4, "image_height": 4}
+
+
+def _fake_replicas(monkeypatch, handler):
+    pooled = http_clients.PooledClient("ml", http_clients.ml_timeout())
+    pooled.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(http_clients, "ml", pooled)
+    return pooled
+
+
+async def _slow_and_fast(request: httpx.Request) -> httpx.Response:
+    await asyncio.sleep(REPLICA_DELAYS[request.url.host])
+    return httpx.Response(200, json=DETECT_BODY)
+
+
+def _p95_latency(monkeypatch, strategy: str, requests: int = 120, concurrency: int = 6) -> float:
+    _fake_replicas(monkeypatch, _slow_and_fast)
+    monkeypatch.setattr(redact, "balancer", MLBalancer([f"http://{host}" for host in REPLICA_DELAYS], strategy))
+    latencies = []
+
+    async def worker(count: int):
+        for _ in range(count):
+            started = time.perf_counter()
+            await redact.call_ml_service(b"image", "test.jpg")
+            latencies.append(time.perf_counter() - started)
+
+    async def run():
+        await asyncio.gather(*(worker(requests // concurrency) for _ in range(concurrency)))
+        await http_clients.ml.close()
+
+    asyncio.run(run())
+    return statistics.quantiles(latencies, n=20)[-1]
+
+
+@pytest.mark.parametrize("strategy", ["p2c", "least_outstanding"])
+def test_balancing_beats_round_robin_tail_latency(monkeypatch, strategy):
+    round_robin = _p95_latency(monkeypatch, "round_robin")
+    balanced = _p95_latency(monkeypatch, strategy)
+
+    assert round_robin >= SLOW
+    assert balanced < round_robin / 2
+
+
+def test_failing_replica_is_ejected_and_readmitted_after_probe(monkeypatch):
+    state = {"broken": True}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "ml-bad" and state["broken"]:
+            return httpx.Response(500 if request.url.path == "/detect" else 503)
+        return httpx.Response(200, json=DETECT_BODY)
+
+    _fake_replicas(monkeypatch, handler)
+    balancer = MLBalancer(["http://ml-good", "http://ml-bad"], "round_robin", eject_after_failures=2, eject_seconds=60)
+    monkeypatch.setattr(redact, "balancer", balancer)
+    good, bad = balancer.replicas
+
+    async def run():
+        for _ in range(6):
+            try:
+                await redact.call_ml_service(b"image", "test.jpg")
+            except Exception:
+                pass
+        sent_while_ejected = bad.requests
+
+        for _ in range(4):
+            await redact.call_ml_service(b"image", "test.jpg")
+        assert bad.requests == sent_while_ejected
+
+        state["broken"] = False
+        await balancer.probe()
+        for _ in range(4):
+            await redact.call_ml_service(b"image", "test.jpg")
+        await http_clients.ml.close()
+
+    asyncio.run(run())
+    assert bad.ejections == 1
+    assert bad.available(time.monotonic())
+    assert bad.requests > 2
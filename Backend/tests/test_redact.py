@@ -1,6 +1,24 @@
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+import zipfile
 from io import BytesIO
+from urllib.parse import unquote, urlsplit
 
+import cv2
+import httpx
+import numpy as np
+import pytest
+
+from app import models
+from app.local_storage import LocalStorage
 from app.routers import redact
+from app.services import redaction_queue, video_service
+from app.services.redaction_queue import RedactionWorkerPool, RetryableTaskError
+from app.storage import blob_key
+from tests.conftest import TestingSessionLocal
 
 
 def _auth_headers(client, username: str, password: str) -> dict[str, str]:
@@ -14,14 +32,14 @@ def _auth_headers(client, username: str, password: str) -> dict[str, str]:
     return {"Authorization": f"Bearer {token}"}
 
 
-def _mock_redact_dependencies(monkeypatch):
-    class DummyStorage:
-        def upload_file(self, file_data: bytes, object_name: str, content_type: str = "application/octet-stream"):
-            return object_name
+@pytest.fixture(scope="module")
+def local_storage(tmp_path_factory) -> LocalStorage:
+    # Lives as long as the module's test database, so blob rows left by
+    # earlier tests still point at stored objects
+    return LocalStorage(str(tmp_path_factory.mktemp("storage")), "http://test.local/storage")
 
-        def get_presigned_url(self, object_name: str) -> str:
-            return f"http://test.local/{object_name}"
 
+def _mock_redact_dependencies(monkeypatch, storage: LocalStorage):
     async def fake_call_ml_service(file_content: bytes, filename: str):
         return redact.DetectionResult(
             success=True,
@@ -32,10 +50,22 @@ def _mock_redact_dependencies(monkeypatch):
             image_height=8
         )
 
-    monkeypatch.setattr(redact, "storage", DummyStorage())
+    monkeypatch.setattr(redact, "storage", storage)
     monkeypatch.setattr(redact, "call_ml_service", fake_call_ml_service)
 
 
+def _stored_key(url: str) -> str:
+    return unquote(urlsplit(url).path).removeprefix("/storage/")
+
+
+def _stored(storage: LocalStorage, url: str) -> tuple[bytes, str]:
+    view = storage.open_view(_stored_key(url))
+    try:
+        return view.read(), view.content_type
+    finally:
+        view.close()
+
+
 def _tiny_png_bytes() -> bytes:
     return (
         b"\x89PNG\r\n\x1a\n"
@@ -45,8 +75,8 @@ def _tiny_png_bytes() -> bytes:
     )
 
 
-def test_redact_document(test_app, monkeypatch):
-    _mock_redact_dependencies(monkeypatch)
+def test_redact_document(test_app, monkeypatch, local_storage):
+    _mock_redact_dependencies(monkeypatch, local_storage)
     headers = _auth_headers(test_app, "testuser", "testpass")
 
     file_content = _tiny_png_bytes()
@@ -60,6 +90,120 @@ def test_redact_document(test_app, monkeypatch):
     assert data["detections_count"] == 1
 
 
+def test_redact_document_applies_requested_mode(test_app, monkeypatch, local_storage):
+    _mock_redact_dependencies(monkeypatch, local_storage)
+    headers = _auth_headers(test_app, "testuser", "testpass")
+
+    original = np.random.default_rng(0).integers(0, 256, size=(8, 8, 3), dtype=np.uint8)
+    image_bytes = cv2.imencode(".png", original)[1].tobytes()
+    files = {"file": ("noise.png", BytesIO(image_bytes), "image/png")}
+
+    response = test_app.post("/redact", files=files, data={"mode": "pixelate"}, headers=headers)
+    assert response.status_code == 200
+    redacted_key = _stored_key(response.json()["redacted_image_url"])
+    redacted = cv2.imdecode(np.frombuffer(local_storage.download_file(redacted_key), np.uint8), cv2.IMREAD_COLOR)
+    assert np.array_equal(redacted[5:, :], original[5:, :])
+    assert not np.array_equal(redacted[1:5, 1:5], original[1:5, 1:5])
+
+    files = {"file": ("noise.png", BytesIO(image_bytes), "image/png")}
+    response = test_app.post("/redact", files=files, data={"mode": "smudge"}, headers=headers)
+    assert response.status_code == 422
+
+
+def test_redact_document_keeps_input_format(test_app, monkeypatch, local_storage):
+    _mock_redact_dependencies(monkeypatch, local_storage)
+    headers = _auth_headers(test_app, "testuser", "testpass")
+    photo = cv2.imencode(".jpg", np.full((8, 8, 3), 200, dtype=np.uint8))[1].tobytes()
+
+    files = {"file": ("car.jpeg", BytesIO(photo), "image/jpeg")}
+    data = test_app.post("/redact", files=files, headers=headers).json()
+    assert _stored(local_storage, data["original_image_url"])[1] == "image/jpeg"
+    redacted, content_type = _stored(local_storage, data["redacted_image_url"])
+    assert content_type == "image/jpeg"
+    assert redacted[:3] == b"\xff\xd8\xff"
+
+    files = {"file": ("car.jpeg", BytesIO(photo), "image/jpeg")}
+    data = test_app.post("/redact", files=files, data={"output_format": "webp"}, headers=headers).json()
+    assert _stored(local_storage, data["redacted_image_url"])[1] == "image/webp"
+
+    monkeypatch.setattr(redact.image_output, "avif_supported", lambda: False)
+    files = {"file": ("car.jpeg", BytesIO(photo), "image/jpeg")}
+    response = test_app.post("/redact", files=files, data={"output_format": "avif"}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_redact_document_uploads_original_during_ml_call(test_app, monkeypatch, local_storage):
+    _mock_redact_dependencies(monkeypatch, local_storage)
+    headers = _auth_headers(test_app, "testuser", "testpass")
+    image_bytes = cv2.imencode(".png", np.full((4, 4, 3), 33, dtype=np.uint8))[1].tobytes()
+    original_key = blob_key(hashlib.sha256(image_bytes).hexdigest())
+    stored_during_call = []
+
+    async def slow_call_ml_service(file_content: bytes, filename: str):
+        for _ in range(100):
+            if os.path.exists(local_storage._path(original_key)):
+                stored_during_call.append(original_key)
+                break
+            await asyncio.sleep(0.01)
+        return redact.DetectionResult(success=True, detections=[], image_width=4, image_height=4)
+
+    monkeypatch.setattr(redact, "call_ml_service", slow_call_ml_service)
+    files = {"file": ("test.png", BytesIO(image_bytes), "image/png")}
+    response = test_app.post("/redact", files=files, headers=headers)
+    assert response.status_code == 200
+    assert stored_during_call == [_stored_key(response.json()["original_image_url"])]
+
+
+def test_redact_document_keeps_original_reference_when_ml_fails(test_app, monkeypatch, local_storage):
+    _mock_redact_dependencies(monkeypatch, local_storage)
+    headers = _auth_headers(test_app, "testuser", "testpass")
+
+    async def failing_call_ml_service(file_content: bytes, filename: str):
+        await asyncio.sleep(0.01)
+        raise httpx.ConnectError("ML service is down")
+
+    monkeypatch.setattr(redact, "call_ml_service", failing_call_ml_service)
+    image_bytes = cv2.imencode(".png", np.full((4, 4, 3), 7, dtype=np.uint8))[1].tobytes()
+    response = test_app.post(
+        "/redact", files={"file": ("test.png", BytesIO(image_bytes), "image/png")}, headers=headers
+    )
+    assert response.status_code == 503
+
+    sha256 = hashlib.sha256(image_bytes).hexdigest()
+    db = TestingSessionLocal()
+    task = db.query(models.Task).filter(models.Task.input_blob_sha256 == sha256).one()
+    assert task.status == models.TaskStatus.error
+    assert task.input_key == db.get(models.Blob, sha256).object_key
+    assert db.get(models.Blob, sha256).ref_count == 1
+    db.close()
+
+
+def test_redact_document_stores_repeated_content_once(test_app, monkeypatch, local_storage):
+    _mock_redact_dependencies(monkeypatch, local_storage)
+    headers = _auth_headers(test_app, "testuser", "testpass")
+    uploads = []
+    upload_stream = local_storage.upload_stream
+    # upload_file goes through upload_stream as well
+    monkeypatch.setattr(
+        local_storage, "upload_stream", lambda source, key, *args: uploads.append(key) or upload_stream(source, key, *args)
+    )
+
+    image_bytes = cv2.imencode(".png", np.full((8, 8, 3), 120, dtype=np.uint8))[1].tobytes()
+    responses = [
+        test_app.post("/redact", files={"file": ("car.png", BytesIO(image_bytes), "image/png")}, headers=headers).json()
+        for _ in range(2)
+    ]
+    assert responses[0]["task_id"] != responses[1]["task_id"]
+    assert responses[0]["original_image_url"] == responses[1]["original_image_url"]
+    assert responses[0]["redacted_image_url"] == responses[1]["redacted_image_url"]
+    assert len(uploads) == 2  # one original, one redacted image
+
+    db = TestingSessionLocal()
+    keys = [_stored_key(responses[0][field]) for field in ("original_image_url", "redacted_image_url")]
+    assert [blob.ref_count for blob in db.query(models.Blob).filter(models.Blob.object_key.in_(keys))] == [2, 2]
+    db.close()
+
+
 def test_get_entities(test_app):
     headers = _auth_headers(test_app, "testuser", "testpass")
     response = test_app.get("/entities", headers=headers)
@@ -69,8 +213,8 @@ def test_get_entities(test_app):
     assert "license_plate" in data["entities"]
 
 
-def test_get_task_log(test_app, monkeypatch):
-    _mock_redact_dependencies(monkeypatch)
+def test_get_task_log(test_app, monkeypatch, local_storage):
+    _mock_redact_dependencies(monkeypatch, local_storage)
     headers = _auth_headers(test_app, "testuser", "testpass")
 
     file_content = _tiny_png_bytes()
@@ -92,8 +236,8 @@ def test_get_task_log_not_found(test_app):
     assert "Task not found" in response.json()["detail"]
 
 
-def test_get_task_log_forbidden_for_non_owner(test_app, monkeypatch):
-    _mock_redact_dependencies(monkeypatch)
+def test_get_task_log_forbidden_for_non_owner(test_app, monkeypatch, local_storage):
+    _mock_redact_dependencies(monkeypatch, local_storage)
     owner_headers = _auth_headers(test_app, "otheruser", "otherpass")
     files = {"file": ("test.png", BytesIO(_tiny_png_bytes()), "image/png")}
     created = test_app.post("/redact", files=files, headers=owner_headers)
@@ -105,8 +249,8 @@ def test_get_task_log_forbidden_for_non_owner(test_app, monkeypatch):
     assert response.json()["detail"] == "Insufficient permissions"
 
 
-def test_admin_can_read_other_user_task_log(test_app, monkeypatch):
-    _mock_redact_dependencies(monkeypatch)
+def test_admin_can_read_other_user_task_log(test_app, monkeypatch, local_storage):
+    _mock_redact_dependencies(monkeypatch, local_storage)
     owner_headers = _auth_headers(test_app, "otheruser", "otherpass")
     files = {"file": ("test.png", BytesIO(_tiny_png_bytes()), "image/png")}
     created = test_app.post("/redact", files=files, headers=owner_headers)
@@ -115,3 +259,261 @@ def test_admin_can_read_other_user_task_log(test_app, monkeypatch):
     headers = _auth_headers(test_app, "adminuser", "adminpass")
     response = test_app.get(f"/logs/{task_id}", headers=headers)
     assert response.status_code == 200
+
+
+def _tiny_video_bytes(tmp_path, frames: int = 6) -> bytes:
+    path = str(tmp_path / "clip.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 5, (32, 24))
+    for _ in range(frames):
+        writer.write(np.full((24, 32, 3), 200, dtype=np.uint8))
+    writer.release()
+    with open(path, "rb") as handle:
+        return handle.read()
+
+
+def test_redact_batch_streams_zip_with_manifest(test_app, monkeypatch, local_storage):
+    _mock_redact_dependencies(monkeypatch, local_storage)
+    headers = _auth_headers(test_app, "testuser", "testpass")
+    files = [
+        ("files", ("a.png", BytesIO(_tiny_png_bytes()), "image/png")),
+        ("files", ("b.png", BytesIO(_tiny_png_bytes()), "image/png")),
+    ]
+
+    response = test_app.post("/redact/batch", files=files, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+
+    archive = zipfile.ZipFile(BytesIO(response.content))
+    assert sorted(archive.namelist()) == ["a.png", "b.png", "manifest.json"]
+    manifest = json.loads(archive.read("manifest.json"))
+    assert manifest["succeeded"] == 2
+    assert [entry["source"] for entry in manifest["files"]] == ["a.png", "b.png"]
+    assert manifest["files"][0]["detections"][0]["class_name"] == "license_plate"
+
+    log = test_app.get(f"/logs/{response.headers['X-Task-Id']}", headers=headers).json()
+    assert log["status"] == "success"
+
+
+def test_redact_batch_accepts_zip_and_reports_broken_images(test_app, monkeypatch, local_storage):
+    _mock_redact_dependencies(monkeypatch, local_storage)
+    headers = _auth_headers(test_app, "testuser", "testpass")
+    source = BytesIO()
+    with zipfile.ZipFile(source, "w") as archive:
+        archive.writestr("fleet/car1.png", _tiny_png_bytes())
+        archive.writestr("fleet/car2.jpg", b"not an image")
+        archive.writestr("notes.txt", b"skipped")
+
+    files = [("files", ("fleet.zip", BytesIO(source.getvalue()), "application/zip"))]
+    response = test_app.post("/redact/batch", files=files, headers=headers)
+    assert response.status_code == 200
+
+    archive = zipfile.ZipFile(BytesIO(response.content))
+    assert sorted(archive.namelist()) == ["fleet/car1.png", "manifest.json"]
+    manifest = json.loads(archive.read("manifest.json"))
+    assert (manifest["succeeded"], manifest["failed"]) == (1, 1)
+    assert manifest["files"][1]["source"] == "fleet/car2.jpg"
+    assert manifest["files"][1]["error"]
+
+    files = [("files", ("doc.pdf", BytesIO(b"%PDF"), "application/pdf"))]
+    assert test_app.post("/redact/batch", files=files, headers=headers).status_code == 400
+
+
+def _queue_pool(max_attempts: int = 3) -> RedactionWorkerPool:
+    pool = RedactionWorkerPool(concurrency=1, max_attempts=max_attempts)
+    pool.configure(TestingSessionLocal, redact.process_queued_task)
+    return pool
+
+
+def test_redact_async_mode_queues_task_for_workers(test_app, monkeypatch, local_storage):
+    _mock_redact_dependencies(monkeypatch, local_storage)
+    headers = _auth_headers(test_app, "testuser", "testpass")
+
+    files = {"file": ("test.png", BytesIO(_tiny_png_bytes()), "image/png")}
+    response = test_app.post("/redact", files=files, data={"async_mode": "true"}, headers=headers)
+    assert response.status_code == 202
+    task_id = response.json()["task_id"]
+    assert response.json()["status"] == "pending"
+    assert test_app.get(f"/logs/{task_id}", headers=headers).json()["status"] == "pending"
+
+    pool = _queue_pool()
+    assert asyncio.run(pool.run_once()) is True
+    assert asyncio.run(pool.run_once()) is False
+
+    log = test_app.get(f"/logs/{task_id}", headers=headers).json()
+    assert log["status"] == "success"
+    assert _stored_key(log["original_url"]) == blob_key(hashlib.sha256(_tiny_png_bytes()).hexdigest())
+    assert _stored_key(log["result_url"]).startswith("blobs/")
+    assert _stored(local_storage, log["result_url"])[1] == "image/png"
+    assert log["detections"][0]["class_name"] == "license_plate"
+    assert pool.metrics()["processed"] == 1
+
+
+def test_redact_queue_retries_when_ml_is_unavailable(test_app, monkeypatch, local_storage):
+    _mock_redact_dependencies(monkeypatch, local_storage)
+
+    async def unavailable(file_content: bytes, filename: str):
+        raise httpx.ConnectError("connection refused")
+
+    monkeypatch.setattr(redact, "call_ml_service", unavailable)
+    headers = _auth_headers(test_app, "testuser", "testpass")
+    files = {"file": ("test.png", BytesIO(_tiny_png_bytes()), "image/png")}
+    task_id = test_app.post("/redact", files=files, data={"async_mode": "true"}, headers=headers).json()["task_id"]
+
+    pool = _queue_pool(max_attempts=2)
+    with pytest.raises(RetryableTaskError):
+        asyncio.run(pool.run_once())
+    db = TestingSessionLocal()
+    task = db.query(models.Task).filter(models.Task.id == task_id).first()
+    assert task.status == models.TaskStatus.pending
+    delay = (task.next_attempt_at - datetime.datetime.utcnow()).total_seconds()
+    assert redaction_queue.retry_delay(1) - 5 < delay <= redaction_queue.retry_delay(1)
+    db.close()
+
+    # Backed off: the task is not claimed again until it is due
+    assert asyncio.run(pool.run_once()) is False
+    db = TestingSessionLocal()
+    task = db.query(models.Task).filter(models.Task.id == task_id).first()
+    task.next_attempt_at = datetime.datetime.utcnow() - datetime.timedelta(seconds=1)
+    db.commit()
+    db.close()
+
+    with pytest.raises(RetryableTaskError):
+        asyncio.run(pool.run_once())
+    db = TestingSessionLocal()
+    assert db.query(models.Task).filter(models.Task.id == task_id).first().status == models.TaskStatus.error
+    db.close()
+    assert [redaction_queue.retry_delay(n) for n in (1, 2, 3)] == [
+        redaction_queue.REDACTION_RETRY_BASE_SECONDS * factor for factor in (1, 2, 4)
+    ]
+    assert pool.metrics()["retried"] == 1
+    assert pool.metrics()["failed"] == 1
+
+
+def test_redact_queue_fails_stale_task_after_max_attempts(test_app, monkeypatch, local_storage):
+    _mock_redact_dependencies(monkeypatch, local_storage)
+    headers = _auth_headers(test_app, "testuser", "testpass")
+    image_bytes = cv2.imencode(".png", np.full((4, 4, 3), 61, dtype=np.uint8))[1].tobytes()
+    files = {"file": ("test.png", BytesIO(image_bytes), "image/png")}
+    task_id = test_app.post("/redact", files=files, data={"async_mode": "true"}, headers=headers).json()["task_id"]
+
+    def crash_worker():
+        # The worker died mid-task: claimed long ago and never finished
+        db = TestingSessionLocal()
+        task = db.get(models.Task, task_id)
+        task.status = models.TaskStatus.processing
+        task.claimed_at = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+        task.attempts += 1
+        db.commit()
+        db.close()
+
+    async def must_not_run(task, db):
+        raise AssertionError("exhausted task was claimed again")
+
+    pool = _queue_pool(max_attempts=2)
+    pool.process = must_not_run
+    crash_worker()
+    crash_worker()
+
+    assert asyncio.run(pool.run_once()) is False
+    db = TestingSessionLocal()
+    task = db.get(models.Task, task_id)
+    assert task.status == models.TaskStatus.error
+    assert task.attempts == 2
+    db.close()
+    assert pool.metrics()["failed"] == 1
+
+
+def test_redact_video_reports_progress_on_task(test_app, monkeypatch, local_storage, tmp_path):
+    _mock_redact_dependencies(monkeypatch, local_storage)
+    frames = 6
+
+    async def fake_stream(file_path: str, filename: str, content_type: str, params=None):
+        yield {"type": "meta", "frame_count": frames}
+        for index in range(frames):
+            yield {
+                "type": "frame",
+                "index": index,
+                "detections": [{"x1": 2, "y1": 2, "x2": 10, "y2": 8, "confidence": 0.9, "class_name": "license_plate"}],
+            }
+        yield {"type": "end", "frames": frames}
+
+    monkeypatch.setattr(redact, "stream_video_detections", fake_stream)
+    headers = _auth_headers(test_app, "testuser", "testpass")
+
+    video_bytes = _tiny_video_bytes(tmp_path, frames)
+    files = {"file": ("clip.mp4", BytesIO(video_bytes), "video/mp4")}
+    response = test_app.post("/redact/video", files=files, headers=headers)
+    assert response.status_code == 202
+    task_id = response.json()["task_id"]
+
+    log = test_app.get(f"/logs/{task_id}", headers=headers).json()
+    assert log["status"] == "success"
+    assert log["progress"] == 100
+    # Both videos are content-addressed blobs referenced by the task
+    assert _stored_key(log["original_url"]) == blob_key(hashlib.sha256(video_bytes).hexdigest())
+    assert _stored(local_storage, log["original_url"])[0] == video_bytes
+    result_key = _stored_key(log["result_url"])
+    assert _stored(local_storage, log["result_url"])[1] == "video/mp4"
+    db = TestingSessionLocal()
+    task = db.get(models.Task, task_id)
+    assert task.result_key == result_key
+    assert db.get(models.Blob, task.input_blob_sha256).ref_count == 1
+    assert db.get(models.Blob, task.result_blob_sha256).object_key == result_key
+    db.close()
+    assert f"Redacted {frames} frame(s)" in log["details"]
+
+
+def test_redact_video_awaits_progress_reports(monkeypatch, tmp_path):
+    monkeypatch.setattr(video_service, "VIDEO_CHUNK_FRAMES", 2)
+    monkeypatch.setattr(video_service, "VIDEO_PROGRESS_INTERVAL_SECONDS", 0)
+    source = tmp_path / "source.mp4"
+    source.write_bytes(_tiny_video_bytes(tmp_path, 4))
+    reports = []
+
+    async def events():
+        yield {"type": "meta", "frame_count": 4}
+        for index in range(4):
+            yield {"type": "frame", "index": index, "detections": []}
+        yield {"type": "end", "frames": 4}
+
+    async def on_progress(done: int, total: int):
+        await asyncio.sleep(0)
+        reports.append((done, total))
+
+    stats = asyncio.run(video_service.redact_video(str(source), str(tmp_path / "out.mp4"), events(), 0.5, on_progress))
+    assert stats.frames == 4
+    assert reports == [(2, 4), (4, 4)]
+
+
+def test_redact_video_forwards_tracking_mode(test_app, monkeypatch, local_storage, tmp_path):
+    _mock_redact_dependencies(monkeypatch, local_storage)
+    seen = {}
+
+    async def fake_stream(file_path: str, filename: str, content_type: str, params=None):
+        seen.update(params)
+        yield {"type": "meta", "frame_count": 2}
+        for index in range(2):
+            yield {"type": "frame", "index": index, "keyframe": index == 0, "detections": []}
+        yield {"type": "end", "frames": 2}
+
+    monkeypatch.setattr(redact, "stream_video_detections", fake_stream)
+    headers = _auth_headers(test_app, "testuser", "testpass")
+
+    files = {"file": ("clip.mp4", BytesIO(_tiny_video_bytes(tmp_path, 2)), "video/mp4")}
+    data = {"detection_mode": "tracking", "keyframe_interval": "10"}
+    response = test_app.post("/redact/video", files=files, data=data, headers=headers)
+    assert response.status_code == 202
+    assert seen == {"mode": "tracking", "keyframe_interval": 10}
+
+    files = {"file": ("clip.mp4", BytesIO(_tiny_video_bytes(tmp_path, 2)), "video/mp4")}
+    response = test_app.post("/redact/video", files=files, data={"detection_mode": "magic"}, headers=headers)
+    assert response.status_code == 422
+
+
+def test_redact_video_rejects_non_video(test_app, monkeypatch, local_storage):
+    _mock_redact_dependencies(monkeypatch, local_storage)
+    headers = _auth_headers(test_app, "testuser", "testpass")
+    files = {"file": ("test.png", BytesIO(_tiny_png_bytes()), "image/png")}
+
+    response = test_app.post("/redact/video", files=files, headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from app.services.redaction_engine import clip_boxes, redact_array
+
+
+def _noise(height: int = 64, width: int = 64, channels: int = 3) -> np.ndarray:
+    return np.random.default_rng(0).integers(0, 256, size=(height, width, channels), dtype=np.uint8)
+
+
+def test_clip_boxes_is_inclusive_and_drops_empty_boxes():
+    boxes = clip_boxes([(10, 10, 19, 29), (-5, -5, 3, 3), (60, 60, 80, 80), (30, 30, 20, 40)], 64, 64)
+    assert boxes.tolist() == [[10, 10, 20, 30], [0, 0, 4, 4], [60, 60, 64, 64]]
+    assert clip_boxes([], 64, 64).shape == (0, 4)
+
+
+@pytest.mark.parametrize("mode", ["fill", "blur", "pixelate"])
+def test_redact_array_only_touches_boxes(mode):
+    original = _noise()
+    image = original.copy()
+    redact_array(image, clip_boxes([(8, 8, 39, 23)], 64, 64), mode)
+
+    region = image[8:24, 8:40]
+    outside = np.ones(image.shape[:2], dtype=bool)
+    outside[8:24, 8:40] = False
+    assert np.array_equal(image[outside], original[outside])
+    assert not np.array_equal(region, original[8:24, 8:40])
+    if mode == "fill":
+        assert not region.any()
+    else:
+        # Blurred and pixelated boxes lose most of the noise they covered
+        assert region.astype(float).std() < original[8:24, 8:40].astype(float).std() / 2
+
+
+def test_redact_array_handles_grayscale_and_overlapping_boxes():
+    image = _noise(channels=1)[:, :, 0].copy()
+    redact_array(image, clip_boxes([(0, 0, 31, 31), (16, 16, 47, 47)], 64, 64), "pixelate")
+    assert image.shape == (64, 64)
+    with pytest.raises(ValueError):
+        redact_array(image, clip_boxes([(0, 0, 1, 1)], 64, 64), "smudge")
@@ -0,0 +1,135 @@
+import hashlib
+import io
+import os
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from minio.deleteobjects import DeleteError
+from minio.error import S3Error
+
+from app import storage as storage_module
+from app.storage import ObjectNotFound, StorageClient, UploadTooLarge
+
+
+def test_presigned_urls_are_cached_until_reuse_window_ends(monkeypatch):
+    client = StorageClient()
+    signed = []
+    sign = client._sign
+    monkeypatch.setattr(client, "_sign", lambda name, filename=None: signed.append(name) or sign(name, filename))
+    now = [1000.0]
+    monkeypatch.setattr(storage_module.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(storage_module, "PRESIGNED_URL_EXPIRES_SECONDS", 600)
+    monkeypatch.setattr(storage_module, "PRESIGNED_URL_MIN_VALIDITY_SECONDS", 120)
+
+    url = client.get_presigned_url("a/original.png")
+    assert parse_qs(urlparse(url).query)["X-Amz-Expires"] == ["600"]
+    assert client.get_presigned_url("a/original.png") == url
+    urls = client.get_presigned_urls(["a/original.png", "b/original.png"])
+    assert urls["a/original.png"] == url
+    assert signed == ["a/original.png", "b/original.png"]
+
+    # Past expiry minus the minimum validity the URL is signed again
+    now[0] += 481
+    client.get_presigned_url("a/original.png")
+    assert signed[-1] == "a/original.png" and len(signed) == 3
+
+
+def test_presigned_url_cache_is_bounded_and_evicts_deleted_objects(monkeypatch):
+    client = StorageClient()
+    monkeypatch.setattr(storage_module, "PRESIGNED_URL_CACHE_SIZE", 2)
+    monkeypatch.setattr(client.internal_client, "remove_object", lambda bucket, name: None)
+    client._bucket_ready = True
+
+    client.get_presigned_urls(["a", "b"])
+    client.get_presigned_url("a")
+    client.get_presigned_url("c")
+    assert list(client._url_cache) == [("a", None), ("c", None)]
+
+    client.delete_file("a")
+    assert list(client._url_cache) == [("c", None)]
+
+
+def test_download_urls_name_the_file_and_are_cached_per_name(monkeypatch):
+    client = StorageClient()
+    monkeypatch.setattr(client.internal_client, "remove_object", lambda bucket, name: None)
+    client._bucket_ready = True
+
+    urls = client.get_download_urls([("blobs/ab/abc", "report.pdf"), ("blobs/ab/abc", "отчёт.pdf")])
+    query = parse_qs(urlparse(urls[("blobs/ab/abc", "report.pdf")]).query)
+    assert query["response-content-disposition"] == [
+        "attachment; filename=\"report.pdf\"; filename*=UTF-8''report.pdf"
+    ]
+    assert urls[("blobs/ab/abc", "report.pdf")] != urls[("blobs/ab/abc", "отчёт.pdf")]
+    assert client.get_download_url("blobs/ab/abc", "report.pdf") == urls[("blobs/ab/abc", "report.pdf")]
+    assert "response-content-disposition" not in client.get_presigned_url("blobs/ab/abc")
+
+    client.delete_file("blobs/ab/abc")
+    assert not client._url_cache
+
+
+def test_content_disposition_escapes_the_filename():
+    assert storage_module.content_disposition('a "b"\r\n.txt') == (
+        "attachment; filename=\"a b.txt\"; filename*=UTF-8''a%20%22b%22%0D%0A.txt"
+    )
+    assert storage_module.content_disposition("фото.png") == (
+        "attachment; filename=\".png\"; filename*=UTF-8''%D1%84%D0%BE%D1%82%D0%BE.png"
+    )
+
+
+def test_missing_object_raises_object_not_found(monkeypatch):
+    client = StorageClient()
+
+    def get_object(bucket, name):
+        raise S3Error("NoSuchKey", "missing", name, "request", "host", None)
+
+    monkeypatch.setattr(client.internal_client, "get_object", get_object)
+    with pytest.raises(ObjectNotFound):
+        client.download_file("blobs/ab/missing")
+
+
+def _consume_put(captured):
+    def put_object(bucket, name, data, length, content_type="application/octet-stream", part_size=0, **kwargs):
+        captured.update(length=length, part_size=part_size)
+        while data.read(1024):
+            pass
+    return put_object
+
+
+def test_upload_stream_hashes_and_counts_while_streaming(monkeypatch):
+    client = StorageClient()
+    client._bucket_ready = True
+    captured = {}
+    monkeypatch.setattr(client.internal_client, "put_object", _consume_put(captured))
+
+    payload = os.urandom(10_000)
+    stored = client.upload_stream(io.BytesIO(payload), "chat-files/1/a.bin", max_size=10_000)
+    assert stored.size == 10_000
+    assert stored.sha256 == hashlib.sha256(payload).hexdigest()
+    assert captured == {"length": -1, "part_size": storage_module.STORAGE_PART_SIZE}
+
+    with pytest.raises(UploadTooLarge):
+        client.upload_stream(io.BytesIO(payload), "chat-files/1/b.bin", max_size=9_999)
+
+
+def test_delete_files_batches_keys_and_reports_failures(monkeypatch):
+    client = StorageClient()
+    client._bucket_ready = True
+    monkeypatch.setattr(storage_module, "STORAGE_DELETE_BATCH_SIZE", 2)
+    requests = []
+
+    def remove_objects(bucket, objects):
+        names = [obj._name for obj in objects]
+        requests.append(names)
+        for name in names:
+            if name == "gone":
+                yield DeleteError("NoSuchKey", "missing", name, None)
+            elif name == "locked":
+                yield DeleteError("AccessDenied", "denied", name, None)
+
+    monkeypatch.setattr(client.internal_client, "remove_objects", remove_objects)
+    client.get_presigned_url("a")
+
+    failed = client.delete_files(["a", "b", "gone", "a", "locked"])
+    assert requests == [["a", "b"], ["gone", "locked"]]
+    assert failed == {"locked": "AccessDenied: denied"}
+    assert ("a", None) not in client._url_cache
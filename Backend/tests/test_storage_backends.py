@@ -0,0 +1,165 @@
+import hashlib
+import io
+import os
+import uuid
+from urllib.parse import urlsplit
+
+import pytest
+
+from app import storage as storage_module
+from app.local_storage import LocalStorage
+from app.routers import files
+from app.storage import ObjectNotFound, StorageBackend, StorageClient, UploadTooLarge
+
+# The MinIO run needs a reachable server, e.g.
+# STORAGE_TEST_MINIO_ENDPOINT=localhost:9000 python -m pytest tests/test_storage_backends.py
+MINIO_TEST_ENDPOINT = os.getenv("STORAGE_TEST_MINIO_ENDPOINT")
+
+
+@pytest.fixture(params=["local", "minio"])
+def backend(request, tmp_path, monkeypatch) -> StorageBackend:
+    if request.param == "local":
+        return LocalStorage(str(tmp_path), "http://files.test/storage")
+    if not MINIO_TEST_ENDPOINT:
+        pytest.skip("STORAGE_TEST_MINIO_ENDPOINT is not set")
+    monkeypatch.setattr(storage_module, "MINIO_ENDPOINT", MINIO_TEST_ENDPOINT)
+    monkeypatch.setattr(storage_module, "MINIO_PUBLIC_ENDPOINT", MINIO_TEST_ENDPOINT)
+    return StorageClient()
+
+
+@pytest.fixture
+def prefix() -> str:
+    return f"conformance/{uuid.uuid4().hex}"
+
+
+def test_uploaded_bytes_read_back(backend, prefix):
+    payload = os.urandom(70_000)
+    assert backend.upload_file(payload, f"{prefix}/a.bin") == f"{prefix}/a.bin"
+    assert backend.download_file(f"{prefix}/a.bin") == payload
+
+    backend.upload_file(b"", f"{prefix}/empty")
+    assert backend.download_file(f"{prefix}/empty") == b""
+
+    # Writing a key again replaces its content
+    backend.upload_file(b"second", f"{prefix}/a.bin")
+    assert backend.download_file(f"{prefix}/a.bin") == b"second"
+    backend.delete_files([f"{prefix}/a.bin", f"{prefix}/empty"])
+
+
+def test_upload_stream_reports_size_and_hash(backend, prefix):
+    payload = os.urandom(300_000)
+    stored = backend.upload_stream(io.BytesIO(payload), f"{prefix}/s.bin", "image/png", max_size=300_000)
+    assert (stored.object_name, stored.size) == (f"{prefix}/s.bin", 300_000)
+    assert stored.sha256 == hashlib.sha256(payload).hexdigest()
+    assert backend.download_file(f"{prefix}/s.bin") == payload
+    backend.delete_file(f"{prefix}/s.bin")
+
+
+def test_oversized_stream_stores_nothing(backend, prefix):
+    with pytest.raises(UploadTooLarge):
+        backend.upload_stream(io.BytesIO(os.urandom(1000)), f"{prefix}/big.bin", max_size=999)
+    with pytest.raises(ObjectNotFound):
+        backend.download_file(f"{prefix}/big.bin")
+
+
+def test_upload_path_copies_the_file(backend, prefix, tmp_path):
+    source = tmp_path / "clip.mp4"
+    source.write_bytes(b"\x00\x00\x00\x18ftypmp42")
+    backend.upload_path(str(source), f"{prefix}/clip.mp4", "video/mp4")
+    source.unlink()
+    assert backend.download_file(f"{prefix}/clip.mp4") == b"\x00\x00\x00\x18ftypmp42"
+    backend.delete_file(f"{prefix}/clip.mp4")
+
+
+def test_deletes_are_idempotent(backend, prefix):
+    keys = [f"{prefix}/{index}" for index in range(5)]
+    for key in keys:
+        backend.upload_file(key.encode(), key)
+    backend.delete_file(keys[0])
+    backend.delete_file(keys[0])
+    assert backend.delete_files(keys + [f"{prefix}/never-stored"]) == {}
+    for key in keys:
+        with pytest.raises(ObjectNotFound):
+            backend.download_file(key)
+
+
+def test_presigned_urls_are_stable_and_per_key(backend, prefix):
+    urls = backend.get_presigned_urls([f"{prefix}/a", f"{prefix}/b"])
+    assert set(urls) == {f"{prefix}/a", f"{prefix}/b"}
+    assert urls[f"{prefix}/a"] != urls[f"{prefix}/b"]
+    assert urlsplit(urls[f"{prefix}/a"]).path.endswith(f"{prefix}/a")
+    assert backend.get_presigned_url(f"{prefix}/a") == urls[f"{prefix}/a"]
+
+
+def test_download_urls_differ_per_filename(backend, prefix):
+    key = f"{prefix}/a"
+    urls = backend.get_download_urls([(key, "one.png"), (key, "two.png")])
+    assert set(urls) == {(key, "one.png"), (key, "two.png")}
+    assert urls[(key, "one.png")] != urls[(key, "two.png")]
+    assert urls[(key, "one.png")] != backend.get_presigned_url(key)
+    assert backend.get_download_url(key, "one.png") == urls[(key, "one.png")]
+
+
+def test_local_objects_are_sharded_and_leave_no_temp_files(tmp_path):
+    backend = LocalStorage(str(tmp_path))
+    backend.upload_file(b"data", "blobs/ab/../../etc/passwd", "text/plain")
+    stored = [path for path in tmp_path.rglob("*") if path.is_file()]
+    assert sorted(path.suffix for path in stored) == ["", ".type"]
+    data_file = next(path for path in stored if not path.suffix)
+    assert data_file.parent.parent.parent == tmp_path
+    assert data_file.parent.parent.name == data_file.name[:2]
+    assert data_file.parent.name == data_file.name[2:4]
+
+    with pytest.raises(UploadTooLarge):
+        backend.upload_stream(io.BytesIO(b"too long"), "other", max_size=3)
+    assert sorted(path for path in tmp_path.rglob("*") if path.is_file()) == sorted(stored)
+
+
+def test_local_presigned_url_is_served_by_the_files_route(test_app, tmp_path, monkeypatch):
+    backend = LocalStorage(str(tmp_path), "http://testserver/storage")
+    monkeypatch.setattr(files, "storage", backend)
+    payload = os.urandom(5000)
+    backend.upload_file(payload, "results/task 1/redacted.png", "image/png")
+    url = urlsplit(backend.get_presigned_url("results/task 1/redacted.png"))
+    path = f"{url.path}?{url.query}"
+
+    response = test_app.get(path)
+    assert response.status_code == 200
+    assert response.content == payload
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["content-length"] == "5000"
+
+    response = test_app.get(path, headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.content == payload[100:200]
+    assert response.headers["content-range"] == "bytes 100-199/5000"
+
+    assert test_app.get(path.replace("redacted", "original")).status_code == 403
+    assert test_app.get(path[:-1] + ("0" if path[-1] != "0" else "1")).status_code == 403
+    backend.delete_file("results/task 1/redacted.png")
+    assert test_app.get(path).status_code == 404
+
+    expired = f"{url.path}?expires=1&signature={backend._signature('results/task 1/redacted.png', 1)}"
+    assert test_app.get(expired).status_code == 403
+
+
+def test_local_download_url_names_the_file(test_app, tmp_path, monkeypatch):
+    backend = LocalStorage(str(tmp_path), "http://testserver/storage")
+    monkeypatch.setattr(files, "storage", backend)
+    backend.upload_file(b"data", "blobs/ab/abc", "application/pdf")
+    url = urlsplit(backend.get_download_url("blobs/ab/abc", "отчёт 1.pdf"))
+
+    response = test_app.get(f"{url.path}?{url.query}")
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == (
+        "attachment; filename=\" 1.pdf\"; filename*=UTF-8''%D0%BE%D1%82%D1%87%D1%91%D1%82%201.pdf"
+    )
+    # The name is covered by the signature
+    assert test_app.get(f"{url.path}?{url.query}".replace("1.pdf", "2.pdf")).status_code == 403
+    plain = urlsplit(backend.get_presigned_url("blobs/ab/abc"))
+    assert "content-disposition" not in test_app.get(f"{plain.path}?{plain.query}").headers
+
+
+def test_files_route_is_absent_with_minio(test_app, monkeypatch):
+    monkeypatch.setattr(files, "storage", StorageClient())
+    assert test_app.get("/storage/a?expires=1&signature=x").status_code == 404
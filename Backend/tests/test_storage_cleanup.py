@@ -0,0 +1,69 @@
+import asyncio
+import datetime
+
+from app import models
+from app.repositories.cleanup_repository import CleanupRepository
+from app.services import storage_cleanup
+from app.services.storage_cleanup import StorageCleanupWorker
+from tests.conftest import TestingSessionLocal
+
+
+class FakeStorage:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.requests = []
+
+    def delete_files(self, object_names):
+        names = list(object_names)
+        self.requests.append(names)
+        return {name: "SlowDown: try later" for name in names if name in self.failing}
+
+
+def _queue(*keys):
+    db = TestingSessionLocal()
+    db.query(models.StorageCleanup).delete()
+    CleanupRepository(db).enqueue(keys)
+    db.commit()
+    db.close()
+
+
+def _rows():
+    db = TestingSessionLocal()
+    rows = {row.object_key: row for row in db.query(models.StorageCleanup)}
+    db.close()
+    return rows
+
+
+def test_worker_deletes_due_keys_in_one_batch(test_app):
+    _queue("a", "b", "c")
+    storage = FakeStorage()
+    worker = StorageCleanupWorker(batch_size=10)
+    worker.configure(TestingSessionLocal, storage)
+
+    assert asyncio.run(worker.run_once()) == 3
+    assert [sorted(names) for names in storage.requests] == [["a", "b", "c"]]
+    assert _rows() == {}
+    assert worker.metrics()["deleted"] == 3
+    assert asyncio.run(worker.run_once()) == 0
+
+
+def test_worker_backs_off_failed_keys(test_app, monkeypatch):
+    monkeypatch.setattr(storage_cleanup, "STORAGE_CLEANUP_RETRY_BASE_SECONDS", 10)
+    monkeypatch.setattr(storage_cleanup, "STORAGE_CLEANUP_RETRY_MAX_SECONDS", 25)
+    _queue("ok", "stuck")
+    storage = FakeStorage(failing={"stuck"})
+    worker = StorageCleanupWorker(batch_size=10)
+    worker.configure(TestingSessionLocal, storage)
+
+    before = datetime.datetime.utcnow()
+    assert asyncio.run(worker.run_once()) == 2
+    rows = _rows()
+    assert list(rows) == ["stuck"]
+    assert rows["stuck"].attempts == 1
+    assert rows["stuck"].last_error == "SlowDown: try later"
+    assert rows["stuck"].next_attempt_at >= before + datetime.timedelta(seconds=10)
+    # Not due yet, so the next pass has nothing to do
+    assert asyncio.run(worker.run_once()) == 0
+    assert worker.metrics()["failed"] == 1
+
+    assert [storage_cleanup.retry_delay(n) for n in (1, 2, 3)] == [10, 20, 25]
@@ -0,0 +1,82 @@
+import json
+import threading
+import time
+import uuid
+
+from app import models
+from app.services import task_events
+from app.services.task_events import broker
+from tests.conftest import TestingSessionLocal
+from tests.test_redact import _auth_headers
+
+
+def _create_task(username: str = "testuser") -> str:
+    db = TestingSessionLocal()
+    user = db.query(models.User).filter(models.User.username == username).first()
+    task = models.Task(id=str(uuid.uuid4()), user_id=user.id, status=models.TaskStatus.pending, details="Queued")
+    db.add(task)
+    db.commit()
+    task_id = task.id
+    db.close()
+    return task_id
+
+
+def _set_status(task_id: str, status: models.TaskStatus, details: str):
+    db = TestingSessionLocal()
+    task = db.query(models.Task).filter(models.Task.id == task_id).first()
+    task.status = status
+    task.details = details
+    db.commit()
+    db.close()
+
+
+def _events(body: str) -> list[dict]:
+    return [
+        json.loads(line[len("data: "):])
+        for line in body.splitlines()
+        if line.startswith("data: ")
+    ]
+
+
+def test_task_events_stream_pushes_status_changes(test_app):
+    headers = _auth_headers(test_app, "testuser", "testpass")
+    task_id = _create_task()
+
+    def worker():
+        deadline = time.monotonic() + 5
+        while broker.subscriber_count() == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        _set_status(task_id, models.TaskStatus.processing, "Detecting license plates...")
+        _set_status(task_id, models.TaskStatus.success, "Found 1 license plate(s)")
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    response = test_app.get(f"/tasks/{task_id}/events", headers=headers)
+    thread.join()
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert [event["status"] for event in _events(response.text)] == ["pending", "processing", "success"]
+    assert broker.subscriber_count() == 0
+
+
+def test_task_events_checks_access_and_releases_subscription(test_app):
+    task_id = _create_task("otheruser")
+    headers = _auth_headers(test_app, "testuser", "testpass")
+
+    assert test_app.get(f"/tasks/{task_id}/events", headers=headers).status_code == 403
+    assert test_app.get("/tasks/missing/events", headers=headers).status_code == 404
+    assert broker.subscriber_count() == 0
+
+
+def test_notify_payload_truncates_long_details():
+    payload = {"task_id": "t", "status": "error", "progress": None, "details": "Processing error: " + "ж" * 10_000}
+    encoded = task_events.notify_payload(payload)
+    assert len(encoded.encode()) < 8000
+    decoded = json.loads(encoded)
+    assert decoded["details"].startswith("Processing error: жж")
+    assert len(decoded["details"].encode()) <= task_events.TASK_EVENTS_MAX_DETAILS_BYTES
+    assert payload["details"].endswith("ж" * 10)
+
+    short = {"task_id": "t", "status": "success", "progress": 100, "details": "Found 1 license plate(s)"}
+    assert json.loads(task_events.notify_payload(short)) == short
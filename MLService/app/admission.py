@@ -0,0 +1,72 @@
+import threading
+from typing import Tuple
+
+from starlette.responses import JSONResponse
+
+
+class InFlightLimiter:
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.in_flight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.in_flight >= self.limit:
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+
+    def metrics(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+        }
+
+
+class AdmissionMiddleware:
+    # Pure ASGI so the slot is held until a streamed response has finished,
+    # and excess requests are rejected before their upload body is read
+    def __init__(
+        self,
+        app,
+        limiter: InFlightLimiter,
+        path_prefix: str,
+        retry_after_seconds: int,
+        exclude_prefixes: Tuple[str, ...] = (),
+    ):
+        self.app = app
+        self.limiter = limiter
+        self.path_prefix = path_prefix
+        self.retry_after_seconds = retry_after_seconds
+        self.exclude_prefixes = exclude_prefixes
+
+    def _limited(self, scope) -> bool:
+        if scope["type"] != "http":
+            return False
+        path = scope["path"]
+        return path.startswith(self.path_prefix) and not path.startswith(self.exclude_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if not self._limited(scope):
+            await self.app(scope, receive, send)
+            return
+        if not self.limiter.try_acquire():
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "ML service is overloaded, retry later"},
+                headers={"Retry-After": str(self.retry_after_seconds)},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release()
@@ -0,0 +1,213 @@
+import ast
+import os
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+from PIL import Image
+
+from app.boxes import nms
+
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch").lower()
+MODEL_PRECISION = os.getenv("MODEL_PRECISION", "fp32").lower()
+MODEL_IMGSZ = int(os.getenv("MODEL_IMGSZ", "640"))
+CONFIDENCE_THRESHOLD = float(os.getenv("MODEL_CONFIDENCE_THRESHOLD", "0.25"))
+NMS_IOU_THRESHOLD = float(os.getenv("MODEL_NMS_IOU_THRESHOLD", "0.7"))
+ORT_INTRA_OP_THREADS = int(os.getenv("ORT_INTRA_OP_THREADS", "0"))
+ORT_INTER_OP_THREADS = int(os.getenv("ORT_INTER_OP_THREADS", "1"))
+
+# Raw detections: (x1, y1, x2, y2, confidence, class_id) in original image pixels
+RawDetection = Tuple[float, float, float, float, float, int]
+
+
+def letterbox(image: Image.Image, imgsz: int) -> Tuple[np.ndarray, float, int, int]:
+    width, height = image.size
+    scale = min(imgsz / width, imgsz / height)
+    new_width, new_height = round(width * scale), round(height * scale)
+    pad_x = round((imgsz - new_width) / 2 - 0.1)
+    pad_y = round((imgsz - new_height) / 2 - 0.1)
+
+    canvas = Image.new("RGB", (imgsz, imgsz), (114, 114, 114))
+    canvas.paste(image.resize((new_width, new_height), Image.BILINEAR), (pad_x, pad_y))
+    array = np.asarray(canvas, dtype=np.float32).transpose(2, 0, 1) / 255.0
+    return array, scale, pad_x, pad_y
+
+
+class InferenceBackend:
+    name = "base"
+    # Ultralytics predictors are stateful; ONNX Runtime sessions can be shared
+    thread_safe = False
+
+    def __init__(self, weights_path: str):
+        self.weights_path = weights_path
+        self.names: Dict[int, str] = {}
+
+    def predict(self, images: List[Image.Image]) -> List[List[RawDetection]]:
+        raise NotImplementedError
+
+
+class UltralyticsBackend(InferenceBackend):
+    name = "torch"
+
+    def __init__(self, weights_path: str):
+        super().__init__(weights_path)
+        from ultralytics import YOLO
+
+        self.model = YOLO(weights_path, task="detect")
+        self.names = dict(self.model.names)
+
+    def predict(self, images: List[Image.Image]) -> List[List[RawDetection]]:
+        results = self.model(
+            images,
+            imgsz=MODEL_IMGSZ,
+            conf=CONFIDENCE_THRESHOLD,
+            iou=NMS_IOU_THRESHOLD,
+            verbose=False,
+        )
+        batch = []
+        for result in results:
+            detections = []
+            for box in result.boxes:
+                x1, y1, x2, y2 = box.xyxy[0].tolist()
+                detections.append((x1, y1, x2, y2, float(box.conf[0]), int(box.cls[0])))
+            batch.append(detections)
+        return batch
+
+
+class OpenVinoBackend(UltralyticsBackend):
+    name = "openvino"
+
+
+class OnnxRuntimeBackend(InferenceBackend):
+    name = "onnx"
+    thread_safe = True
+
+    def __init__(self, weights_path: str):
+        super().__init__(weights_path)
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = ORT_INTRA_OP_THREADS
+        options.inter_op_num_threads = ORT_INTER_OP_THREADS
+        self.session = ort.InferenceSession(weights_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(metadata["names"]) if "names" in metadata else {0: "license_plate"}
+
+        input_shape = self.session.get_inputs()[0].shape
+        self.imgsz = input_shape[2] if isinstance(input_shape[2], int) else MODEL_IMGSZ
+        self.dynamic_batch = not isinstance(input_shape[0], int)
+
+    def _postprocess(self, output: np.ndarray, scale: float, pad_x: float, pad_y: float, size) -> List[RawDetection]:
+        # YOLOv8 head: (4 + num_classes, anchors) with boxes as cx, cy, w, h
+        predictions = output.T
+        class_scores = predictions[:, 4:]
+        class_ids = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(class_ids)), class_ids]
+        mask = scores > CONFIDENCE_THRESHOLD
+        if not mask.any():
+            return []
+
+        boxes = predictions[mask, :4]
+        scores = scores[mask]
+        class_ids = class_ids[mask]
+        xyxy = np.empty_like(boxes)
+        xyxy[:, 0] = boxes[:, 0] - boxes[:, 2] / 2
+        xyxy[:, 1] = boxes[:, 1] - boxes[:, 3] / 2
+        xyxy[:, 2] = boxes[:, 0] + boxes[:, 2] / 2
+        xyxy[:, 3] = boxes[:, 1] + boxes[:, 3] / 2
+
+        keep = []
+        for class_id in np.unique(class_ids):
+            indices = np.flatnonzero(class_ids == class_id)
+            keep.extend(indices[nms(xyxy[indices], scores[indices], NMS_IOU_THRESHOLD)])
+        keep.sort(key=lambda index: -scores[index])
+
+        width, height = size
+        xyxy[:, [0, 2]] = np.clip((xyxy[:, [0, 2]] - pad_x) / scale, 0, width)
+        xyxy[:, [1, 3]] = np.clip((xyxy[:, [1, 3]] - pad_y) / scale, 0, height)
+        return [
+            (*map(float, xyxy[index]), float(scores[index]), int(class_ids[index]))
+            for index in keep
+        ]
+
+    def predict(self, images: List[Image.Image]) -> List[List[RawDetection]]:
+        prepared = [letterbox(image, self.imgsz) for image in images]
+        if self.dynamic_batch:
+            outputs = self.session.run(None, {self.input_name: np.stack([item[0] for item in prepared])})[0]
+        else:
+            outputs = np.concatenate([
+                self.session.run(None, {self.input_name: item[0][None]})[0] for item in prepared
+            ])
+        return [
+            self._postprocess(output, scale, pad_x, pad_y, image.size)
+            for output, (_, scale, pad_x, pad_y), image in zip(outputs, prepared, images)
+        ]
+
+
+BACKENDS = {
+    "torch": UltralyticsBackend,
+    "onnx": OnnxRuntimeBackend,
+    "openvino": OpenVinoBackend,
+}
+
+
+def exported_path(weights_path: str, backend: str) -> Path:
+    source = Path(weights_path)
+    if backend == "onnx":
+        return source.with_suffix(".onnx")
+    if backend == "openvino":
+        return source.with_name(f"{source.stem}_openvino_model")
+    return source
+
+
+def quantized_path(weights_path: str) -> Path:
+    return Path(weights_path).with_suffix(".int8.onnx")
+
+
+def ensure_exported(weights_path: str, backend: str) -> str:
+    # Export once next to the .pt weights and reuse the artefact until the
+    # weights file is replaced
+    target = exported_path(weights_path, backend)
+    if target.exists() and target.stat().st_mtime >= Path(weights_path).stat().st_mtime:
+        return str(target)
+    from ultralytics import YOLO
+
+    model = YOLO(weights_path, task="detect")
+    if backend == "onnx":
+        exported = model.export(format="onnx", imgsz=MODEL_IMGSZ, dynamic=True)
+    else:
+        exported = model.export(format="openvino", imgsz=MODEL_IMGSZ, dynamic=True)
+    return str(exported)
+
+
+def create_backend(
+    weights_path: str,
+    backend: str = INFERENCE_BACKEND,
+    precision: str = MODEL_PRECISION,
+) -> InferenceBackend:
+    if backend not in BACKENDS:
+        raise RuntimeError(f"Unsupported INFERENCE_BACKEND: {backend}")
+    if precision not in {"fp32", "int8"}:
+        raise RuntimeError(f"Unsupported MODEL_PRECISION: {precision}")
+    if precision == "int8":
+        if backend != "onnx":
+            raise RuntimeError("MODEL_PRECISION=int8 requires INFERENCE_BACKEND=onnx")
+        target = quantized_path(weights_path)
+        if not target.exists():
+            raise RuntimeError(f"{target} not found, run `python -m scripts.quantize_int8` first")
+        return OnnxRuntimeBackend(str(target))
+    if backend != "torch" and weights_path.endswith(".pt"):
+        weights_path = ensure_exported(weights_path, backend)
+    return BACKENDS[backend](weights_path)
+
+
+if __name__ == "__main__":
+    import sys
+
+    from app.inference import MODEL_PATH
+
+    for name in sys.argv[1:] or ["onnx"]:
+        print(ensure_exported(MODEL_PATH, name))
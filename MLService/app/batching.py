@@ -0,0 +1,206 @@
+import asyncio
+import time
+from collections import Counter, deque
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional, Sequence
+
+
+@dataclass
+class _PendingItem:
+    payload: Any
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class BatchStats:
+    def __init__(self, window: int = 1000):
+        self.started_at = time.time()
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.batch_sizes: Counter = Counter()
+        self._queue_waits = deque(maxlen=window)
+        self._inference_times = deque(maxlen=window)
+        self._completed_at = deque(maxlen=window)
+
+    def record(self, size: int, waits: Sequence[float], inference_seconds: float):
+        now = time.time()
+        self.batches += 1
+        self.items += size
+        self.batch_sizes[size] += 1
+        self._queue_waits.extend(waits)
+        self._inference_times.append(inference_seconds)
+        self._completed_at.extend([now] * size)
+
+    @staticmethod
+    def _percentile(values: Sequence[float], percent: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def snapshot(self, queue_depth: int) -> dict:
+        now = time.time()
+        uptime = max(now - self.started_at, 1e-9)
+        recent = [ts for ts in self._completed_at if now - ts <= 60]
+        waits_ms = [wait * 1000 for wait in self._queue_waits]
+        inference_ms = [seconds * 1000 for seconds in self._inference_times]
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "errors": self.errors,
+            "queue_depth": queue_depth,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "batch_size_histogram": {str(size): count for size, count in sorted(self.batch_sizes.items())},
+            "throughput_per_sec": round(self.items / uptime, 3),
+            "throughput_last_60s_per_sec": round(len(recent) / min(uptime, 60), 3),
+            "queue_wait_ms": {
+                "avg": round(sum(waits_ms) / len(waits_ms), 2) if waits_ms else 0.0,
+                "p50": round(self._percentile(waits_ms, 50), 2),
+                "p95": round(self._percentile(waits_ms, 95), 2),
+                "max": round(max(waits_ms), 2) if waits_ms else 0.0,
+            },
+            "inference_ms": {
+                "avg": round(sum(inference_ms) / len(inference_ms), 2) if inference_ms else 0.0,
+                "p95": round(self._percentile(inference_ms, 95), 2),
+            },
+        }
+
+
+class MicroBatcher:
+    # Flushes a batch when it is full or when its oldest item has waited
+    # max_wait_ms; run_batch must return one result per payload, in order.
+    # Batches run on the given executor, never on the event loop itself.
+    def __init__(
+        self,
+        run_batch: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        executor: Optional[Executor] = None,
+        max_concurrent_batches: int = 1,
+    ):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.executor = executor
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+        self.stats = BatchStats()
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._running: set = set()
+
+    async def start(self):
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        for task in list(self._running):
+            task.cancel()
+        while self._queue and not self._queue.empty():
+            item = self._queue.get_nowait()
+            if not item.future.done():
+                item.future.set_exception(RuntimeError("Batcher stopped"))
+
+    async def submit(self, payload: Any) -> Any:
+        if self._worker is None:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_PendingItem(payload=payload, future=future))
+        return await future
+
+    async def submit_many(self, payloads: Sequence[Any]) -> List[Any]:
+        # Enqueue everything up front so the items land in as few batches as possible;
+        # failures are returned in place instead of raised
+        if self._worker is None:
+            await self.start()
+        loop = asyncio.get_running_loop()
+        futures = []
+        for payload in payloads:
+            future = loop.create_future()
+            self._queue.put_nowait(_PendingItem(payload=payload, future=future))
+            futures.append(future)
+        return list(await asyncio.gather(*futures, return_exceptions=True))
+
+    def metrics(self) -> dict:
+        queue_depth = self._queue.qsize() if self._queue else 0
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "running_batches": len(self._running),
+            **self.stats.snapshot(queue_depth),
+        }
+
+    async def _collect(self) -> List[_PendingItem]:
+        first = await self._queue.get()
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                while len(batch) < self.max_batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            batch = [item for item in batch if not item.future.cancelled()]
+            if not batch:
+                self._slots.release()
+                continue
+
+            task = asyncio.create_task(self._process(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _process(self, batch: List[_PendingItem]):
+        try:
+            started = time.perf_counter()
+            waits = [started - item.enqueued_at for item in batch]
+            try:
+                results = await self._execute([item.payload for item in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError("Batch result count does not match input count")
+            except Exception as exc:
+                self.stats.errors += 1
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_exception(exc)
+                return
+
+            self.stats.record(len(batch), waits, time.perf_counter() - started)
+            for item, result in zip(batch, results):
+                if not item.future.done():
+                    item.future.set_result(result)
+        finally:
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(RuntimeError("Batcher stopped"))
+            self._slots.release()
+
+    async def _execute(self, payloads: List[Any]) -> List[Any]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.run_batch, payloads)
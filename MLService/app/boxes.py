@@ -0,0 +1,53 @@
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+
+def iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)), dtype=np.float32)
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-9)
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> List[int]:
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size:
+        current = int(order[0])
+        keep.append(current)
+        if order.size == 1:
+            break
+        overlaps = iou_matrix(boxes[current:current + 1], boxes[order[1:]])[0]
+        order = order[1:][overlaps <= iou_threshold]
+    return keep
+
+
+def match_boxes(
+    reference: Sequence[Sequence[float]],
+    candidate: Sequence[Sequence[float]],
+    iou_threshold: float = 0.5,
+) -> Tuple[int, int, int]:
+    # Greedy one-to-one matching; returns (matched, missed, extra)
+    ref = np.asarray(reference, dtype=np.float32).reshape(-1, 4)
+    cand = np.asarray(candidate, dtype=np.float32).reshape(-1, 4)
+    overlaps = iou_matrix(ref, cand)
+    matched = 0
+    used = set()
+    for ref_index in range(len(ref)):
+        best_index, best_iou = -1, iou_threshold
+        for cand_index in range(len(cand)):
+            if cand_index in used:
+                continue
+            if overlaps[ref_index, cand_index] >= best_iou:
+                best_index, best_iou = cand_index, overlaps[ref_index, cand_index]
+        if best_index >= 0:
+            used.add(best_index)
+            matched += 1
+    return matched, len(ref) - matched, len(cand) - matched
@@ -0,0 +1,138 @@
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+
+def content_key(contents: bytes, model_version: str, variant: str = "") -> str:
+    digest = hashlib.sha256(contents)
+    digest.update(f"|{model_version}|{variant}".encode())
+    return digest.hexdigest()
+
+
+def file_fingerprint(path: str) -> str:
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as handle:
+            for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+                digest.update(chunk)
+    except OSError:
+        return "missing"
+    return digest.hexdigest()[:16]
+
+
+class DetectionCache:
+    # In-memory LRU with TTL; when disk_dir is set, entries are also written
+    # under a per-model-version directory so they survive restarts and stale
+    # versions are dropped on startup.
+    def __init__(self, model_version: str, max_entries: int = 1024, ttl_seconds: float = 3600, disk_dir: str = ""):
+        self.model_version = model_version
+        self.max_entries = max(0, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = Path(disk_dir) / model_version if disk_dir else None
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        if self.disk_dir:
+            self._prepare_disk(Path(disk_dir))
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _prepare_disk(self, root: Path):
+        root.mkdir(parents=True, exist_ok=True)
+        for child in root.iterdir():
+            if child.is_dir() and child.name != self.model_version:
+                shutil.rmtree(child, ignore_errors=True)
+        self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.json"
+
+    def _remember(self, key: str, value: dict, expires_at: float):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _read_disk(self, key: str) -> Optional[tuple]:
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                record = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        if record["expires_at"] <= time.time():
+            path.unlink(missing_ok=True)
+            return None
+        return record["expires_at"], record["value"]
+
+    def _write_disk(self, key: str, value: dict, expires_at: float):
+        path = self._disk_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                json.dump({"expires_at": expires_at, "value": value}, handle)
+            os.replace(tmp_path, path)
+        except OSError:
+            Path(tmp_path).unlink(missing_ok=True)
+
+    async def get(self, key: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+            self.expirations += 1
+
+        if self.disk_dir:
+            record = await asyncio.to_thread(self._read_disk, key)
+            if record is not None:
+                self._remember(key, record[1], record[0])
+                self.disk_hits += 1
+                return record[1]
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, value: dict):
+        if not self.enabled:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, value, expires_at)
+        if self.disk_dir:
+            await asyncio.to_thread(self._write_disk, key, value, expires_at)
+
+    def metrics(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "model_version": self.model_version,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "disk": str(self.disk_dir) if self.disk_dir else None,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+        }
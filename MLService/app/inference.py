@@ -0,0 +1,252 @@
+import io
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+from pydantic import BaseModel
+
+from app.backends import (CONFIDENCE_THRESHOLD, INFERENCE_BACKEND, MODEL_IMGSZ, MODEL_PRECISION,
+                          NMS_IOU_THRESHOLD, InferenceBackend, RawDetection, create_backend, quantized_path)
+from app.cache import file_fingerprint
+from app.tiling import Window, merge_detections, should_tile, tile_grid
+
+MODEL_PATH = os.getenv("MODEL_PATH", "license_plate_detector.pt")
+TARGET_CLASSES = [0]
+# auto: tile images above TILE_THRESHOLD_PX, on: always, off: single pass
+TILING_MODE = os.getenv("TILING_MODE", "auto").lower()
+TILE_BATCH_SIZE = int(os.getenv("TILE_BATCH_SIZE", "16"))
+FAST_DECODE = os.getenv("FAST_DECODE", "true").lower() == "true"
+
+_local = threading.local()
+_shared_backend = None
+_shared_lock = threading.Lock()
+
+
+class BoundingBox(BaseModel):
+    x1: int
+    y1: int
+    x2: int
+    y2: int
+    confidence: float
+    class_name: str
+
+
+class InvalidImageError(ValueError):
+    pass
+
+
+@dataclass
+class DetectionOutcome:
+    width: int = 0
+    height: int = 0
+    detections: Optional[List[BoundingBox]] = None
+    error: Optional[str] = None
+    status_code: int = 200
+
+    def to_cache(self) -> dict:
+        return {
+            "width": self.width,
+            "height": self.height,
+            "detections": [box.model_dump() for box in self.detections or []],
+        }
+
+    @classmethod
+    def from_cache(cls, value: dict) -> "DetectionOutcome":
+        return cls(
+            width=value["width"],
+            height=value["height"],
+            detections=[BoundingBox(**box) for box in value["detections"]],
+        )
+
+
+def model_version() -> str:
+    # Anything that changes the detector output must change this string
+    weights = str(quantized_path(MODEL_PATH)) if MODEL_PRECISION == "int8" else MODEL_PATH
+    return "-".join([
+        INFERENCE_BACKEND,
+        MODEL_PRECISION,
+        file_fingerprint(weights),
+        f"{MODEL_IMGSZ}x{CONFIDENCE_THRESHOLD}x{NMS_IOU_THRESHOLD}",
+        "draft" if FAST_DECODE else "full",
+    ])
+
+
+def get_model() -> InferenceBackend:
+    # Ultralytics predictors keep per-call state, so each executor thread
+    # gets its own instance; thread-safe backends share one session.
+    global _shared_backend
+    if _shared_backend is not None:
+        return _shared_backend
+    backend = getattr(_local, "backend", None)
+    if backend is None:
+        with _shared_lock:
+            if _shared_backend is not None:
+                return _shared_backend
+            backend = create_backend(MODEL_PATH, INFERENCE_BACKEND)
+            if backend.thread_safe:
+                _shared_backend = backend
+        _local.backend = backend
+    return backend
+
+
+def decode_image(contents: bytes, tiling: str = "off") -> Tuple[Image.Image, Tuple[int, int]]:
+    # Returns the decoded image and the original size. JPEGs that are not
+    # going to be tiled are decoded with libjpeg DCT scaling straight to
+    # roughly the model input size, which is much cheaper than a full decode.
+    try:
+        image = Image.open(io.BytesIO(contents))
+        original_size = image.size
+        if FAST_DECODE and image.format == "JPEG" and not should_tile(original_size, tiling):
+            image.draft("RGB", (MODEL_IMGSZ, MODEL_IMGSZ))
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        else:
+            image.load()
+    except Exception as exc:
+        raise InvalidImageError("Invalid image data") from exc
+    return image, original_size
+
+
+def rescale(raw: List[RawDetection], scale_x: float, scale_y: float) -> List[RawDetection]:
+    if scale_x == 1 and scale_y == 1:
+        return raw
+    return [
+        (x1 * scale_x, y1 * scale_y, x2 * scale_x, y2 * scale_y, confidence, cls_id)
+        for x1, y1, x2, y2, confidence, cls_id in raw
+    ]
+
+
+def to_bounding_boxes(raw: List[RawDetection], names) -> List[BoundingBox]:
+    detections = []
+
+    for x1, y1, x2, y2, confidence, cls_id in raw:
+        if cls_id in TARGET_CLASSES:
+            detections.append(BoundingBox(
+                x1=int(x1),
+                y1=int(y1),
+                x2=int(x2),
+                y2=int(y2),
+                confidence=round(float(confidence), 2),
+                class_name=names[cls_id]
+            ))
+    return detections
+
+
+def predict_images(images: List[Image.Image]) -> List[List[BoundingBox]]:
+    if not images:
+        return []
+    backend = get_model()
+    return [to_bounding_boxes(raw, backend.names) for raw in backend.predict(images)]
+
+
+@dataclass
+class DetectionRequest:
+    contents: bytes
+    tiling: str = TILING_MODE
+
+
+@dataclass
+class _Job:
+    index: int
+    image: Image.Image
+    windows: Optional[List[Window]] = None
+
+    def views(self) -> List[Tuple[Optional[Window], Tuple[int, int]]]:
+        if self.windows is None:
+            return [(None, (0, 0))]
+        # The downscaled full frame still catches plates larger than a tile
+        return [(None, (0, 0))] + [(window, (window[0], window[1])) for window in self.windows]
+
+
+def _predict_jobs(jobs: List[_Job]) -> List[List[RawDetection]]:
+    backend = get_model()
+    views = [(job, window) for job in jobs for window, _ in job.views()]
+    raw = []
+    for offset in range(0, len(views), TILE_BATCH_SIZE):
+        chunk = views[offset:offset + TILE_BATCH_SIZE]
+        raw.extend(backend.predict([
+            job.image if window is None else job.image.crop(window) for job, window in chunk
+        ]))
+
+    results = []
+    position = 0
+    for job in jobs:
+        count = len(job.views())
+        per_view = raw[position:position + count]
+        position += count
+        if job.windows is None:
+            results.append(per_view[0])
+        else:
+            results.append(merge_detections(per_view, [offset for _, offset in job.views()]))
+    return results
+
+
+def detect_batch(payloads: List[DetectionRequest]) -> List[DetectionOutcome]:
+    outcomes = [DetectionOutcome() for _ in payloads]
+    jobs = []
+    for index, request in enumerate(payloads):
+        try:
+            image, original_size = decode_image(request.contents, request.tiling)
+        except InvalidImageError as exc:
+            outcomes[index].error = str(exc)
+            outcomes[index].status_code = 400
+            continue
+        outcomes[index].width, outcomes[index].height = original_size
+        windows = tile_grid(*image.size) if should_tile(original_size, request.tiling) else None
+        jobs.append(_Job(index=index, image=image, windows=windows))
+
+    try:
+        predictions = _predict_jobs(jobs) if jobs else []
+    except Exception:
+        if len(jobs) == 1:
+            raise
+        # Isolate the image that broke the batch instead of failing all of them
+        predictions = []
+        for job in jobs:
+            try:
+                predictions.append(_predict_jobs([job])[0])
+            except Exception:
+                outcomes[job.index].error = "Inference failed"
+                outcomes[job.index].status_code = 500
+                predictions.append(None)
+
+    names = get_model().names if jobs else {}
+    for job, raw in zip(jobs, predictions):
+        if raw is not None:
+            outcome = outcomes[job.index]
+            # Map boxes from the (possibly reduced) decoded image back to the original
+            raw = rescale(raw, outcome.width / job.image.width, outcome.height / job.image.height)
+            outcomes[job.index].detections = to_bounding_boxes(raw, names)
+    return outcomes
+
+
+def detect_frames(frames: List[np.ndarray]) -> List[List[BoundingBox]]:
+    jobs = [_Job(index=index, image=Image.fromarray(frame)) for index, frame in enumerate(frames)]
+    names = get_model().names
+    return [to_bounding_boxes(raw, names) for raw in _predict_jobs(jobs)] if jobs else []
+
+
+def warm_up(batch_sizes: List[int], iterations: int) -> float:
+    # Runs synthetic batches so lazy initialisation, allocator growth and
+    # backend graph optimisation happen before real traffic arrives
+    started = time.perf_counter()
+    image = Image.new("RGB", (MODEL_IMGSZ, MODEL_IMGSZ), (114, 114, 114))
+    for batch_size in batch_sizes:
+        for _ in range(iterations):
+            _predict_jobs([_Job(index=index, image=image) for index in range(batch_size)])
+    return time.perf_counter() - started
+
+
+def init_worker(batch_sizes: List[int], iterations: int):
+    # Executor initializer: each worker loads and warms its own model before
+    # it takes its first job, however the pool spreads the work
+    get_model()
+    _local.warmup_seconds = warm_up(batch_sizes, iterations)
+
+
+def warmup_seconds() -> float:
+    return getattr(_local, "warmup_seconds", 0.0)
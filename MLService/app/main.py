@@ -1,12 +1,148 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List
-import io
-from PIL import Image
-from ultralytics import YOLO
+from typing import List, Optional
+import json
+import multiprocessing
+import os
 
-app = FastAPI(title="AnonifyNeuro ML Service", version="1.0.0")
+from app import inference, tracking, video
+from app.admission import AdmissionMiddleware, InFlightLimiter
+from app.backends import INFERENCE_BACKEND, MODEL_PRECISION
+from app.batching import MicroBatcher
+from app.cache import DetectionCache, content_key
+from app.inference import BoundingBox, DetectionOutcome, DetectionRequest
+
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "10"))
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread").lower()
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+MAX_IN_FLIGHT = int(os.getenv("MAX_IN_FLIGHT", "32"))
+# A video stream holds its slot for the whole upload, so videos get their
+# own limit instead of taking slots from image requests
+MAX_VIDEO_STREAMS = int(os.getenv("MAX_VIDEO_STREAMS", "2"))
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "1"))
+BATCH_ENDPOINT_MAX_IMAGES = int(os.getenv("BATCH_ENDPOINT_MAX_IMAGES", "64"))
+DETECTION_CACHE_SIZE = int(os.getenv("DETECTION_CACHE_SIZE", "1024"))
+DETECTION_CACHE_TTL_SECONDS = float(os.getenv("DETECTION_CACHE_TTL_SECONDS", "3600"))
+DETECTION_CACHE_DIR = os.getenv("DETECTION_CACHE_DIR", "")
+WARMUP_BATCH_SIZES = [
+    int(size) for size in os.getenv("WARMUP_BATCH_SIZES", f"1,{BATCH_MAX_SIZE}").split(",") if size.strip()
+]
+WARMUP_ITERATIONS = int(os.getenv("WARMUP_ITERATIONS", "2"))
+LIMITED_PATH_PREFIX = "/detect"
+VIDEO_PATH_PREFIX = "/detect/video"
+
+class DetectionResponse(BaseModel):
+    success: bool
+    detections: List[BoundingBox]
+    image_width: int
+    image_height: int
+
+class BatchItemResult(BaseModel):
+    index: int
+    filename: Optional[str] = None
+    success: bool
+    detections: List[BoundingBox] = []
+    image_width: Optional[int] = None
+    image_height: Optional[int] = None
+    error: Optional[str] = None
+
+class BatchDetectionResponse(BaseModel):
+    success: bool
+    results: List[BatchItemResult]
+
+
+def _create_executor():
+    if INFERENCE_EXECUTOR == "process":
+        return ProcessPoolExecutor(
+            max_workers=INFERENCE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=inference.init_worker,
+            initargs=(WARMUP_BATCH_SIZES, WARMUP_ITERATIONS),
+        )
+    if INFERENCE_EXECUTOR != "thread":
+        raise RuntimeError(f"Unsupported INFERENCE_EXECUTOR: {INFERENCE_EXECUTOR}")
+    return ThreadPoolExecutor(
+        max_workers=INFERENCE_WORKERS,
+        thread_name_prefix="inference",
+        initializer=inference.init_worker,
+        initargs=(WARMUP_BATCH_SIZES, WARMUP_ITERATIONS),
+    )
+
+
+executor = _create_executor()
+limiter = InFlightLimiter(MAX_IN_FLIGHT)
+video_limiter = InFlightLimiter(MAX_VIDEO_STREAMS)
+batcher = MicroBatcher(
+    inference.detect_batch,
+    max_batch_size=BATCH_MAX_SIZE,
+    max_wait_ms=BATCH_MAX_WAIT_MS,
+    executor=executor,
+    max_concurrent_batches=INFERENCE_WORKERS,
+)
+cache = DetectionCache(
+    inference.model_version(),
+    max_entries=DETECTION_CACHE_SIZE,
+    ttl_seconds=DETECTION_CACHE_TTL_SECONDS,
+    disk_dir=DETECTION_CACHE_DIR,
+)
+
+
+async def run_detection(payloads: List[DetectionRequest]) -> List[DetectionOutcome]:
+    # Identical bytes under the same model version always give the same boxes
+    keys = [content_key(request.contents, cache.model_version, request.tiling) for request in payloads]
+    outcomes: List[Optional[DetectionOutcome]] = [None] * len(payloads)
+    missing = []
+    for index, key in enumerate(keys):
+        cached = await cache.get(key)
+        if cached is not None:
+            outcomes[index] = DetectionOutcome.from_cache(cached)
+        else:
+            missing.append(index)
+
+    fresh = await batcher.submit_many([payloads[index] for index in missing]) if missing else []
+    for index, outcome in zip(missing, fresh):
+        outcomes[index] = outcome
+        if isinstance(outcome, DetectionOutcome) and not outcome.error:
+            await cache.put(keys[index], outcome.to_cache())
+    return outcomes
+
+
+readiness = {"ready": False, "warmup_seconds": None, "error": None}
+
+
+async def warm_up():
+    # Workers warm up in the executor initializer, so a job only runs on a
+    # warm worker. These jobs start the workers: the pool adds one for every
+    # job submitted while the ones it has are still busy initialising.
+    loop = asyncio.get_running_loop()
+    try:
+        durations = await asyncio.gather(*[
+            loop.run_in_executor(executor, inference.warmup_seconds) for _ in range(INFERENCE_WORKERS)
+        ])
+    except Exception as exc:
+        readiness["error"] = f"Warm-up failed: {exc}"
+        return
+    readiness["warmup_seconds"] = round(max(durations), 3)
+    readiness["ready"] = True
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await batcher.start()
+    warmup_task = asyncio.create_task(warm_up())
+    yield
+    warmup_task.cancel()
+    await batcher.stop()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+app = FastAPI(title="AnonifyNeuro ML Service", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,65 +152,173 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-model =YOLO('license_plate_detector.pt')
 
-class BoundingBox(BaseModel):
-    x1: int
-    y1: int
-    x2: int
-    y2: int
-    confidence: float
-    class_name: str
+app.add_middleware(
+    AdmissionMiddleware,
+    limiter=limiter,
+    path_prefix=LIMITED_PATH_PREFIX,
+    retry_after_seconds=RETRY_AFTER_SECONDS,
+    exclude_prefixes=(VIDEO_PATH_PREFIX,),
+)
+
+app.add_middleware(
+    AdmissionMiddleware,
+    limiter=video_limiter,
+    path_prefix=VIDEO_PATH_PREFIX,
+    retry_after_seconds=RETRY_AFTER_SECONDS,
+)
 
-class DetectionResponse(BaseModel):
-    success: bool
-    detections: List[BoundingBox]
-    image_width: int
-    image_height: int
 
 @app.get("/health")
 def health_check():
     return {"status": "ok", "service": "ml"}
 
+@app.get("/ready")
+def readiness_check():
+    body = {"status": "ready" if readiness["ready"] else "warming_up", "service": "ml", **readiness}
+    if readiness["error"]:
+        body["status"] = "error"
+    return JSONResponse(status_code=200 if readiness["ready"] else 503, content=body)
+
+@app.get("/metrics")
+def metrics():
+    return {
+        "batching": batcher.metrics(),
+        "admission": limiter.metrics(),
+        "video_admission": video_limiter.metrics(),
+        "executor": {"kind": INFERENCE_EXECUTOR, "workers": INFERENCE_WORKERS},
+        "readiness": readiness,
+        "backend": INFERENCE_BACKEND,
+        "precision": MODEL_PRECISION,
+        "cache": cache.metrics(),
+    }
+
 @app.post("/detect", response_model=DetectionResponse)
-async def detect(file: UploadFile = File(...)):
+async def detect(
+    file: UploadFile = File(...),
+    tiling: str = Query(inference.TILING_MODE, pattern="^(auto|on|off)$"),
+):
     if not file.content_type or not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image")
 
     contents = await file.read()
-    try:
-        image = Image.open(io.BytesIO(contents))
-        if image.mode != "RGB":
-            image = image.convert("RGB")
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid image data")
-
-    width, height = image.size
-
-    # Run inference
-    results = model(image)
-
-    detections = []
-    target_classes = [0] 
-
-    for result in results:
-        boxes = result.boxes
-        for box in boxes:
-            cls_id = int(box.cls[0])
-            if cls_id in target_classes:
-                coords = box.xyxy[0].tolist()
-                detections.append(BoundingBox(
-                    x1=int(coords[0]),
-                    y1=int(coords[1]),
-                    x2=int(coords[2]),
-                    y2=int(coords[3]),
-                    confidence=round(float(box.conf[0]), 2),
-                    class_name=model.names[cls_id]
-                ))
+
+    # Decoding and inference run batched on the inference executor
+    outcome = (await run_detection([DetectionRequest(contents, tiling)]))[0]
+    if isinstance(outcome, Exception):
+        raise HTTPException(status_code=500, detail="Inference failed")
+    if outcome.error:
+        raise HTTPException(status_code=outcome.status_code, detail=outcome.error)
 
     return DetectionResponse(
         success=True,
-        detections=detections,
-        image_width=width,
-        image_height=height
+        detections=outcome.detections,
+        image_width=outcome.width,
+        image_height=outcome.height
     )
+
+@app.post("/detect/batch", response_model=BatchDetectionResponse)
+async def detect_batch(
+    files: List[UploadFile] = File(...),
+    tiling: str = Query(inference.TILING_MODE, pattern="^(auto|on|off)$"),
+):
+    if len(files) > BATCH_ENDPOINT_MAX_IMAGES:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_ENDPOINT_MAX_IMAGES} images per request")
+
+    results: List[Optional[BatchItemResult]] = [None] * len(files)
+    payloads = []
+    positions = []
+    for index, file in enumerate(files):
+        if not file.content_type or not file.content_type.startswith("image/"):
+            results[index] = BatchItemResult(index=index, filename=file.filename, success=False, error="File must be an image")
+            continue
+        payloads.append(DetectionRequest(await file.read(), tiling))
+        positions.append(index)
+
+    # Results come back in submission order, so they map straight to positions
+    outcomes = await run_detection(payloads)
+    for index, outcome in zip(positions, outcomes):
+        filename = files[index].filename
+        if isinstance(outcome, Exception):
+            results[index] = BatchItemResult(index=index, filename=filename, success=False, error="Inference failed")
+        elif outcome.error:
+            results[index] = BatchItemResult(index=index, filename=filename, success=False, error=outcome.error)
+        else:
+            results[index] = BatchItemResult(
+                index=index,
+                filename=filename,
+                success=True,
+                detections=outcome.detections,
+                image_width=outcome.width,
+                image_height=outcome.height,
+            )
+
+    return BatchDetectionResponse(success=all(item.success for item in results), results=results)
+
+
+@app.post("/detect/video")
+async def detect_video(
+    file: UploadFile = File(...),
+    batch_size: int = Query(BATCH_MAX_SIZE, ge=1, le=64),
+    mode: str = Query("per_frame", pattern="^(per_frame|tracking)$"),
+    keyframe_interval: int = Query(tracking.KEYFRAME_INTERVAL, ge=1, le=300),
+    min_track_confidence: float = Query(tracking.MIN_TRACK_CONFIDENCE, ge=0.0, le=1.0),
+):
+    if file.content_type and not file.content_type.startswith(("video/", "application/octet-stream")):
+        raise HTTPException(status_code=400, detail="File must be a video")
+
+    suffix = os.path.splitext(file.filename or "")[1]
+    path = await asyncio.to_thread(video.spool_to_disk, file.file, suffix)
+    try:
+        reader = await asyncio.to_thread(video.FrameReader, path)
+    except video.InvalidVideoError as exc:
+        os.unlink(path)
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    async def events():
+        # NDJSON: one meta line, one line per frame in order, one end line.
+        # Frames are decoded and detected batch by batch, the next batch is
+        # decoded while the current one is on the model. In tracking mode a
+        # chunk holds batch_size keyframes and the frames between them.
+        loop = asyncio.get_running_loop()
+        index = 0
+        tracker = None
+        chunk_size = batch_size
+        if mode == "tracking":
+            tracker = tracking.KeyframeTracker(keyframe_interval, min_track_confidence)
+            chunk_size = batch_size * keyframe_interval
+        pending = asyncio.ensure_future(asyncio.to_thread(reader.read_batch, chunk_size))
+        try:
+            yield json.dumps({"type": "meta", **reader.meta()}) + "\n"
+            while True:
+                frames = await pending
+                if not frames:
+                    break
+                pending = asyncio.ensure_future(asyncio.to_thread(reader.read_batch, chunk_size))
+                if tracker is None:
+                    detections = await loop.run_in_executor(executor, inference.detect_frames, frames)
+                    keyframes = [True] * len(frames)
+                else:
+                    tracker, detections, keyframes = await loop.run_in_executor(
+                        executor, tracking.track_chunk, tracker, frames
+                    )
+                for boxes, keyframe in zip(detections, keyframes):
+                    yield json.dumps({
+                        "type": "frame",
+                        "index": index,
+                        "keyframe": keyframe,
+                        "detections": [box.model_dump() for box in boxes],
+                    }) + "\n"
+                    index += 1
+            end = {"type": "end", "frames": index, "mode": mode}
+            if tracker is not None:
+                end["detected_frames"] = tracker.detections_run
+                end["forced_detections"] = tracker.forced_detections
+            yield json.dumps(end) + "\n"
+        finally:
+            if not pending.done():
+                await asyncio.wait([pending])
+            reader.release()
+            os.unlink(path)
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
@@ -0,0 +1,88 @@
+import os
+from typing import List, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+from app.backends import RawDetection
+from app.boxes import iou_matrix
+
+TILE_SIZE = int(os.getenv("TILE_SIZE", "640"))
+TILE_OVERLAP = float(os.getenv("TILE_OVERLAP", "0.2"))
+TILE_THRESHOLD_PX = int(os.getenv("TILE_THRESHOLD_PX", "2000"))
+TILE_MERGE_IOU = float(os.getenv("TILE_MERGE_IOU", "0.5"))
+# A box mostly covered by a stronger one is the same plate cut at a tile edge
+TILE_MERGE_CONTAINMENT = float(os.getenv("TILE_MERGE_CONTAINMENT", "0.7"))
+
+Window = Tuple[int, int, int, int]
+
+
+def _axis_starts(length: int, tile: int, stride: int) -> List[int]:
+    if length <= tile:
+        return [0]
+    starts = list(range(0, length - tile, stride))
+    starts.append(length - tile)
+    return starts
+
+
+def tile_grid(width: int, height: int, tile_size: int = TILE_SIZE, overlap: float = TILE_OVERLAP) -> List[Window]:
+    stride = max(1, int(tile_size * (1 - overlap)))
+    return [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in _axis_starts(height, tile_size, stride)
+        for x in _axis_starts(width, tile_size, stride)
+    ]
+
+
+def should_tile(size: Tuple[int, int], mode: str, threshold: int = TILE_THRESHOLD_PX) -> bool:
+    if mode == "on":
+        return True
+    if mode == "off":
+        return False
+    return max(size) > threshold
+
+
+def crop_tiles(image: Image.Image, windows: Sequence[Window]) -> List[Image.Image]:
+    return [image.crop(window) for window in windows]
+
+
+def merge_detections(
+    per_window: Sequence[Sequence[RawDetection]],
+    offsets: Sequence[Tuple[int, int]],
+    iou_threshold: float = TILE_MERGE_IOU,
+    containment_threshold: float = TILE_MERGE_CONTAINMENT,
+) -> List[RawDetection]:
+    rows = [
+        (x1 + dx, y1 + dy, x2 + dx, y2 + dy, confidence, cls_id)
+        for detections, (dx, dy) in zip(per_window, offsets)
+        for x1, y1, x2, y2, confidence, cls_id in detections
+    ]
+    if not rows:
+        return []
+
+    data = np.asarray(rows, dtype=np.float64)
+    boxes, scores, classes = data[:, :4], data[:, 4], data[:, 5].astype(int)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    order = np.argsort(-scores, kind="stable")
+    suppressed = np.zeros(len(rows), dtype=bool)
+    keep = []
+    for position, index in enumerate(order):
+        if suppressed[index]:
+            continue
+        keep.append(index)
+        rest = order[position + 1:]
+        rest = rest[~suppressed[rest] & (classes[rest] == classes[index])]
+        if not rest.size:
+            continue
+        overlaps = iou_matrix(boxes[index:index + 1], boxes[rest])[0]
+        inter_w = np.clip(np.minimum(boxes[index, 2], boxes[rest, 2]) - np.maximum(boxes[index, 0], boxes[rest, 0]), 0, None)
+        inter_h = np.clip(np.minimum(boxes[index, 3], boxes[rest, 3]) - np.maximum(boxes[index, 1], boxes[rest, 1]), 0, None)
+        containment = inter_w * inter_h / np.maximum(np.minimum(areas[index], areas[rest]), 1e-9)
+        duplicates = rest[(overlaps > iou_threshold) | (containment > containment_threshold)]
+        suppressed[duplicates] = True
+        # Grow the kept box over its duplicates so a plate split across tiles
+        # is covered completely even if the cut-off part scored higher
+        boxes[index, :2] = np.minimum(boxes[index, :2], boxes[duplicates, :2].min(axis=0, initial=np.inf))
+        boxes[index, 2:] = np.maximum(boxes[index, 2:], boxes[duplicates, 2:].max(axis=0, initial=-np.inf))
+
+    return [(*map(float, boxes[index]), float(scores[index]), int(classes[index])) for index in keep]
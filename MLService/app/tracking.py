@@ -0,0 +1,137 @@
+import os
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.inference import BoundingBox, detect_frames
+
+KEYFRAME_INTERVAL = int(os.getenv("TRACK_KEYFRAME_INTERVAL", "5"))
+MIN_TRACK_CONFIDENCE = float(os.getenv("TRACK_MIN_CONFIDENCE", "0.5"))
+# Propagated boxes are padded a little to absorb drift between keyframes
+TRACK_BOX_PADDING = float(os.getenv("TRACK_BOX_PADDING", "0.1"))
+
+_LK_PARAMS = dict(
+    winSize=(15, 15),
+    maxLevel=3,
+    criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03),
+)
+_MAX_FORWARD_BACKWARD_ERROR = 1.0
+
+
+@dataclass
+class _Track:
+    box: np.ndarray
+    confidence: float
+    class_name: str
+    score: float = 1.0
+
+
+@dataclass
+class KeyframeTracker:
+    keyframe_interval: int = KEYFRAME_INTERVAL
+    min_confidence: float = MIN_TRACK_CONFIDENCE
+    tracks: List[_Track] = field(default_factory=list)
+    previous_gray: Optional[np.ndarray] = None
+    frames_since_keyframe: int = 0
+    detections_run: int = 0
+    forced_detections: int = 0
+
+    def reset(self, gray: np.ndarray, detections: List[BoundingBox]):
+        self.tracks = [
+            _Track(
+                box=np.array([box.x1, box.y1, box.x2, box.y2], dtype=np.float32),
+                confidence=box.confidence,
+                class_name=box.class_name,
+            )
+            for box in detections
+        ]
+        self.previous_gray = gray
+        self.frames_since_keyframe = 0
+
+    def _track_points(self, box: np.ndarray) -> np.ndarray:
+        height, width = self.previous_gray.shape
+        x1, y1 = int(max(0, box[0])), int(max(0, box[1]))
+        x2, y2 = int(min(width, box[2])), int(min(height, box[3]))
+        if x2 - x1 < 2 or y2 - y1 < 2:
+            return np.empty((0, 1, 2), dtype=np.float32)
+        corners = cv2.goodFeaturesToTrack(self.previous_gray[y1:y2, x1:x2], maxCorners=30, qualityLevel=0.01, minDistance=3)
+        if corners is None or len(corners) < 4:
+            xs, ys = np.meshgrid(np.linspace(x1, x2 - 1, 4), np.linspace(y1, y2 - 1, 4))
+            return np.stack([xs.ravel(), ys.ravel()], axis=1).reshape(-1, 1, 2).astype(np.float32)
+        return (corners + np.array([x1, y1], dtype=np.float32)).astype(np.float32)
+
+    def propagate(self, gray: np.ndarray) -> float:
+        # Moves every track by the median optical flow of its points; the
+        # share of points that survive a forward-backward check is the
+        # track's confidence for this step
+        confidence = 1.0
+        for track in self.tracks:
+            points = self._track_points(track.box)
+            if not len(points):
+                track.score = 0.0
+                confidence = 0.0
+                continue
+            forward, status, _ = cv2.calcOpticalFlowPyrLK(self.previous_gray, gray, points, None, **_LK_PARAMS)
+            backward, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self.previous_gray, forward, None, **_LK_PARAMS)
+            error = np.linalg.norm((points - backward).reshape(-1, 2), axis=1)
+            good = (status.ravel() == 1) & (back_status.ravel() == 1) & (error < _MAX_FORWARD_BACKWARD_ERROR)
+            ratio = float(good.mean())
+            if good.any():
+                shift = np.median((forward - points).reshape(-1, 2)[good], axis=0)
+                track.box += np.array([shift[0], shift[1], shift[0], shift[1]], dtype=np.float32)
+            track.score *= ratio
+            confidence = min(confidence, track.score)
+        self.previous_gray = gray
+        self.frames_since_keyframe += 1
+        return confidence
+
+    def boxes(self, width: int, height: int) -> List[BoundingBox]:
+        result = []
+        for track in self.tracks:
+            x1, y1, x2, y2 = track.box
+            pad_x = (x2 - x1) * TRACK_BOX_PADDING / 2 if self.frames_since_keyframe else 0
+            pad_y = (y2 - y1) * TRACK_BOX_PADDING / 2 if self.frames_since_keyframe else 0
+            x1, x2 = max(0, x1 - pad_x), min(width, x2 + pad_x)
+            y1, y2 = max(0, y1 - pad_y), min(height, y2 + pad_y)
+            if x2 <= x1 or y2 <= y1:
+                continue
+            result.append(BoundingBox(
+                x1=int(x1), y1=int(y1), x2=int(x2), y2=int(y2),
+                confidence=track.confidence, class_name=track.class_name,
+            ))
+        return result
+
+
+def track_chunk(
+    tracker: KeyframeTracker,
+    frames: List[np.ndarray],
+    detect: Callable[[List[np.ndarray]], List[List[BoundingBox]]] = detect_frames,
+) -> Tuple[KeyframeTracker, List[List[BoundingBox]], List[bool]]:
+    # Scheduled keyframes of the chunk are detected as one batch up front;
+    # a frame whose tracks lose confidence is re-detected on its own
+    interval = max(1, tracker.keyframe_interval)
+    offset = tracker.frames_since_keyframe + 1 if tracker.previous_gray is not None else interval
+    scheduled = [index for index in range(len(frames)) if (offset + index) % interval == 0]
+    scheduled_detections = dict(zip(scheduled, detect([frames[index] for index in scheduled]))) if scheduled else {}
+    tracker.detections_run += len(scheduled)
+
+    results = []
+    keyframes = []
+    for index, frame in enumerate(frames):
+        gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+        height, width = gray.shape
+        detections = scheduled_detections.get(index)
+        if detections is None and tracker.previous_gray is not None:
+            if tracker.propagate(gray) < tracker.min_confidence:
+                detections = detect([frame])[0]
+                tracker.detections_run += 1
+                tracker.forced_detections += 1
+        if detections is not None or tracker.previous_gray is None:
+            tracker.reset(gray, detections or [])
+            keyframes.append(True)
+        else:
+            keyframes.append(False)
+        results.append(tracker.boxes(width, height))
+    return tracker, results, keyframes
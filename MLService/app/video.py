@@ -0,0 +1,52 @@
+import os
+import shutil
+import tempfile
+from typing import BinaryIO, List
+
+import cv2
+import numpy as np
+
+
+class InvalidVideoError(ValueError):
+    pass
+
+
+def spool_to_disk(source: BinaryIO, suffix: str = "") -> str:
+    # OpenCV needs a real path; copy in chunks so memory stays flat
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix="video-")
+    with os.fdopen(fd, "wb") as target:
+        source.seek(0)
+        shutil.copyfileobj(source, target, length=1024 * 1024)
+    return path
+
+
+class FrameReader:
+    def __init__(self, path: str):
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            self.capture.release()
+            raise InvalidVideoError("Invalid video data")
+        self.fps = float(self.capture.get(cv2.CAP_PROP_FPS) or 0.0)
+        self.width = int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.frame_count = max(0, int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT)))
+
+    def meta(self) -> dict:
+        return {
+            "fps": self.fps,
+            "width": self.width,
+            "height": self.height,
+            "frame_count": self.frame_count,
+        }
+
+    def read_batch(self, size: int) -> List[np.ndarray]:
+        frames = []
+        while len(frames) < size:
+            ok, frame = self.capture.read()
+            if not ok:
+                break
+            frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        return frames
+
+    def release(self):
+        self.capture.release()
@@ -0,0 +1,116 @@
+"""Compare inference backends on CPU.
+
+Usage (from the MLService directory):
+    python -m scripts.benchmark_backends --images ./samples --backends torch,onnx,openvino
+
+Reports per-image latency, images/sec at several batch sizes and how closely
+each backend's boxes agree with the PyTorch reference.
+"""
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from app.backends import create_backend
+from app.boxes import match_boxes
+from app.inference import MODEL_PATH, TARGET_CLASSES
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def load_images(folder: str | None, limit: int) -> list[Image.Image]:
+    if not folder:
+        return [Image.new("RGB", (1280, 720), (90, 90, 90)) for _ in range(limit)]
+    paths = sorted(p for p in Path(folder).iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)[:limit]
+    if not paths:
+        raise SystemExit(f"No images found in {folder}")
+    return [Image.open(path).convert("RGB") for path in paths]
+
+
+def boxes_of(raw_detections, min_confidence: float):
+    return [
+        [x1, y1, x2, y2]
+        for x1, y1, x2, y2, confidence, cls_id in raw_detections
+        if cls_id in TARGET_CLASSES and confidence >= min_confidence
+    ]
+
+
+def benchmark(backend, images, batch_sizes, warmup: int):
+    for _ in range(warmup):
+        backend.predict(images[:1])
+
+    latencies = []
+    for image in images:
+        started = time.perf_counter()
+        backend.predict([image])
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    throughput = {}
+    for batch_size in batch_sizes:
+        started = time.perf_counter()
+        for offset in range(0, len(images), batch_size):
+            backend.predict(images[offset:offset + batch_size])
+        throughput[batch_size] = len(images) / (time.perf_counter() - started)
+
+    ordered = sorted(latencies)
+    return {
+        "p50_ms": statistics.median(ordered),
+        "p95_ms": ordered[min(len(ordered) - 1, int(0.95 * (len(ordered) - 1)))],
+        "throughput": throughput,
+    }
+
+
+def agreement(reference, candidate, iou_threshold: float, min_confidence: float):
+    matched = missed = extra = 0
+    for ref, cand in zip(reference, candidate):
+        m, mi, ex = match_boxes(boxes_of(ref, min_confidence), boxes_of(cand, min_confidence), iou_threshold)
+        matched += m
+        missed += mi
+        extra += ex
+    total = matched + missed
+    return {
+        "matched": matched,
+        "missed": missed,
+        "extra": extra,
+        "recall_vs_reference": matched / total if total else 1.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="folder with sample images (synthetic frames if omitted)")
+    parser.add_argument("--weights", default=MODEL_PATH)
+    parser.add_argument("--backends", default="torch,onnx")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--batch-sizes", default="1,4,8")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--iou", type=float, default=0.9, help="IoU tolerance for box agreement")
+    parser.add_argument("--min-confidence", type=float, default=0.5)
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.limit)
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+    names = [name.strip() for name in args.backends.split(",") if name.strip()]
+
+    reference = None
+    print(f"{len(images)} images, batch sizes {batch_sizes}")
+    for name in names:
+        backend = create_backend(args.weights, name)
+        predictions = [backend.predict([image])[0] for image in images]
+        if reference is None:
+            reference = predictions
+        stats = benchmark(backend, images, batch_sizes, args.warmup)
+        throughput = ", ".join(f"bs={size}: {value:.1f} img/s" for size, value in stats["throughput"].items())
+        print(f"[{name}] p50={stats['p50_ms']:.1f} ms p95={stats['p95_ms']:.1f} ms | {throughput}")
+        if predictions is not reference:
+            report = agreement(reference, predictions, args.iou, args.min_confidence)
+            print(
+                f"[{name}] vs {names[0]}: matched={report['matched']} missed={report['missed']} "
+                f"extra={report['extra']} recall={report['recall_vs_reference']:.3f} (IoU>={args.iou})"
+            )
+
+
+if __name__ == "__main__":
+    main()
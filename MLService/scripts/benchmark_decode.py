@@ -0,0 +1,71 @@
+"""Measure JPEG decode time and peak RSS with and without DCT-scaled decoding.
+
+Usage (from the MLService directory):
+    python -m scripts.benchmark_decode --images ./samples/highres
+
+Each mode runs in a fresh subprocess so its peak RSS is not polluted by the
+other one.
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from PIL import Image
+
+MODES = ("full", "draft")
+
+
+def run_worker(mode: str, folder: str, limit: int, target: int):
+    paths = sorted(p for p in Path(folder).iterdir() if p.suffix.lower() in {".jpg", ".jpeg"})[:limit]
+    timings = []
+    for path in paths:
+        contents = path.read_bytes()
+        started = time.perf_counter()
+        image = Image.open(io.BytesIO(contents))
+        if mode == "draft":
+            image.draft("RGB", (target, target))
+        image = image.convert("RGB")
+        timings.append((time.perf_counter() - started) * 1000)
+        del image
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"count": len(paths), "timings": timings, "peak_rss_mb": peak_kb / 1024}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", required=True, help="folder of JPEG images")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--target", type=int, default=int(os.getenv("MODEL_IMGSZ", "640")))
+    parser.add_argument("--worker", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.images, args.limit, args.target)
+        return
+
+    for mode in MODES:
+        output = subprocess.run(
+            [sys.executable, "-m", "scripts.benchmark_decode", "--images", args.images,
+             "--limit", str(args.limit), "--target", str(args.target), "--worker", mode],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        report = json.loads(output)
+        if not report["count"]:
+            raise SystemExit(f"No JPEG images found in {args.images}")
+        timings = report["timings"]
+        print(
+            f"[{mode}] {report['count']} images: mean={statistics.mean(timings):.1f} ms "
+            f"p50={statistics.median(timings):.1f} ms max={max(timings):.1f} ms "
+            f"peak RSS={report['peak_rss_mb']:.0f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
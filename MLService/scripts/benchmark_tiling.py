@@ -0,0 +1,90 @@
+"""Compare tiled and single-pass detection on high-resolution images.
+
+Usage (from the MLService directory):
+    python -m scripts.benchmark_tiling --images ./samples/highres --labels ./samples/highres_labels
+
+Labels are optional YOLO txt files (class cx cy w h, normalized) named after
+the images. With labels the report shows recall/precision per mode, without
+them it shows how many plates each mode finds and their overlap.
+"""
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+from app.boxes import match_boxes
+from app.inference import DetectionRequest, detect_batch, get_model
+from scripts.benchmark_backends import IMAGE_SUFFIXES
+
+MODES = ("off", "on")
+
+
+def read_labels(path: Path, width: int, height: int):
+    if not path.exists():
+        return []
+    boxes = []
+    for line in path.read_text().splitlines():
+        parts = line.split()
+        if len(parts) < 5 or int(parts[0]) != 0:
+            continue
+        cx, cy, w, h = (float(value) for value in parts[1:5])
+        boxes.append([(cx - w / 2) * width, (cy - h / 2) * height, (cx + w / 2) * width, (cy + h / 2) * height])
+    return boxes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", required=True)
+    parser.add_argument("--labels", help="folder with YOLO label files")
+    parser.add_argument("--limit", type=int, default=30)
+    parser.add_argument("--iou", type=float, default=0.5)
+    parser.add_argument("--min-confidence", type=float, default=0.5)
+    args = parser.parse_args()
+
+    paths = sorted(p for p in Path(args.images).iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)[:args.limit]
+    if not paths:
+        raise SystemExit(f"No images found in {args.images}")
+    get_model()
+    detect_batch([DetectionRequest(paths[0].read_bytes(), "off")])
+
+    results = {mode: {"latency": [], "boxes": []} for mode in MODES}
+    truth = []
+    for path in paths:
+        contents = path.read_bytes()
+        for mode in MODES:
+            started = time.perf_counter()
+            outcome = detect_batch([DetectionRequest(contents, mode)])[0]
+            results[mode]["latency"].append((time.perf_counter() - started) * 1000)
+            results[mode]["boxes"].append([
+                [box.x1, box.y1, box.x2, box.y2]
+                for box in outcome.detections or []
+                if box.confidence >= args.min_confidence
+            ])
+        if args.labels:
+            truth.append(read_labels(Path(args.labels) / f"{path.stem}.txt", outcome.width, outcome.height))
+
+    print(f"{len(paths)} images")
+    for mode in MODES:
+        latency = results[mode]["latency"]
+        found = sum(len(boxes) for boxes in results[mode]["boxes"])
+        line = f"[tiling={mode}] p50={statistics.median(latency):.0f} ms max={max(latency):.0f} ms plates={found}"
+        if truth:
+            matched = missed = extra = 0
+            for expected, predicted in zip(truth, results[mode]["boxes"]):
+                m, mi, ex = match_boxes(expected, predicted, args.iou)
+                matched, missed, extra = matched + m, missed + mi, extra + ex
+            recall = matched / (matched + missed) if matched + missed else 1.0
+            precision = matched / (matched + extra) if matched + extra else 1.0
+            line += f" recall={recall:.3f} precision={precision:.3f}"
+        print(line)
+
+    if not truth:
+        shared = sum(
+            match_boxes(single, tiled, args.iou)[0]
+            for single, tiled in zip(results["off"]["boxes"], results["on"]["boxes"])
+        )
+        print(f"plates found by both modes: {shared}")
+
+
+if __name__ == "__main__":
+    main()
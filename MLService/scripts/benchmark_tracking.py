@@ -0,0 +1,138 @@
+"""Compare per-frame detection with keyframe detection plus tracking on video.
+
+Usage (from the MLService directory):
+    python -m scripts.benchmark_tracking --keyframe-interval 5
+    python -m scripts.benchmark_tracking --video ./samples/clip.mp4
+
+Without --video a synthetic clip of textured boxes moving over a noisy
+background is generated and the detector is simulated: it returns the true
+boxes after --detect-ms milliseconds per frame, so the numbers isolate what
+tracking saves. With --video the real model is used and recall is measured
+against the per-frame detections.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.boxes import match_boxes
+from app.inference import BoundingBox, detect_frames, get_model
+from app.tracking import KeyframeTracker, track_chunk
+from app.video import FrameReader
+
+
+def synthetic_clip(frames: int, width: int, height: int, plates: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    background = rng.integers(0, 80, (height, width, 3), dtype=np.uint8)
+    sizes = rng.integers(40, 120, (plates, 2))
+    positions = rng.uniform(0, 1, (plates, 2)) * (np.array([width, height]) - sizes)
+    velocities = rng.uniform(-6, 6, (plates, 2))
+    textures = [rng.integers(120, 256, (h, w, 3), dtype=np.uint8) for w, h in sizes]
+
+    clip, truth = [], []
+    for _ in range(frames):
+        frame = background.copy()
+        boxes = []
+        for (w, h), (x, y), texture in zip(sizes, positions.astype(int), textures):
+            frame[y:y + h, x:x + w] = texture
+            boxes.append([x, y, x + w, y + h])
+        clip.append(frame)
+        truth.append(boxes)
+        positions += velocities
+        bounce = (positions < 0) | (positions > np.array([width, height]) - sizes)
+        velocities[bounce] *= -1
+        positions = np.clip(positions, 0, np.array([width, height]) - sizes)
+    return clip, truth
+
+
+def oracle_detector(truth, frames, detect_ms: float):
+    lookup = {id(frame): boxes for frame, boxes in zip(frames, truth)}
+
+    def detect(batch):
+        time.sleep(detect_ms * len(batch) / 1000)
+        return [
+            [BoundingBox(x1=x1, y1=y1, x2=x2, y2=y2, confidence=0.9, class_name="license_plate")
+             for x1, y1, x2, y2 in lookup[id(frame)]]
+            for frame in batch
+        ]
+
+    return detect
+
+
+def run_per_frame(frames, detect, batch_size: int):
+    results = []
+    for start in range(0, len(frames), batch_size):
+        results.extend(detect(frames[start:start + batch_size]))
+    return results
+
+
+def run_tracking(frames, detect, batch_size: int, keyframe_interval: int, min_confidence: float):
+    tracker = KeyframeTracker(keyframe_interval, min_confidence)
+    chunk = batch_size * keyframe_interval
+    results = []
+    for start in range(0, len(frames), chunk):
+        tracker, boxes, _ = track_chunk(tracker, frames[start:start + chunk], detect)
+        results.extend(boxes)
+    return results, tracker
+
+
+def recall(reference, predicted, iou: float) -> float:
+    matched = missed = 0
+    for expected, found in zip(reference, predicted):
+        m, mi, _ = match_boxes(expected, [[b.x1, b.y1, b.x2, b.y2] for b in found], iou)
+        matched, missed = matched + m, missed + mi
+    return matched / (matched + missed) if matched + missed else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", help="real clip to run the model on")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--plates", type=int, default=4)
+    parser.add_argument("--detect-ms", type=float, default=40.0)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--keyframe-interval", type=int, default=5)
+    parser.add_argument("--min-confidence", type=float, default=0.5)
+    parser.add_argument("--iou", type=float, default=0.5)
+    args = parser.parse_args()
+
+    if args.video:
+        reader = FrameReader(args.video)
+        frames = []
+        while len(frames) < args.frames and (batch := reader.read_batch(args.batch_size)):
+            frames.extend(batch)
+        reader.release()
+        get_model()
+        detect_frames(frames[:1])
+        detect, truth = detect_frames, None
+    else:
+        frames, truth = synthetic_clip(args.frames, args.width, args.height, args.plates)
+        detect = oracle_detector(truth, frames, args.detect_ms)
+    if not frames:
+        raise SystemExit("No frames to benchmark")
+
+    started = time.perf_counter()
+    per_frame = run_per_frame(frames, detect, args.batch_size)
+    per_frame_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    tracked, tracker = run_tracking(frames, detect, args.batch_size, args.keyframe_interval, args.min_confidence)
+    tracking_seconds = time.perf_counter() - started
+
+    reference = truth or [[[b.x1, b.y1, b.x2, b.y2] for b in boxes] for boxes in per_frame]
+    print(f"{len(frames)} frames, keyframe interval {args.keyframe_interval}")
+    print(f"[per_frame] {len(frames) / per_frame_seconds:.1f} fps detected={len(frames)}")
+    print(
+        f"[tracking]  {len(frames) / tracking_seconds:.1f} fps detected={tracker.detections_run} "
+        f"forced={tracker.forced_detections} speedup={per_frame_seconds / tracking_seconds:.2f}x"
+    )
+    if truth:
+        print(f"recall vs truth: per_frame={recall(truth, per_frame, args.iou):.3f} tracking={recall(truth, tracked, args.iou):.3f}")
+    else:
+        print(f"recall vs per_frame: {recall(reference, tracked, args.iou):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Build an INT8 ONNX model and compare it with the FP32 export.
+
+Usage (from the MLService directory):
+    python -m scripts.quantize_int8 --calibration ./samples/calibration --eval ./samples/eval
+
+Calibration runs static post-training quantization (QDQ, per-channel) on the
+images in --calibration. The report shows box agreement with the FP32 ONNX
+model on --eval together with CPU latency of both models. Serve the result
+with INFERENCE_BACKEND=onnx MODEL_PRECISION=int8.
+"""
+import argparse
+import tempfile
+from pathlib import Path
+
+import onnxruntime as ort
+from onnxruntime.quantization import (CalibrationDataReader, CalibrationMethod, QuantFormat, QuantType,
+                                      quantize_static)
+from onnxruntime.quantization.shape_inference import quant_pre_process
+
+from app.backends import MODEL_IMGSZ, OnnxRuntimeBackend, ensure_exported, letterbox, quantized_path
+from app.inference import MODEL_PATH
+from scripts.benchmark_backends import agreement, benchmark, load_images
+
+
+class FolderCalibrationReader(CalibrationDataReader):
+    def __init__(self, input_name: str, images, imgsz: int):
+        self.input_name = input_name
+        self._batches = iter([letterbox(image, imgsz)[0][None] for image in images])
+
+    def get_next(self):
+        batch = next(self._batches, None)
+        return None if batch is None else {self.input_name: batch}
+
+
+def quantize(fp32_path: str, output_path: Path, calibration_images, per_channel: bool):
+    input_name = ort.InferenceSession(fp32_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    with tempfile.TemporaryDirectory() as workdir:
+        prepared = str(Path(workdir) / "prepared.onnx")
+        quant_pre_process(fp32_path, prepared)
+        quantize_static(
+            prepared,
+            str(output_path),
+            FolderCalibrationReader(input_name, calibration_images, MODEL_IMGSZ),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=per_channel,
+            calibrate_method=CalibrationMethod.MinMax,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calibration", required=True, help="folder of representative sample images")
+    parser.add_argument("--eval", help="folder used for the report (defaults to the calibration folder)")
+    parser.add_argument("--weights", default=MODEL_PATH)
+    parser.add_argument("--calibration-limit", type=int, default=200)
+    parser.add_argument("--eval-limit", type=int, default=100)
+    parser.add_argument("--no-per-channel", action="store_true")
+    parser.add_argument("--iou", type=float, default=0.5)
+    parser.add_argument("--min-confidence", type=float, default=0.5)
+    parser.add_argument("--report-only", action="store_true", help="skip quantization, only compare")
+    args = parser.parse_args()
+
+    fp32_path = ensure_exported(args.weights, "onnx")
+    int8_path = quantized_path(args.weights)
+    if not args.report_only:
+        calibration = load_images(args.calibration, args.calibration_limit)
+        print(f"Calibrating on {len(calibration)} images -> {int8_path}")
+        quantize(fp32_path, int8_path, calibration, per_channel=not args.no_per_channel)
+
+    images = load_images(args.eval or args.calibration, args.eval_limit)
+    fp32 = OnnxRuntimeBackend(fp32_path)
+    int8 = OnnxRuntimeBackend(str(int8_path))
+    reference = [fp32.predict([image])[0] for image in images]
+    candidate = [int8.predict([image])[0] for image in images]
+    report = agreement(reference, candidate, args.iou, args.min_confidence)
+
+    fp32_stats = benchmark(fp32, images, [1], warmup=3)
+    int8_stats = benchmark(int8, images, [1], warmup=3)
+    size_fp32 = Path(fp32_path).stat().st_size / 1e6
+    size_int8 = int8_path.stat().st_size / 1e6
+
+    print(f"{'model':<6} {'size MB':>8} {'p50 ms':>8} {'p95 ms':>8} {'img/s':>8}")
+    for name, stats, size in (("fp32", fp32_stats, size_fp32), ("int8", int8_stats, size_int8)):
+        print(f"{name:<6} {size:>8.1f} {stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['throughput'][1]:>8.1f}")
+    print(f"speedup (p50): {fp32_stats['p50_ms'] / int8_stats['p50_ms']:.2f}x")
+    print(
+        f"box agreement vs fp32 (IoU>={args.iou}, conf>={args.min_confidence}): "
+        f"matched={report['matched']} missed={report['missed']} extra={report['extra']} "
+        f"recall={report['recall_vs_reference']:.3f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import asyncio
+
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.admission import AdmissionMiddleware, InFlightLimiter
+
+
+def _client(limiter: InFlightLimiter) -> TestClient:
+    async def endpoint(request):
+        return PlainTextResponse("ok")
+
+    app = Starlette(routes=[Route("/detect", endpoint, methods=["POST"]), Route("/health", endpoint)])
+    app.add_middleware(AdmissionMiddleware, limiter=limiter, path_prefix="/detect", retry_after_seconds=3)
+    return TestClient(app)
+
+
+def test_limiter_rejects_beyond_the_limit_and_frees_slots():
+    limiter = InFlightLimiter(2)
+    assert limiter.try_acquire()
+    assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+    limiter.release()
+    assert limiter.try_acquire()
+    assert limiter.metrics() == {"limit": 2, "in_flight": 2, "rejected": 1}
+
+
+def test_full_limiter_answers_503_with_retry_after():
+    limiter = InFlightLimiter(1)
+    client = _client(limiter)
+    assert limiter.try_acquire()
+
+    response = client.post("/detect")
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
+    assert "overloaded" in response.json()["detail"]
+
+
+def test_paths_outside_the_prefix_are_not_limited():
+    limiter = InFlightLimiter(1)
+    client = _client(limiter)
+    assert limiter.try_acquire()
+
+    assert client.get("/health").status_code == 200
+    assert limiter.rejected == 0
+
+
+def test_slot_is_released_after_the_response():
+    limiter = InFlightLimiter(1)
+    client = _client(limiter)
+
+    assert client.post("/detect").status_code == 200
+    assert client.post("/detect").status_code == 200
+    assert limiter.in_flight == 0
+
+
+def test_slot_is_released_when_the_app_fails():
+    limiter = InFlightLimiter(1)
+
+    async def failing_app(scope, receive, send):
+        raise RuntimeError("boom")
+
+    middleware = AdmissionMiddleware(failing_app, limiter, "/detect", 1)
+    try:
+        asyncio.run(middleware({"type": "http", "path": "/detect"}, None, None))
+    except RuntimeError:
+        pass
+    assert limiter.in_flight == 0
+
+
+def test_excluded_prefix_does_not_take_a_slot():
+    async def endpoint(request):
+        return PlainTextResponse("ok")
+
+    limiter = InFlightLimiter(1)
+    video_limiter = InFlightLimiter(1)
+    app = Starlette(routes=[Route("/detect", endpoint, methods=["POST"]), Route("/detect/video", endpoint, methods=["POST"])])
+    app.add_middleware(AdmissionMiddleware, limiter=limiter, path_prefix="/detect", retry_after_seconds=1,
+                       exclude_prefixes=("/detect/video",))
+    app.add_middleware(AdmissionMiddleware, limiter=video_limiter, path_prefix="/detect/video", retry_after_seconds=1)
+    client = TestClient(app)
+    assert video_limiter.try_acquire()
+
+    assert client.post("/detect").status_code == 200
+    assert client.post("/detect/video").status_code == 503
+    assert limiter.rejected == 0
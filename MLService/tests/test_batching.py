@@ -0,0 +1,133 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.batching import MicroBatcher
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_submit_many_returns_results_in_submission_order():
+    batches = []
+
+    def run_batch(payloads):
+        batches.append(list(payloads))
+        return [payload * 10 for payload in payloads]
+
+    async def scenario():
+        batcher = MicroBatcher(run_batch, max_batch_size=3, max_wait_ms=50)
+        try:
+            return await batcher.submit_many(list(range(7)))
+        finally:
+            await batcher.stop()
+
+    assert _run(scenario()) == [0, 10, 20, 30, 40, 50, 60]
+    assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_partial_batch_is_flushed_after_max_wait():
+    async def scenario():
+        batcher = MicroBatcher(lambda payloads: list(payloads), max_batch_size=8, max_wait_ms=20)
+        try:
+            result = await asyncio.wait_for(batcher.submit("only"), timeout=2)
+            return result, batcher.metrics()
+        finally:
+            await batcher.stop()
+
+    result, metrics = _run(scenario())
+    assert result == "only"
+    assert metrics["batches"] == 1
+    assert metrics["batch_size_histogram"] == {"1": 1}
+
+
+def test_concurrent_submits_share_one_batch():
+    sizes = []
+
+    def run_batch(payloads):
+        sizes.append(len(payloads))
+        return payloads
+
+    async def scenario():
+        batcher = MicroBatcher(run_batch, max_batch_size=4, max_wait_ms=200)
+        try:
+            return await asyncio.gather(*[batcher.submit(index) for index in range(4)])
+        finally:
+            await batcher.stop()
+
+    assert _run(scenario()) == [0, 1, 2, 3]
+    assert sizes == [4]
+
+
+def test_batch_error_is_fanned_out_to_every_item_of_that_batch_only():
+    def run_batch(payloads):
+        if "bad" in payloads:
+            raise ValueError("model crashed")
+        return payloads
+
+    async def scenario():
+        batcher = MicroBatcher(run_batch, max_batch_size=2, max_wait_ms=50)
+        try:
+            return await batcher.submit_many(["ok", "bad", "fine", "good"]), batcher.metrics()
+        finally:
+            await batcher.stop()
+
+    results, metrics = _run(scenario())
+    assert [type(result) for result in results[:2]] == [ValueError, ValueError]
+    assert str(results[0]) == "model crashed"
+    assert results[2:] == ["fine", "good"]
+    assert metrics["errors"] == 1
+
+
+def test_wrong_result_count_fails_the_batch():
+    async def scenario():
+        batcher = MicroBatcher(lambda payloads: payloads[:-1], max_batch_size=2, max_wait_ms=50)
+        try:
+            await batcher.submit("a")
+        finally:
+            await batcher.stop()
+
+    with pytest.raises(RuntimeError, match="count"):
+        _run(scenario())
+
+
+def test_batches_run_off_the_event_loop_thread():
+    threads = []
+
+    def run_batch(payloads):
+        threads.append(threading.get_ident())
+        return payloads
+
+    async def scenario():
+        batcher = MicroBatcher(run_batch, max_batch_size=1, max_wait_ms=0)
+        try:
+            await batcher.submit(1)
+        finally:
+            await batcher.stop()
+        return threading.get_ident()
+
+    loop_thread = _run(scenario())
+    assert threads and threads[0] != loop_thread
+
+
+def test_stop_fails_queued_items():
+    release = threading.Event()
+
+    def run_batch(payloads):
+        release.wait(timeout=2)
+        return payloads
+
+    async def scenario():
+        batcher = MicroBatcher(run_batch, max_batch_size=1, max_wait_ms=0)
+        first = asyncio.ensure_future(batcher.submit("running"))
+        await asyncio.sleep(0.05)
+        queued = asyncio.ensure_future(batcher.submit("queued"))
+        await asyncio.sleep(0.05)
+        await batcher.stop()
+        release.set()
+        return await asyncio.gather(first, queued, return_exceptions=True)
+
+    results = _run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
@@ -0,0 +1,40 @@
+import numpy as np
+
+from app.boxes import iou_matrix, match_boxes, nms
+
+
+def test_iou_matrix_of_identical_disjoint_and_half_overlapping_boxes():
+    boxes = np.array([[0, 0, 10, 10]], dtype=np.float32)
+    others = np.array([[0, 0, 10, 10], [20, 20, 30, 30], [5, 0, 15, 10]], dtype=np.float32)
+    np.testing.assert_allclose(iou_matrix(boxes, others)[0], [1.0, 0.0, 1 / 3], rtol=1e-5)
+    assert iou_matrix(boxes, np.empty((0, 4), dtype=np.float32)).shape == (1, 0)
+
+
+def test_nms_keeps_the_highest_score_of_each_overlapping_group():
+    boxes = np.array([
+        [0, 0, 10, 10],
+        [1, 1, 11, 11],
+        [50, 50, 60, 60],
+        [0, 0, 10, 10],
+    ], dtype=np.float32)
+    scores = np.array([0.6, 0.9, 0.5, 0.3], dtype=np.float32)
+
+    assert nms(boxes, scores, iou_threshold=0.5) == [1, 2]
+
+
+def test_nms_keeps_boxes_whose_overlap_is_below_the_threshold():
+    boxes = np.array([[0, 0, 10, 10], [5, 0, 15, 10]], dtype=np.float32)
+    scores = np.array([0.8, 0.7], dtype=np.float32)
+
+    assert nms(boxes, scores, iou_threshold=0.5) == [0, 1]
+    assert nms(boxes, scores, iou_threshold=0.3) == [0]
+
+
+def test_nms_of_nothing_is_empty():
+    assert nms(np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.float32), 0.5) == []
+
+
+def test_match_boxes_counts_matched_missed_and_extra():
+    reference = [[0, 0, 10, 10], [20, 20, 30, 30]]
+    candidate = [[1, 1, 10, 10], [100, 100, 110, 110]]
+    assert match_boxes(reference, candidate) == (1, 1, 1)
@@ -0,0 +1,82 @@
+import asyncio
+
+from app.cache import DetectionCache, content_key
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_content_key_depends_on_bytes_model_version_and_variant():
+    key = content_key(b"image", "v1", "auto")
+    assert key == content_key(b"image", "v1", "auto")
+    assert len({key, content_key(b"other", "v1", "auto"), content_key(b"image", "v2", "auto"),
+                content_key(b"image", "v1", "on")}) == 4
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("app.cache.time.time", lambda: clock[0])
+    cache = DetectionCache("v1", max_entries=4, ttl_seconds=10)
+
+    _run(cache.put("key", {"detections": []}))
+    assert _run(cache.get("key")) == {"detections": []}
+
+    clock[0] += 11
+    assert _run(cache.get("key")) is None
+    assert cache.metrics()["expirations"] == 1
+    assert cache.metrics()["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = DetectionCache("v1", max_entries=2)
+    _run(cache.put("a", {"value": 1}))
+    _run(cache.put("b", {"value": 2}))
+    assert _run(cache.get("a")) == {"value": 1}
+
+    _run(cache.put("c", {"value": 3}))
+
+    assert _run(cache.get("b")) is None
+    assert _run(cache.get("a")) == {"value": 1}
+    assert _run(cache.get("c")) == {"value": 3}
+    assert cache.metrics()["evictions"] == 1
+
+
+def test_zero_size_disables_the_cache():
+    cache = DetectionCache("v1", max_entries=0)
+    _run(cache.put("a", {"value": 1}))
+    assert _run(cache.get("a")) is None
+    assert cache.metrics()["enabled"] is False
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    first = DetectionCache("v1", disk_dir=str(tmp_path))
+    _run(first.put("abcdef", {"value": 1}))
+
+    restarted = DetectionCache("v1", disk_dir=str(tmp_path))
+    assert _run(restarted.get("abcdef")) == {"value": 1}
+    assert restarted.metrics()["disk_hits"] == 1
+    # Promoted to memory, the next lookup does not touch the disk
+    assert _run(restarted.get("abcdef")) == {"value": 1}
+    assert restarted.metrics()["hits"] == 1
+
+
+def test_new_model_version_drops_entries_of_other_versions(tmp_path):
+    old = DetectionCache("v1", disk_dir=str(tmp_path))
+    _run(old.put("abcdef", {"value": 1}))
+
+    current = DetectionCache("v2", disk_dir=str(tmp_path))
+
+    assert not (tmp_path / "v1").exists()
+    assert _run(current.get("abcdef")) is None
+
+
+def test_expired_disk_entry_is_removed(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("app.cache.time.time", lambda: clock[0])
+    _run(DetectionCache("v1", ttl_seconds=5, disk_dir=str(tmp_path)).put("abcdef", {"value": 1}))
+
+    clock[0] += 6
+    restarted = DetectionCache("v1", ttl_seconds=5, disk_dir=str(tmp_path))
+    assert _run(restarted.get("abcdef")) is None
+    assert not (tmp_path / "v1" / "ab" / "abcdef.json").exists()
@@ -0,0 +1,53 @@
+from app.tiling import merge_detections, should_tile, tile_grid
+
+
+def test_tile_grid_covers_the_image_with_overlapping_tiles():
+    windows = tile_grid(1500, 700, tile_size=640, overlap=0.2)
+
+    xs = sorted({window[0] for window in windows})
+    ys = sorted({window[1] for window in windows})
+    assert xs == [0, 512, 860]
+    assert ys == [0, 60]
+    assert len(windows) == 6
+    assert all(x2 - x1 == 640 and y2 - y1 == 640 for x1, y1, x2, y2 in windows)
+    assert max(window[2] for window in windows) == 1500
+    assert max(window[3] for window in windows) == 700
+
+
+def test_tile_grid_of_a_small_image_is_one_window():
+    assert tile_grid(300, 200, tile_size=640) == [(0, 0, 300, 200)]
+
+
+def test_should_tile_follows_mode_and_threshold():
+    assert should_tile((100, 100), "on")
+    assert not should_tile((5000, 5000), "off")
+    assert should_tile((2500, 1000), "auto", threshold=2000)
+    assert not should_tile((2000, 1000), "auto", threshold=2000)
+
+
+def test_merge_detections_shifts_boxes_by_window_offset():
+    merged = merge_detections([[(10, 10, 20, 20, 0.9, 0)], [(10, 10, 20, 20, 0.8, 0)]], [(0, 0), (500, 0)])
+
+    assert sorted(box[:4] for box in merged) == [(10.0, 10.0, 20.0, 20.0), (510.0, 10.0, 520.0, 20.0)]
+
+
+def test_merge_detections_joins_a_box_split_across_tiles():
+    # The same plate seen whole by one tile and cut at the edge of another
+    merged = merge_detections(
+        [[(100, 50, 180, 80, 0.6, 0)], [(0, 50, 30, 80, 0.9, 0)]],
+        [(0, 0), (150, 0)],
+        iou_threshold=0.5,
+        containment_threshold=0.7,
+    )
+
+    assert merged == [(100.0, 50.0, 180.0, 80.0, 0.9, 0)]
+
+
+def test_merge_detections_keeps_overlapping_boxes_of_other_classes():
+    merged = merge_detections([[(0, 0, 10, 10, 0.9, 0), (0, 0, 10, 10, 0.8, 1)]], [(0, 0)])
+
+    assert sorted(box[5] for box in merged) == [0, 1]
+
+
+def test_merge_detections_of_nothing_is_empty():
+    assert merge_detections([[], []], [(0, 0), (100, 0)]) == []
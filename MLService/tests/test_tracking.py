@@ -0,0 +1,62 @@
+import numpy as np
+
+from app.inference import BoundingBox
+from app.tracking import KeyframeTracker, track_chunk
+
+
+def _textured_frame(shift: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(7)
+    texture = (rng.random((64, 96)) * 255).astype(np.uint8)
+    frame = np.zeros((64, 96, 3), dtype=np.uint8)
+    frame[..., 0] = np.roll(texture, shift, axis=1)
+    frame[..., 1] = frame[..., 0]
+    frame[..., 2] = frame[..., 0]
+    return frame
+
+
+class _Detector:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, frames):
+        self.calls.append(len(frames))
+        return [[BoundingBox(x1=30, y1=20, x2=60, y2=40, confidence=0.9, class_name="license_plate")] for _ in frames]
+
+
+def test_only_scheduled_keyframes_are_detected_when_tracking_holds():
+    detector = _Detector()
+    tracker = KeyframeTracker(keyframe_interval=3, min_confidence=0.0)
+
+    tracker, results, keyframes = track_chunk(tracker, [_textured_frame(shift) for shift in range(6)], detector)
+
+    assert keyframes == [True, False, False, True, False, False]
+    assert detector.calls == [2]
+    assert tracker.detections_run == 2
+    assert tracker.forced_detections == 0
+    assert all(len(boxes) == 1 for boxes in results)
+
+
+def test_schedule_continues_across_chunks():
+    detector = _Detector()
+    tracker = KeyframeTracker(keyframe_interval=3, min_confidence=0.0)
+
+    tracker, _, first = track_chunk(tracker, [_textured_frame()] * 4, detector)
+    tracker, _, second = track_chunk(tracker, [_textured_frame()] * 4, detector)
+
+    assert first + second == [True, False, False, True, False, False, True, False]
+
+
+def test_frame_is_redetected_when_tracking_confidence_drops():
+    detector = _Detector()
+    tracker = KeyframeTracker(keyframe_interval=10, min_confidence=0.5)
+    # A blank frame leaves optical flow nothing to follow
+    frames = [_textured_frame(), np.zeros((64, 96, 3), dtype=np.uint8), _textured_frame()]
+
+    tracker, results, keyframes = track_chunk(tracker, frames, detector)
+
+    assert keyframes[0] is True
+    assert keyframes[1] is True
+    assert tracker.forced_detections >= 1
+    assert tracker.detections_run == 1 + tracker.forced_detections
+    assert detector.calls[1:] == [1] * tracker.forced_detections
+    assert results[1] == detector([frames[1]])[0]
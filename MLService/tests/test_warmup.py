@@ -0,0 +1,25 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app import inference
+
+
+def test_every_worker_warms_up_before_its_first_job(monkeypatch):
+    warmed = []
+    monkeypatch.setattr(inference, "get_model", lambda: None)
+
+    def fake_warm_up(batch_sizes, iterations):
+        warmed.append(threading.get_ident())
+        return 0.25
+
+    monkeypatch.setattr(inference, "warm_up", fake_warm_up)
+    executor = ThreadPoolExecutor(max_workers=3, initializer=inference.init_worker, initargs=([1], 1))
+    try:
+        jobs = [executor.submit(lambda: (threading.get_ident(), inference.warmup_seconds())) for _ in range(12)]
+        results = [job.result() for job in jobs]
+    finally:
+        executor.shutdown()
+
+    assert len(warmed) == len(set(warmed))
+    assert {thread for thread, _ in results} <= set(warmed)
+    assert {seconds for _, seconds in results} == {0.25}